@@ -0,0 +1,217 @@
+# Check the checksums of the packets edited directly in their wire bytes,
+# which are updated incrementally (RFC 1624) instead of being recomputed by Scapy:
+#   - fuzz the sample PCAP files with several seeds, and compare each IPv4, TCP, UDP and ICMP checksum
+#     of the edited packets with the checksum recomputed from the packet bytes;
+#   - patch crafted packets, for the edge cases: optional (null) UDP checksum, null checksum transmitted as 0xFFFF,
+#     and edited fields at odd offsets or with odd lengths.
+# Exits with status 1 if a checksum differs.
+
+# Imports
+import os
+import sys
+from pathlib import Path
+import glob
+import shutil
+import tempfile
+import logging
+import scapy.all as scapy
+from scapy.layers.inet import in4_chksum
+from scapy.layers.inet6 import in6_chksum
+import pcap_fuzzer
+from pcap_fuzzer.reader import RecordReader
+from pcap_fuzzer.packet.checksum import Checksum, patch
+from pcap_fuzzer.packet.layers import LayerStack
+
+# Seeds the sample PCAP files are fuzzed with
+SEEDS = range(1, 21)
+# IP protocols whose checksum covers a pseudo-header, and offset of their checksum field
+PSEUDO_HEADER_CHECKSUMS = {6: 16, 17: 6}
+ICMP = 1
+
+
+def get_checksums(data: bytes) -> list:
+    """
+    Get the IPv4, TCP, UDP and ICMP checksums of an Ethernet frame,
+    with the value recomputed from the packet bytes.
+
+    :param data: Ethernet frame bytes
+    :return: list of tuples containing the checksum name, its value in the frame,
+             its recomputed value, and whether a null value means no checksum
+    """
+    packet = scapy.Ether(data)
+    layers = LayerStack(packet)
+    checksums = []
+    for layer, offset in zip(layers.layers, layers.offsets):
+        if offset is None or not isinstance(layer, (scapy.IP, scapy.IPv6)):
+            continue
+        if isinstance(layer, scapy.IP):
+            header_length = (data[offset] & 0x0F) * 4
+            end = offset + layer.len
+            header = bytearray(data[offset:offset + header_length])
+            header[10:12] = b"\x00\x00"
+            checksums.append(("IPv4", layer.chksum, scapy.checksum(bytes(header)), False))
+            if layer.frag != 0:
+                continue
+            proto, start = layer.proto, offset + header_length
+        else:
+            proto, start, end = layer.nh, offset + 40, offset + 40 + layer.plen
+        if end > len(data):
+            # Truncated packet
+            continue
+        if proto in PSEUDO_HEADER_CHECKSUMS:
+            field = start + PSEUDO_HEADER_CHECKSUMS[proto]
+            segment = bytearray(data[start:end])
+            segment[field - start:field - start + 2] = b"\x00\x00"
+            chksum = (in4_chksum if isinstance(layer, scapy.IP) else in6_chksum)(proto, layer, bytes(segment))
+            if proto == 17 and chksum == 0:
+                # Null UDP checksum is transmitted as all ones
+                chksum = 0xFFFF
+            value = int.from_bytes(data[field:field + 2], "big")
+            checksums.append(("TCP" if proto == 6 else "UDP", value, chksum, proto == 17))
+        elif proto == ICMP and isinstance(layer, scapy.IP):
+            message = bytearray(data[start:end])
+            message[2:4] = b"\x00\x00"
+            value = int.from_bytes(data[start + 2:start + 4], "big")
+            checksums.append(("ICMP", value, scapy.checksum(bytes(message)), False))
+    return checksums
+
+
+def check_fuzzed(traces_dir: str) -> int:
+    """
+    Fuzz the sample PCAP files with several seeds, and check the checksums of the edited packets.
+    Checksums which were already wrong in the input packets (e.g. offloaded ones) are not checked,
+    and optional checksums may stay null.
+
+    :param traces_dir: directory of the sample PCAP files
+    :return: number of wrong checksums
+    """
+    errors, checked = 0, 0
+    stats = pcap_fuzzer.Stats()
+    with tempfile.TemporaryDirectory() as work_dir:
+        pcaps = [shutil.copy(path, work_dir) for path in sorted(glob.glob(f"{traces_dir}/*.pcap"))]
+        for seed in SEEDS:
+            pcap_fuzzer.fuzz_pcaps(pcaps, seed=seed, stats=stats)
+            for input_pcap in pcaps:
+                name, ext = os.path.splitext(os.path.basename(input_pcap))
+                output_pcap = os.path.join(work_dir, "edited", f"{name}.edit{ext}")
+                with RecordReader(input_pcap) as inputs, RecordReader(output_pcap) as outputs:
+                    for i, (old, new) in enumerate(zip(inputs, outputs), start=1):
+                        old, new = bytes(old.data), bytes(new.data)
+                        if old == new:
+                            continue
+                        for (name_old, old_value, old_expected, _), (name_new, value, expected, optional) in zip(get_checksums(old), get_checksums(new)):
+                            if old_value != old_expected or name_old != name_new:
+                                continue
+                            checked += 1
+                            if value != expected and not (optional and value == 0 and old_value == 0):
+                                errors += 1
+                                print(f"Wrong {name_new} checksum in packet {i} of {os.path.basename(input_pcap)} (seed {seed}): "
+                                      f"{value:#06x}, expected {expected:#06x}")
+    patched = sum(calls for (stage, _), calls in stats.calls.items() if stage == "patch")
+    print(f"Fuzzed packets: {checked} checksums checked, {patched} fields patched, {errors} wrong")
+    if patched == 0:
+        print("No field was patched in the packet wire bytes")
+        errors += 1
+    return errors
+
+
+def check_patch(raw: bytearray, offset: int, value: bytes, checksums: list, label: str) -> int:
+    """
+    Patch a field of a crafted Ethernet frame, and check its checksums.
+
+    :param raw: Ethernet frame bytes
+    :param offset: byte offset of the field
+    :param value: new field value
+    :param checksums: checksums covering the field
+    :param label: test case description, for the error message
+    :return: 1 if a checksum is wrong, 0 otherwise
+    """
+    zero_udp = [old_value == 0 for name, old_value, _, _ in get_checksums(bytes(raw)) if name == "UDP"]
+    patch(raw, offset, value, checksums)
+    for name, value, expected, optional in get_checksums(bytes(raw)):
+        if name == "UDP" and zero_udp[0]:
+            expected = 0
+        if value != expected:
+            print(f"Wrong {name} checksum for {label}: {value:#06x}, expected {expected:#06x}")
+            return 1
+    return 0
+
+
+def check_edge_cases() -> int:
+    """
+    Check the incremental checksum updates on crafted packets.
+
+    :return: number of failed cases
+    """
+    errors = 0
+    ip_checksum = Checksum(14 + 10, 14)
+    udp_checksum = Checksum(14 + 20 + 6, 14, True)
+    tcp_checksum = Checksum(14 + 20 + 16, 14)
+    udp = scapy.Ether() / scapy.IP(src="192.168.1.2", dst="192.168.1.1") / scapy.UDP(sport=5353, dport=5353) / (b"payload" * 3)
+    tcp = scapy.Ether() / scapy.IP(src="192.168.1.2", dst="192.168.1.1") / scapy.TCP(sport=80, dport=8080) / b"odd"
+
+    # Optional UDP checksum: a null checksum stays null
+    raw = bytearray(bytes(udp))
+    raw[40:42] = b"\x00\x00"
+    errors += check_patch(raw, 14 + 12, bytes([10, 0, 0, 1]), [ip_checksum, udp_checksum], "null UDP checksum")
+
+    # All values of a 16-bit field, including those for which the new checksum is null:
+    # transmitted as 0xFFFF for UDP, and never 0xFFFF instead of 0 for the other checksums.
+    # The expected checksum is recomputed from the segment bytes, as the addresses do not change.
+    for packet, checksum, proto, name in [(udp, udp_checksum, 17, "UDP"), (tcp, tcp_checksum, 6, "TCP")]:
+        original = bytes(packet)
+        ip_layer = packet[scapy.IP]
+        field = checksum.offset - 34
+        null_results = 0
+        for port in range(1 << 16):
+            raw = bytearray(original)
+            patch(raw, 34, port.to_bytes(2, "big"), [checksum])
+            segment = bytearray(raw[34:])
+            value = int.from_bytes(segment[field:field + 2], "big")
+            segment[field:field + 2] = b"\x00\x00"
+            expected = in4_chksum(proto, ip_layer, bytes(segment))
+            if expected == 0:
+                null_results += 1
+                if proto == 17:
+                    # Null UDP checksum is transmitted as all ones
+                    expected = 0xFFFF
+            if value != expected:
+                print(f"Wrong {name} checksum for source port {port}: {value:#06x}, expected {expected:#06x}")
+                errors += 1
+                break
+        if null_results == 0:
+            print(f"No source port gives a null {name} checksum")
+            errors += 1
+
+    # Fields at odd offsets, or with odd lengths:
+    # IPv4 type of service (offset 1), TTL (offset 8), ICMP code (offset 1), UDP payload bytes
+    icmp = scapy.Ether() / scapy.IP(src="192.168.1.2", dst="8.8.8.8") / scapy.ICMP() / b"ping"
+    for value in range(256):
+        raw = bytearray(bytes(udp))
+        errors += check_patch(raw, 14 + 1, bytes([value]), [ip_checksum], f"IPv4 type of service {value}")
+        raw = bytearray(bytes(udp))
+        errors += check_patch(raw, 14 + 8, bytes([value]), [ip_checksum], f"IPv4 TTL {value}")
+        raw = bytearray(bytes(icmp))
+        errors += check_patch(raw, 34 + 1, bytes([value]), [Checksum(34 + 2, 34)], f"ICMP code {value}")
+        for payload_offset in (9, 10, 11):
+            raw = bytearray(bytes(udp))
+            errors += check_patch(raw, 34 + payload_offset, bytes([value]) * 3, [udp_checksum], f"UDP bytes {payload_offset}-{payload_offset + 2} set to {value}")
+    # Odd-length packet, edited up to its last byte
+    raw = bytearray(bytes(tcp))
+    errors += check_patch(raw, len(raw) - 3, b"xyz", [tcp_checksum], "last bytes of an odd-length TCP segment")
+    print(f"Edge cases: {errors} failed")
+    return errors
+
+
+### MAIN ###
+if __name__ == "__main__":
+    logging.disable(logging.WARNING)
+
+    # Get paths
+    self_path = Path(os.path.abspath(__file__))
+    base_dir = self_path.parents[1]
+    traces_dir = os.path.join(base_dir, "traces")
+
+    errors = check_fuzzed(traces_dir) + check_edge_cases()
+    if errors > 0:
+        sys.exit(1)
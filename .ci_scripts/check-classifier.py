@@ -0,0 +1,111 @@
+# Check that the raw header classifier takes the same decisions as `Packet.init_packet`
+# on the dissected packets, i.e. the same fuzzer class for the same layer, for all packets of the sample PCAP files,
+# and for randomly mutated copies of them (seeded, so the check is reproducible).
+# Exits with status 1 if a decision differs.
+
+# Imports
+import os
+import sys
+from pathlib import Path
+import glob
+import random
+import logging
+import scapy.all as scapy
+from pcap_fuzzer.pcap_fuzzer import dissect_packet
+from pcap_fuzzer.reader import RecordReader
+from pcap_fuzzer.packet import Packet
+from pcap_fuzzer.packet.classifier import classify_layer, UNDECIDED
+
+# Number of mutated frames to check
+MUTATIONS = 20000
+# Link types the mutated frames are classified with
+LINKTYPES = [1] * 12 + [101, 113, 147, 228, 229]
+
+
+def check(data: bytes, linktype: int, label: str) -> str:
+    """
+    Compare the classifier decision for a packet with the one of `Packet.init_packet`.
+
+    :param data: packet bytes
+    :param linktype: packet link type
+    :param label: packet description, for the error message
+    :return: "undecided", "ok" or "mismatch"
+    """
+    fuzzer_class, layer_index = classify_layer(data, linktype)
+    if fuzzer_class == UNDECIDED:
+        return "undecided"
+    packet = dissect_packet(data, linktype)
+    try:
+        my_packet = Packet.init_packet(packet)
+        expected, expected_index = type(my_packet), my_packet.get_layer_index()
+    except ValueError:
+        expected, expected_index = None, -1
+    if fuzzer_class is expected and layer_index == expected_index:
+        return "ok"
+    print(f"Mismatch for {label}: classifier gives {fuzzer_class} (layer {layer_index}), "
+          f"init_packet gives {expected} (layer {expected_index}): {packet.summary()}")
+    return "mismatch"
+
+
+def mutate(data: bytes, rng: random.Random) -> bytes:
+    """
+    Randomly mutate a frame: change header bytes, truncate it, or append bytes.
+
+    :param data: frame bytes
+    :param rng: random number generator
+    :return: mutated frame bytes
+    """
+    data = bytearray(data)
+    for _ in range(rng.randint(0, 3)):
+        kind = rng.random()
+        if kind < 0.6 and data:
+            data[rng.randrange(min(len(data), 60))] = rng.randrange(256)
+        elif kind < 0.8:
+            data = data[:rng.randrange(len(data) + 1)]
+        else:
+            data += bytes(rng.randrange(256) for _ in range(rng.randrange(20)))
+    return bytes(data)
+
+
+### MAIN ###
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+
+    # Get paths
+    self_path = Path(os.path.abspath(__file__))
+    base_dir = self_path.parents[1]
+    traces_dir = os.path.join(base_dir, "traces")
+
+    # All packets of the sample PCAP files
+    counts = {"ok": 0, "undecided": 0, "mismatch": 0}
+    frames = []
+    for path in sorted(glob.glob(f"{traces_dir}/*.pcap")):
+        with RecordReader(path) as reader:
+            for i, record in enumerate(reader, start=1):
+                data = bytes(record.data)
+                frames.append(data)
+                counts[check(data, record.linktype, f"packet {i} of {os.path.basename(path)}")] += 1
+    print(f"Sample packets: {counts}")
+
+    # Mutated copies of the sample packets, and of frames covering other dispatch paths
+    frames += [
+        bytes(scapy.Ether() / scapy.Dot1Q() / scapy.IP() / scapy.UDP(dport=4000) / b"hi"),
+        bytes(scapy.Ether() / scapy.IPv6() / scapy.UDP(sport=1234, dport=999) / (b"x" * 10)),
+        bytes(scapy.Ether() / scapy.IPv6(nh=200) / b"abc"),
+        bytes(scapy.Ether() / scapy.IP(frag=10) / scapy.UDP() / b"frag"),
+        bytes(scapy.Ether() / scapy.IP(proto=41) / scapy.IPv6() / scapy.TCP()),
+        bytes(scapy.Ether(type=0x88cc) / (b"lldp" * 5))
+    ]
+    rng = random.Random(1)
+    mutated_counts = {"ok": 0, "undecided": 0, "mismatch": 0}
+    for n in range(MUTATIONS):
+        data = mutate(rng.choice(frames), rng)
+        linktype = rng.choice(LINKTYPES)
+        mutated_counts[check(data, linktype, f"mutated frame {n} ({linktype=}, {data[:64].hex()})")] += 1
+    print(f"Mutated packets: {mutated_counts}")
+
+    if counts["mismatch"] > 0 or mutated_counts["mismatch"] > 0:
+        sys.exit(1)
+    if counts["ok"] == 0:
+        print("The classifier did not decide on any sample packet")
+        sys.exit(1)
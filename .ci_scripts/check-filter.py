@@ -0,0 +1,107 @@
+# Check the packet filter (--filter flag) of the CLI tool:
+# fuzz the sample PCAP files, and a synthetic PCAP file with VLAN-tagged frames,
+# with several filter expressions, and compare the number of edited packets with the expected one.
+# Exits with status 1 if a count differs, or if an invalid expression is accepted.
+
+# Imports
+import os
+import sys
+from pathlib import Path
+import glob
+import shutil
+import tempfile
+import subprocess
+import scapy.all as scapy
+
+# Filter expressions, and expected number of edited packets
+CASES = [
+    ("arp", 4),
+    ("ip6", 6),
+    ("udp port 53", 6),
+    ("udp dst port 53 and dst host 192.168.1.1", 4),
+    ("tcp dst port 80", 6),
+    ("src host 192.168.1.161 and (tcp or icmp)", 8),
+    # "not" binds tighter than "and": only DNS over TCP
+    ("not udp and port 53", 1),
+    ("not (udp and port 53)", 57),
+    # "and" and "or" have the same precedence, from left to right: (udp or arp) and port 53
+    ("udp or arp and port 53", 6),
+    ("igmp", 3),
+    ("ether src 00:11:22:33:44:55", 3),
+    # UDP in VLAN-tagged frames
+    ("ether src 00:11:22:33:44:55 and udp", 2)
+]
+# Invalid filter expressions
+INVALID = ["udp port", "host foo", "(udp or arp", "tcp host 192.168.1.1"]
+
+
+def write_vlan_pcap(path: str) -> None:
+    """
+    Write a synthetic PCAP file with DNS queries in VLAN-tagged frames, and a DNS query over TCP.
+
+    :param path: output PCAP file path
+    """
+    query = scapy.DNS(rd=1, qd=scapy.DNSQR(qname="example.com"))
+    packets = [
+        scapy.Ether(src="00:11:22:33:44:55") / scapy.Dot1Q(vlan=10) /
+        scapy.IP(src="192.168.1.50", dst="192.168.1.1") / scapy.UDP(sport=5000 + i, dport=53) / query
+        for i in range(2)
+    ]
+    packets.append(scapy.Ether(src="00:11:22:33:44:55") / scapy.IP(src="192.168.1.50", dst="192.168.1.1") /
+                   scapy.TCP(sport=5002, dport=53, flags="PA") / scapy.Raw(b"\x00\x1d" + bytes(query)))
+    scapy.wrpcap(path, packets)
+
+
+def count_edits(pcaps: list, expression: str, work_dir: str) -> int:
+    """
+    Fuzz PCAP files with a filter expression, with the CLI tool,
+    and count the edited packets in the edit logs.
+
+    :param pcaps: input PCAP file paths
+    :param expression: filter expression
+    :param work_dir: directory containing the input PCAP files
+    :return: number of edited packets
+    """
+    shutil.rmtree(os.path.join(work_dir, "csv"), ignore_errors=True)
+    subprocess.run([sys.executable, "-m", "pcap_fuzzer", "-d", "-s", "1", "--filter", expression, *pcaps], check=True)
+    edits = 0
+    for csv_log in glob.glob(os.path.join(work_dir, "csv", "*.csv")):
+        with open(csv_log) as f:
+            # Header line, then one line per edited packet
+            edits += sum(1 for _ in f) - 1
+    return edits
+
+
+### MAIN ###
+if __name__ == "__main__":
+
+    # Get paths
+    self_path = Path(os.path.abspath(__file__))
+    base_dir = self_path.parents[1]
+    traces_dir = os.path.join(base_dir, "traces")
+
+    errors = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Sample PCAP files, and synthetic PCAP file with VLAN-tagged frames
+        pcaps = []
+        for path in sorted(glob.glob(f"{traces_dir}/*.pcap")):
+            pcaps.append(shutil.copy(path, work_dir))
+        vlan_pcap = os.path.join(work_dir, "vlan.pcap")
+        write_vlan_pcap(vlan_pcap)
+        pcaps.append(vlan_pcap)
+
+        for expression, expected in CASES:
+            edits = count_edits(pcaps, expression, work_dir)
+            status = "ok" if edits == expected else "MISMATCH"
+            print(f"{status}: --filter \"{expression}\": {edits} edited packets, expected {expected}")
+            errors += edits != expected
+
+        for expression in INVALID:
+            result = subprocess.run([sys.executable, "-m", "pcap_fuzzer", "-d", "--filter", expression, *pcaps],
+                                    capture_output=True, text=True)
+            rejected = result.returncode == 2 and "Invalid filter expression" in result.stderr
+            print(f"{'ok' if rejected else 'MISMATCH'}: invalid --filter \"{expression}\" {'rejected' if rejected else 'accepted'}")
+            errors += not rejected
+
+    if errors > 0:
+        sys.exit(1)
@@ -0,0 +1,82 @@
+# Check the packet template cache (--cache-dir flag) of the CLI tool,
+# when the same input PCAP file is fuzzed by several worker processes:
+# fuzz a PCAP file of a few thousand packets, built from the sample PCAP files,
+# in chunked mode and in variants mode, and check that the cache file holds the template of every packet.
+# Then check that the output of a seeded run using the cache is the same as without cache.
+# Exits with status 1 if templates are missing, or if the outputs differ.
+
+# Imports
+import os
+import sys
+from pathlib import Path
+import glob
+import shutil
+import tempfile
+import subprocess
+import filecmp
+import scapy.all as scapy
+from pcap_fuzzer.templates import TemplateCache
+
+# Number of packets of the fuzzed PCAP file
+PACKETS = 3000
+# Worker processes, and chunks or variants, the PCAP file is fuzzed with
+CASES = [
+    ("chunks", ["-c", "4", "-j", "4"]),
+    ("variants", ["-V", "4", "-j", "4"])
+]
+
+
+def write_pcap(traces_dir: str, path: str) -> None:
+    """
+    Write a PCAP file with PACKETS Ethernet packets, by repeating the packets of the sample PCAP files.
+
+    :param traces_dir: directory of the sample PCAP files
+    :param path: output PCAP file path
+    """
+    packets = []
+    for trace in sorted(glob.glob(f"{traces_dir}/*.pcap")):
+        packets += [packet for packet in scapy.rdpcap(trace) if isinstance(packet, scapy.Ether)]
+    scapy.wrpcap(path, [packets[i % len(packets)] for i in range(PACKETS)])
+
+
+def run(args: list) -> None:
+    """
+    Run the CLI tool.
+
+    :param args: command line arguments
+    """
+    subprocess.run([sys.executable, "-m", "pcap_fuzzer", *args], check=True)
+
+
+### MAIN ###
+if __name__ == "__main__":
+
+    # Get paths
+    self_path = Path(os.path.abspath(__file__))
+    base_dir = self_path.parents[1]
+    traces_dir = os.path.join(base_dir, "traces")
+
+    errors = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_pcap = os.path.join(work_dir, "input.pcap")
+        write_pcap(traces_dir, input_pcap)
+        cache_dir = os.path.join(work_dir, "cache")
+
+        for name, args in CASES:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            run(["-d", "-s", "1", "--cache-dir", cache_dir, *args, input_pcap])
+            templates = len(TemplateCache(cache_dir, input_pcap).templates)
+            status = "ok" if templates == PACKETS else "MISMATCH"
+            print(f"{status}: {name}: {templates} cached packet templates, expected {PACKETS}")
+            errors += templates != PACKETS
+
+        # Seeded run using the filled cache, compared with a run without cache
+        cached_pcap, uncached_pcap = os.path.join(work_dir, "cached.pcap"), os.path.join(work_dir, "uncached.pcap")
+        run(["-s", "1", "--cache-dir", cache_dir, "-c", "4", "-j", "4", "-o", cached_pcap, input_pcap])
+        run(["-s", "1", "-o", uncached_pcap, input_pcap])
+        same = filecmp.cmp(cached_pcap, uncached_pcap, shallow=False)
+        print(f"{'ok' if same else 'MISMATCH'}: output with cached templates {'same as' if same else 'differs from'} output without cache")
+        errors += not same
+
+    if errors > 0:
+        sys.exit(1)
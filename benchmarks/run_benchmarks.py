@@ -0,0 +1,120 @@
+"""
+Benchmark the fuzzing pipeline on synthetic PCAP files.
+
+Each benchmark case runs `fuzz_pcaps` on a synthetic PCAP file, in a fresh worker process,
+and measures the throughput, the peak resident set size
+and the time spent in each stage of the pipeline, per protocol (see `pcap_fuzzer.Stats`).
+Results are written as JSON, to be compared across releases.
+
+Usage example:
+    python benchmarks/run_benchmarks.py --packets 10000 100000 --mix default dns=1 --random-range 1 10 -o results.json
+"""
+
+## Import libraries
+import os
+import sys
+import argparse
+import json
+import time
+import platform
+import resource
+import tempfile
+import multiprocessing
+from importlib import metadata
+# Synthetic PCAP files
+from synthetic import get_pcap
+
+
+def run_case(input_pcap: str, output_dir: str, random_range: int, seed: int) -> dict:
+    """
+    Worker process entry point:
+    fuzz a PCAP file, timing the pipeline stages.
+
+    :param input_pcap: input PCAP file path
+    :param output_dir: directory for the output PCAP and CSV files
+    :param random_range: upper bound for random range (not included)
+    :param seed: base seed for reproducible fuzzing
+    :return: dictionary containing the measurements
+    """
+    import pcap_fuzzer
+    stats = pcap_fuzzer.Stats()
+    output_pcap = os.path.join(output_dir, "output.pcap")
+
+    start = time.perf_counter()
+    pcap_fuzzer.fuzz_pcaps(input_pcap, output=output_pcap, random_range=random_range, seed=seed, stats=stats)
+    elapsed = time.perf_counter() - start
+
+    with open(output_pcap.replace(".pcap", ".csv")) as csv_file:
+        edited = sum(1 for _ in csv_file) - 1
+    return {
+        "seconds": elapsed,
+        "edited": edited,
+        # Linux reports the peak RSS in KiB, macOS in bytes
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+        **stats.to_dict()
+    }
+
+
+def get_version(package: str) -> str:
+    """
+    Get the installed version of a package.
+
+    :param package: package name
+    :return: package version, or None if the package is not installed
+    """
+    try:
+        return metadata.version(package)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+### MAIN ###
+if __name__ == "__main__":
+
+    ## Argument parsing
+    parser = argparse.ArgumentParser(description="Benchmark the fuzzing pipeline on synthetic PCAP files.")
+    parser.add_argument("-p", "--packets", type=int, nargs="+", default=[10000], help="Number(s) of packets of the synthetic PCAP files. Default: 10000.")
+    parser.add_argument("-m", "--mix", type=str, nargs="+", default=["default"],
+                        help="Protocol mix(es) of the synthetic PCAP files, as comma-separated protocol=weight pairs (e.g. dns=3,tcp=1), or 'default'. Default: default.")
+    parser.add_argument("-r", "--random-range", type=int, nargs="+", default=[1, 10], help="Random range(s) to benchmark. Default: 1 10.")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="Seed for the synthetic PCAP files and the fuzzer. Default: 0.")
+    parser.add_argument("-w", "--work-dir", type=str, default=os.path.join(tempfile.gettempdir(), "pcap-fuzzer-benchmarks"),
+                        help="Directory where synthetic PCAP files are cached. Default: <tmp>/pcap-fuzzer-benchmarks.")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Output JSON file path. Default: standard output.")
+    args = parser.parse_args()
+
+    results = {
+        "pcap_fuzzer": get_version("pcap-fuzzer"),
+        "scapy": get_version("scapy"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": []
+    }
+
+    # Each case runs in a fresh process, so the peak RSS only covers that case
+    context = multiprocessing.get_context("spawn")
+    for packets in args.packets:
+        for mix in args.mix:
+            input_pcap = get_pcap(args.work_dir, packets, mix, args.seed)
+            for random_range in args.random_range:
+                with tempfile.TemporaryDirectory(dir=args.work_dir) as output_dir, context.Pool(1) as pool:
+                    measurements = pool.apply(run_case, (input_pcap, output_dir, random_range, args.seed))
+                case = {
+                    "packets": packets,
+                    "mix": mix,
+                    "random_range": random_range,
+                    "input_bytes": os.path.getsize(input_pcap),
+                    "packets_per_second": packets / measurements["seconds"],
+                    **measurements
+                }
+                results["cases"].append(case)
+                print(f"{packets} packets, mix {mix}, random range {random_range}: "
+                      f"{case['packets_per_second']:.0f} packets/s, peak RSS {case['peak_rss_kib']} KiB", file=sys.stderr)
+
+    ## Output results
+    if args.output is None:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,235 @@
+"""
+Generate synthetic PCAP files of configurable size and protocol mix,
+to benchmark the fuzzing pipeline.
+"""
+
+## Import libraries
+import os
+import struct
+import random
+from typing import Dict, List
+# Scapy libraries
+import scapy.all as scapy
+from scapy.layers import dhcp, dns, http
+from scapy.contrib import coap, igmpv3
+
+
+## Constants
+# Number of distinct packets generated for each protocol,
+# which are then repeated to reach the requested capture size
+POOL_SIZE = 64
+# Default protocol mix, as relative weights
+DEFAULT_MIX = {
+    "dns": 20,
+    "mdns": 10,
+    "dhcp": 5,
+    "coap": 10,
+    "http": 10,
+    "arp": 5,
+    "igmpv3": 5,
+    "tcp": 20,
+    "udp": 15
+}
+
+
+def random_mac(rng: random.Random) -> str:
+    """
+    Generate a random, locally administered, MAC address.
+    """
+    return ":".join("%02x" % b for b in [0x02] + [rng.randint(0, 255) for _ in range(5)])
+
+
+def random_ip(rng: random.Random) -> str:
+    """
+    Generate a random private IPv4 address.
+    """
+    return f"192.168.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+
+def ether(rng: random.Random) -> scapy.Packet:
+    """
+    Build an Ethernet layer with random addresses.
+    """
+    return scapy.Ether(src=random_mac(rng), dst=random_mac(rng))
+
+
+def build_dns(rng: random.Random) -> scapy.Packet:
+    """
+    Build a DNS query.
+    """
+    qname = f"host{rng.randint(0, 999)}.example.com"
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst=random_ip(rng)) / \
+        scapy.UDP(sport=rng.randint(1024, 65535), dport=53) / \
+        dns.DNS(id=rng.randint(0, 65535), rd=1, qd=dns.DNSQR(qname=qname, qtype=rng.choice(["A", "AAAA", "TXT"])))
+
+
+def build_mdns(rng: random.Random) -> scapy.Packet:
+    """
+    Build an mDNS query or response.
+    """
+    qname = rng.choice(["_services._dns-sd._udp.local", "_http._tcp.local", "_hap._tcp.local"])
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst="224.0.0.251") / \
+        scapy.UDP(sport=5353, dport=5353) / \
+        dns.DNS(qr=rng.randint(0, 1), qd=dns.DNSQR(qname=qname, qtype="PTR"))
+
+
+def build_dhcp(rng: random.Random) -> scapy.Packet:
+    """
+    Build a DHCP discover or request.
+    """
+    mac = random_mac(rng)
+    return scapy.Ether(src=mac, dst="ff:ff:ff:ff:ff:ff") / scapy.IP(src="0.0.0.0", dst="255.255.255.255") / \
+        scapy.UDP(sport=68, dport=67) / \
+        dhcp.BOOTP(chaddr=bytes.fromhex(mac.replace(":", "")), xid=rng.randint(0, 0xFFFFFFFF)) / \
+        dhcp.DHCP(options=[("message-type", rng.choice(["discover", "request"])), "end"])
+
+
+def build_coap(rng: random.Random) -> scapy.Packet:
+    """
+    Build a CoAP GET request.
+    """
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst=random_ip(rng)) / \
+        scapy.UDP(sport=rng.randint(1024, 65535), dport=5683) / \
+        coap.CoAP(type=0, code=1, msg_id=rng.randint(0, 65535),
+                  options=[("Uri-Path", b"sensors"), ("Uri-Path", b"temp%d" % rng.randint(0, 9))])
+
+
+def build_http(rng: random.Random) -> scapy.Packet:
+    """
+    Build an HTTP GET request.
+    """
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst=random_ip(rng)) / \
+        scapy.TCP(sport=rng.randint(1024, 65535), dport=80, flags="PA", seq=rng.randint(0, 0xFFFFFFFF)) / \
+        http.HTTP() / http.HTTPRequest(Method=b"GET", Path=b"/index%d.html" % rng.randint(0, 99), Host=b"example.com")
+
+
+def build_arp(rng: random.Random) -> scapy.Packet:
+    """
+    Build an ARP request.
+    """
+    mac = random_mac(rng)
+    return scapy.Ether(src=mac, dst="ff:ff:ff:ff:ff:ff") / \
+        scapy.ARP(op=1, hwsrc=mac, psrc=random_ip(rng), pdst=random_ip(rng))
+
+
+def build_igmpv3(rng: random.Random) -> scapy.Packet:
+    """
+    Build an IGMPv3 membership report.
+    """
+    records = [igmpv3.IGMPv3gr(rtype=rng.randint(1, 4), maddr=f"239.255.{rng.randint(0, 255)}.{rng.randint(1, 254)}") for _ in range(rng.randint(1, 3))]
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst="224.0.0.22", ttl=1) / \
+        igmpv3.IGMPv3(type=0x22) / igmpv3.IGMPv3mr(records=records)
+
+
+def build_tcp(rng: random.Random) -> scapy.Packet:
+    """
+    Build a TCP segment with random payload.
+    """
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst=random_ip(rng)) / \
+        scapy.TCP(sport=rng.randint(1024, 65535), dport=rng.choice([443, 8080, 22]), flags="PA", seq=rng.randint(0, 0xFFFFFFFF)) / \
+        scapy.Raw(bytes(rng.randint(0, 255) for _ in range(rng.randint(0, 512))))
+
+
+def build_udp(rng: random.Random) -> scapy.Packet:
+    """
+    Build a UDP datagram with random payload.
+    """
+    return ether(rng) / scapy.IP(src=random_ip(rng), dst=random_ip(rng)) / \
+        scapy.UDP(sport=rng.randint(1024, 65535), dport=rng.choice([123, 3478, 9999, 40000])) / \
+        scapy.Raw(bytes(rng.randint(0, 255) for _ in range(rng.randint(0, 256))))
+
+
+# Packet builders, indexed by protocol name
+BUILDERS = {
+    "dns": build_dns,
+    "mdns": build_mdns,
+    "dhcp": build_dhcp,
+    "coap": build_coap,
+    "http": build_http,
+    "arp": build_arp,
+    "igmpv3": build_igmpv3,
+    "tcp": build_tcp,
+    "udp": build_udp
+}
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    """
+    Parse a protocol mix specification, e.g. "dns=3,tcp=1".
+
+    :param mix: protocol mix specification, as comma-separated protocol=weight pairs,
+                or "default" for the default mix
+    :return: protocol weights, indexed by protocol name
+    :raises ValueError: if the specification is invalid
+    """
+    if mix == "default":
+        return dict(DEFAULT_MIX)
+    weights = {}
+    for item in mix.split(","):
+        protocol, _, weight = item.partition("=")
+        protocol = protocol.strip()
+        if protocol not in BUILDERS:
+            raise ValueError(f"Unknown protocol in mix: {protocol}. Supported protocols: {', '.join(BUILDERS)}")
+        weights[protocol] = int(weight) if weight else 1
+    return weights
+
+
+def build_pool(protocol: str, rng: random.Random) -> List[bytes]:
+    """
+    Build a pool of distinct packets of a given protocol.
+
+    :param protocol: protocol name
+    :param rng: random number generator
+    :return: list of packet wire bytes
+    """
+    return [bytes(BUILDERS[protocol](rng)) for _ in range(POOL_SIZE)]
+
+
+def generate_pcap(output_pcap: str, packets: int, mix: Dict[str, int], seed: int = 0) -> None:
+    """
+    Generate a synthetic Ethernet PCAP file.
+    Packets are drawn from per-protocol pools, following the protocol weights,
+    and written directly as raw records.
+
+    :param output_pcap: output PCAP file path
+    :param packets: number of packets
+    :param mix: protocol weights, indexed by protocol name
+    :param seed: [Optional] seed for the random number generator. Default: 0.
+    """
+    rng = random.Random(seed)
+    protocols = list(mix)
+    weights = [mix[protocol] for protocol in protocols]
+    pools = {protocol: build_pool(protocol, rng) for protocol in protocols}
+    record_header = struct.Struct("<IIII")
+
+    tmp_pcap = f"{output_pcap}.tmp"
+    with open(tmp_pcap, "wb", buffering=1 << 20) as f:
+        # Global header: little endian, microsecond resolution, Ethernet link type
+        f.write(struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        usec = 1700000000 * 1000000
+        for protocol in rng.choices(protocols, weights, k=packets):
+            data = rng.choice(pools[protocol])
+            usec += rng.randint(1, 2000)
+            sec, frac = divmod(usec, 1000000)
+            f.write(record_header.pack(sec, frac, len(data), len(data)))
+            f.write(data)
+    os.replace(tmp_pcap, output_pcap)
+
+
+def get_pcap(work_dir: str, packets: int, mix: str, seed: int = 0) -> str:
+    """
+    Get the path of a synthetic PCAP file, generating it if it does not exist yet.
+
+    :param work_dir: directory where synthetic PCAP files are stored
+    :param packets: number of packets
+    :param mix: protocol mix specification
+    :param seed: [Optional] seed for the random number generator. Default: 0.
+    :return: synthetic PCAP file path
+    """
+    weights = parse_mix(mix)
+    name = "-".join(f"{protocol}{weight}" for protocol, weight in weights.items())
+    output_pcap = os.path.join(work_dir, f"synthetic-{packets}-{name}-{seed}.pcap")
+    if not os.path.exists(output_pcap):
+        os.makedirs(work_dir, exist_ok=True)
+        generate_pcap(output_pcap, packets, weights, seed)
+    return output_pcap
@@ -3,3 +3,4 @@ Initialization script for package `pcap-fuzzer`.
 """
 
 from .pcap_fuzzer import fuzz_pcaps
+from .stats import Stats
@@ -1,7 +1,15 @@
+import sys
 import argparse
 import logging
-from .arg_types import strictly_positive_int
+from .arg_types import strictly_positive_int, percentage, packet_numbers, packet_filter
+from .selection import read_packet_numbers_file
 from .pcap_fuzzer import fuzz_pcaps
+from .stats import Stats
+from .compression import COMPRESSIONS
+from .edit_log import LOG_FORMATS
+from .packet.hashing import HASH_ALGORITHMS
+from .pipeline import PIPELINE_MODES
+from .reader import STDIO
 
 
 ### MAIN FUNCTION ###
@@ -13,33 +21,124 @@ def main() -> None:
         description="Randomly edit packet fields in a PCAP file."
     )
     # Positional arguments: input PCAP file(s)
-    parser.add_argument("input_pcaps", metavar="pcap", type=str, nargs="+", help="Input PCAP file(s).")
+    parser.add_argument("input_pcaps", metavar="pcap", type=str, nargs="+", help="Input PCAP file(s), possibly compressed (.gz, .zst or .xz), or - to read the standard input. The standard input is read in the main process, so it cannot be combined with -j/--jobs greater than 1 together with other input files or -V/--variants, unless --pipeline is specified.")
     # Optional flag: -o / --output
-    parser.add_argument("-o", "--output", type=str, default=None, help="Output PCAP (and CSV) file path. Used only if a single input file is specified. Default: edited/<input_pcap>.edit.pcap")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Output PCAP (and CSV) file path, or - to write the standard output. Used only if a single input file is specified. Default: edited/<input_pcap>.edit.pcap, or the standard output if the input is the standard input.")
+    # Optional flag: --log
+    parser.add_argument("--log", type=str, default=None,
+                        help="Edit log file path, e.g. /dev/fd/3 to write it to an open file descriptor. Used only if a single input file is specified. Default: <output_pcap>.csv, or csv/<input_pcap>.edit.csv if the output is not a file.")
     # Optional flag: -r / --random-range
     parser.add_argument("-r", "--random-range", type=strictly_positive_int, default=1,
                         help="Upper bound for random range (not included). Must be a strictly positive integer. Default: 1 (edit each packet).")
     # Optional flag: -n / --packet-number
-    parser.add_argument("-n", "--packet-number", type=int, action="append",
-                        help="Index of the packet to edit, starting form 1. Can be specifed multiple times.")
+    parser.add_argument("-n", "--packet-number", type=packet_numbers, action="append",
+                        help="Index of the packet to edit, starting form 1, or range of indices, e.g. 100-200. Can be specifed multiple times.")
+    # Optional flag: --packet-numbers-file
+    parser.add_argument("--packet-numbers-file", type=str, action="append",
+                        help="File containing indices and ranges of indices of the packets to edit, separated by commas, spaces or newlines. Can be specifed multiple times.")
+    # Optional flag: --filter
+    parser.add_argument("--filter", dest="packet_filter", metavar="EXPRESSION", type=packet_filter, default=None,
+                        help="Only edit the selected packets which match a filter expression, in a subset of the tcpdump syntax: protocols (ether, arp, ip, ip6, icmp, icmp6, igmp, tcp, udp), [src|dst] host, ether [src|dst] host, [tcp|udp] [src|dst] port and [ip|ip6] proto, combined with and, or, not and parentheses, e.g. \"udp dst port 53 and dst host 192.168.1.1\". Non-matching packets are copied without being dissected. With -k/--edit-count or -p/--edit-percent, packets are selected among the matching packets. Default: no filter.")
+    # Optional flag: -k / --edit-count
+    parser.add_argument("-k", "--edit-count", type=strictly_positive_int, default=None,
+                        help="Exact number of packets to edit in each input PCAP file, randomly selected. Overrides the random range.")
+    # Optional flag: -p / --edit-percent
+    parser.add_argument("-p", "--edit-percent", type=percentage, default=None,
+                        help="Percentage of packets to edit in each input PCAP file, randomly selected. Overrides the random range.")
     # Optional flag: -d / --dry-run
     parser.add_argument("-d", "--dry-run", action="store_true",
                         help="Dry run: do not write output PCAP file.")
+    # Optional flag: -j / --jobs
+    parser.add_argument("-j", "--jobs", type=strictly_positive_int, default=1,
+                        help="Number of worker processes among which input PCAP files are spread. Must be a strictly positive integer. Default: 1 (sequential).")
+    # Optional flag: -c / --chunks
+    parser.add_argument("-c", "--chunks", type=strictly_positive_int, default=1,
+                        help="Number of record ranges each input PCAP file is split into, to be fuzzed in parallel by the worker processes. Must be a strictly positive integer. Default: 1 (files are not split).")
+    # Optional flag: -s / --seed
+    parser.add_argument("-s", "--seed", type=int, default=None,
+                        help="Base seed for reproducible fuzzing. Each packet is edited with a random generator derived from the seed, the input file name and the packet number. Default: not seeded.")
+    # Optional flag: -V / --variants
+    parser.add_argument("-V", "--variants", type=strictly_positive_int, default=1,
+                        help="Number of fuzzed variants produced for each input PCAP file, which is read only once. Each variant is fuzzed with its own seed. Must be a strictly positive integer. Default: 1.")
+    # Optional flag: --compress
+    parser.add_argument("--compress", type=str, choices=[*COMPRESSIONS, "none"], default=None,
+                        help="Compression of the output PCAP file(s). Default: from the output file extension if specified, otherwise same as the input file(s).")
+    # Optional flag: --log-format
+    parser.add_argument("--log-format", type=str, choices=list(LOG_FORMATS), default="csv",
+                        help="Format of the edit log file(s). Parquet and Arrow IPC require the pyarrow package. Default: csv.")
+    # Optional flag: --hash
+    parser.add_argument("--hash", type=str, choices=list(HASH_ALGORITHMS), default="sha256",
+                        help="Algorithm hashing the packet payloads in the edit log. blake2b gives shorter 64-bit digests, xxhash (requires the xxhash package) is the fastest, none leaves the hashes empty. Default: sha256.")
+    # Optional flag: --cache-dir
+    parser.add_argument("--cache-dir", type=str, default=None,
+                        help="Directory of the packet template cache. Dissection results are cached for each input PCAP file, keyed by its content hash, so the next runs on the same files skip packet dissection when possible. Default: no cache.")
+    # Optional flag: --pipeline
+    parser.add_argument("--pipeline", type=str, choices=list(PIPELINE_MODES), default=None,
+                        help="Pipelined mode: each input PCAP file is read, fuzzed by the -j/--jobs worker threads or processes, and written concurrently, in the input order. Cannot be combined with -c/--chunks or -V/--variants. Default: not pipelined.")
+    # Optional flag: -v / --verbose
+    parser.add_argument("-v", "--verbose", action="count", default=0,
+                        help="Log progress information. Specify twice to also log each packet edit.")
+    # Optional flag: --stats
+    parser.add_argument("--stats", action="store_true",
+                        help="Print a summary of the time spent in each fuzzing stage, per protocol, and of the fallbacks.")
     # Parse arguments
     args = parser.parse_args()
+    if args.verbose > 0:
+        logging.basicConfig(level=logging.INFO if args.verbose == 1 else logging.DEBUG)
     # Verify arguments
     if args.output is not None and len(args.input_pcaps) > 1:
         logging.warning("Multiple input PCAP files specified, ignoring output PCAP file name.")
+    if args.edit_count is not None and args.edit_percent is not None:
+        parser.error("argument -k/--edit-count: not allowed with argument -p/--edit-percent")
+    if (args.edit_count is not None or args.edit_percent is not None) and (args.packet_number is not None or args.packet_numbers_file is not None):
+        parser.error("packet numbers cannot be specified together with an exact count or percentage of packets to edit")
+    if STDIO in args.input_pcaps and (args.edit_count is not None or args.edit_percent is not None or args.chunks > 1 or args.cache_dir is not None):
+        parser.error("the standard input cannot be fuzzed with arguments -k/--edit-count, -p/--edit-percent, -c/--chunks or --cache-dir")
+    if STDIO in args.input_pcaps and args.jobs > 1 and args.pipeline is None and (len(args.input_pcaps) > 1 or args.variants > 1):
+        parser.error("the standard input cannot be fuzzed by worker processes: argument -j/--jobs is not allowed with multiple input files or -V/--variants, unless --pipeline is specified")
+    # Whether the fuzzed packets are written to the standard output
+    to_stdout = args.output == STDIO or (args.output is None and args.input_pcaps == [STDIO])
+    if to_stdout and (args.chunks > 1 or args.variants > 1):
+        parser.error("the standard output cannot be written with arguments -c/--chunks or -V/--variants")
+    if args.pipeline is not None and (args.chunks > 1 or args.variants > 1):
+        parser.error("argument --pipeline: not allowed with arguments -c/--chunks or -V/--variants")
+    # Packet numbers to edit, from the command line and from files
+    selected = None
+    if args.packet_number is not None or args.packet_numbers_file is not None:
+        selected = [r for ranges in args.packet_number or [] for r in ranges]
+        for path in args.packet_numbers_file or []:
+            try:
+                selected += read_packet_numbers_file(path)
+            except (OSError, ValueError) as e:
+                parser.error(f"Cannot read packet numbers file {path}: {e}")
 
 
     ## Start fuzzing PCAP files
+    stats = Stats() if args.stats else None
     fuzz_pcaps(
         pcaps=args.input_pcaps,
         output=args.output,
         random_range=args.random_range,
-        packet_numbers=args.packet_number,
-        dry_run=args.dry_run
+        packet_numbers=selected,
+        dry_run=args.dry_run,
+        jobs=args.jobs,
+        chunks=args.chunks,
+        seed=args.seed,
+        variants=args.variants,
+        edit_count=args.edit_count,
+        edit_percent=args.edit_percent,
+        stats=stats,
+        compress=args.compress,
+        log_format=args.log_format,
+        hash_algorithm=args.hash,
+        cache_dir=args.cache_dir,
+        pipeline=args.pipeline,
+        log=args.log,
+        packet_filter=args.packet_filter
     )
+    if stats is not None:
+        # Keep the standard output for the fuzzed packets
+        print(stats.summary(), file=sys.stderr if to_stdout else sys.stdout)
 
 
 ### ENTRY POINT ###
@@ -1,4 +1,7 @@
 import argparse
+from typing import List, Tuple
+from .selection import parse_packet_numbers
+from .filter import PacketFilter
 
 
 def strictly_positive_int(value: any) -> int:
@@ -17,3 +20,51 @@ def strictly_positive_int(value: any) -> int:
         if ivalue < 1:
             raise argparse.ArgumentTypeError(f"{value} does not represent a strictly positive integer.")
         return ivalue
+
+
+def percentage(value: any) -> float:
+    """
+    Custom argparse type for a percentage, strictly greater than 0 and at most 100.
+
+    :param value: argument value to check
+    :return: argument as float if it is a valid percentage
+    :raises argparse.ArgumentTypeError: if argument does not represent a valid percentage
+    """
+    try:
+        fvalue = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} does not represent a number.")
+    else:
+        if not 0 < fvalue <= 100:
+            raise argparse.ArgumentTypeError(f"{value} does not represent a percentage between 0 (excluded) and 100.")
+        return fvalue
+
+
+def packet_numbers(value: any) -> List[Tuple[int, int]]:
+    """
+    Custom argparse type for packet numbers and ranges of packet numbers,
+    e.g. "5", "100-200" or "1,3,7-9".
+
+    :param value: argument value to check
+    :return: list of ranges of packet numbers, as (first, last) tuples
+    :raises argparse.ArgumentTypeError: if argument does not represent packet numbers or ranges
+    """
+    try:
+        return parse_packet_numbers(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def packet_filter(value: any) -> PacketFilter:
+    """
+    Custom argparse type for a packet filter expression,
+    in a subset of the tcpdump syntax, e.g. "udp dst port 53 and dst host 192.168.1.1".
+
+    :param value: argument value to check
+    :return: compiled packet filter
+    :raises argparse.ArgumentTypeError: if argument is not a valid filter expression
+    """
+    try:
+        return PacketFilter(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
@@ -0,0 +1,124 @@
+"""
+Split a PCAP file into ranges of records,
+and merge the PCAP and CSV files produced for each range.
+"""
+
+## Import libraries
+import os
+import struct
+import shutil
+from typing import List, NamedTuple
+from .compression import get_compression, open_compressed
+
+
+## Constants
+# Classic PCAP magic numbers, and corresponding endianness
+PCAP_MAGICS = {
+    b"\xa1\xb2\xc3\xd4": ">",  # Big endian, microsecond resolution
+    b"\xd4\xc3\xb2\xa1": "<",  # Little endian, microsecond resolution
+    b"\xa1\xb2\x3c\x4d": ">",  # Big endian, nanosecond resolution
+    b"\x4d\x3c\xb2\xa1": "<"   # Little endian, nanosecond resolution
+}
+# Header lengths (in bytes)
+GLOBAL_HEADER_LENGTH = 24
+RECORD_HEADER_LENGTH = 16
+
+
+class RecordRange(NamedTuple):
+    """
+    Range of consecutive records in a PCAP file.
+    """
+    offset: int    # Byte offset of the first record header in the file
+    first_id: int  # Packet number of the first record (starting from 1)
+    count: int     # Number of records in the range
+
+
+def split_pcap(input_pcap: str, n: int) -> List[RecordRange]:
+    """
+    Split a classic PCAP file into (at most) n ranges of records of similar byte size.
+    Only the record headers are read, not the packet data.
+
+    :param input_pcap: input PCAP file path
+    :param n: number of ranges
+    :return: list of record ranges, in file order
+    :raises ValueError: if the file is not a classic PCAP file
+    """
+    file_size = os.path.getsize(input_pcap)
+    ranges = []
+
+    with open(input_pcap, "rb", buffering=1 << 20) as f:
+        global_header = f.read(GLOBAL_HEADER_LENGTH)
+        endian = PCAP_MAGICS.get(global_header[:4])
+        if endian is None or len(global_header) < GLOBAL_HEADER_LENGTH:
+            raise ValueError(f"Not a classic PCAP file: {input_pcap}")
+        record_header = struct.Struct(endian + "IIII")
+
+        # Byte size targeted for each range
+        range_size = max(1, (file_size - GLOBAL_HEADER_LENGTH) // n)
+        offset = GLOBAL_HEADER_LENGTH
+        range_offset = offset
+        range_first_id = 1
+        i = 1
+        while True:
+            header = f.read(RECORD_HEADER_LENGTH)
+            if len(header) < RECORD_HEADER_LENGTH:
+                break
+            caplen = record_header.unpack(header)[2]
+            f.seek(caplen, os.SEEK_CUR)
+            offset += RECORD_HEADER_LENGTH + caplen
+            i += 1
+            # Close current range if it reached the targeted size
+            if offset - range_offset >= range_size and len(ranges) < n - 1:
+                ranges.append(RecordRange(range_offset, range_first_id, i - range_first_id))
+                range_offset = offset
+                range_first_id = i
+
+        # Last range
+        if i > range_first_id:
+            ranges.append(RecordRange(range_offset, range_first_id, i - range_first_id))
+
+    return ranges
+
+
+def merge_pcaps(part_pcaps: List[str], output_pcap: str) -> None:
+    """
+    Concatenate PCAP files sharing the same global header into a single PCAP file.
+    The output is written to a temporary file, renamed to the output file once complete,
+    or deleted if an error occurs, leaving any previous output file untouched.
+
+    :param part_pcaps: list of PCAP files to merge, in order
+    :param output_pcap: output PCAP file path, compressed if it has a compression extension
+    """
+    tmp_pcap = f"{output_pcap}.tmp"
+    compression = get_compression(output_pcap)
+    try:
+        with (open(tmp_pcap, "wb") if compression is None else open_compressed(tmp_pcap, "wb", compression)) as output_file:
+            for i, part_pcap in enumerate(part_pcaps):
+                with open(part_pcap, "rb") as part_file:
+                    # Only keep the global header of the first file
+                    if i > 0:
+                        part_file.seek(GLOBAL_HEADER_LENGTH)
+                    shutil.copyfileobj(part_file, output_file)
+    except BaseException:
+        try:
+            os.remove(tmp_pcap)
+        except FileNotFoundError:
+            pass
+        raise
+    os.replace(tmp_pcap, output_pcap)
+
+
+def merge_csvs(part_csvs: List[str], csv_log: str) -> None:
+    """
+    Concatenate CSV files sharing the same header line into a single CSV file.
+
+    :param part_csvs: list of CSV files to merge, in order
+    :param csv_log: output CSV file path
+    """
+    with open(csv_log, "wb") as output_file:
+        for i, part_csv in enumerate(part_csvs):
+            with open(part_csv, "rb") as part_file:
+                # Only keep the header line of the first file
+                if i > 0:
+                    part_file.readline()
+                shutil.copyfileobj(part_file, output_file)
@@ -0,0 +1,171 @@
+"""
+Compressed capture files (gzip, zstd and xz):
+detection from the file extension,
+and streaming (de)compression.
+Zstandard support requires the optional `zstandard` package.
+"""
+
+from __future__ import annotations
+from typing import BinaryIO, Optional, Tuple
+import os
+import gzip
+import lzma
+import queue
+import threading
+
+
+## Constants
+# File extension of each compression format
+COMPRESSIONS = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+    "xz": ".xz"
+}
+# Size of the decompressed chunks produced by the background thread (in bytes)
+CHUNK_SIZE = 1 << 20
+# Maximum number of decompressed chunks waiting to be read
+QUEUE_SIZE = 8
+
+
+def get_compression(path: str) -> Optional[str]:
+    """
+    Get the compression format of a file from its extension.
+
+    :param path: file path
+    :return: compression format, or None if the file is not compressed
+    """
+    for compression, extension in COMPRESSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+def split_capture_path(path: str) -> Tuple[str, str, str]:
+    """
+    Split a capture file path into its root, its capture extension and its compression extension,
+    e.g. "dir/trace.pcap.gz" into ("dir/trace", ".pcap", ".gz").
+
+    :param path: capture file path
+    :return: tuple containing the path root, the capture extension (possibly empty)
+             and the compression extension (possibly empty)
+    """
+    compression = get_compression(path)
+    compression_ext = COMPRESSIONS[compression] if compression is not None else ""
+    root, ext = os.path.splitext(path[:len(path) - len(compression_ext)])
+    return root, ext, compression_ext
+
+
+def set_compression(path: str, compression: str) -> str:
+    """
+    Replace the compression extension of a file path.
+
+    :param path: file path
+    :param compression: compression format, or "none" to remove the compression extension
+    :return: file path with the extension of the given compression format
+    """
+    root, ext, _ = split_capture_path(path)
+    return root + ext + COMPRESSIONS.get(compression, "")
+
+
+def open_compressed(path: str, mode: str = "rb", compression: str = None) -> BinaryIO:
+    """
+    Open a compressed file for streaming reading or writing.
+
+    :param path: file path
+    :param mode: opening mode, "rb" or "wb"
+    :param compression: [Optional] compression format. Default: None (detect from the file extension).
+    :return: binary file object, decompressing on read or compressing on write
+    :raises ValueError: if the file is not compressed
+    :raises ImportError: if the compression format requires a package which is not installed
+    """
+    compression = get_compression(path) if compression is None else compression
+    if compression == "gzip":
+        # Faster than the default level 9, with a similar compression ratio on captures
+        return gzip.open(path, mode, compresslevel=6) if "w" in mode else gzip.open(path, mode)
+    if compression == "xz":
+        return lzma.open(path, mode)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("Zstandard support requires the zstandard package: pip install pcap-fuzzer[zstd]")
+        return zstandard.open(path, mode)
+    raise ValueError(f"Not a compressed file: {path}")
+
+
+
+class BackgroundReader:
+    """
+    Reader decompressing a file in a background thread,
+    so decompression overlaps with the processing of the decompressed data.
+    """
+
+    def __init__(self, path: str, compression: str = None) -> None:
+        """
+        Open a compressed file and start decompressing it.
+
+        :param path: compressed file path
+        :param compression: [Optional] compression format. Default: None (detect from the file extension).
+        """
+        self.f = open_compressed(path, "rb", compression)
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.closed = False
+        self.eof = False
+        self.thread = threading.Thread(target=self.decompress, name=f"decompress-{os.path.basename(path)}", daemon=True)
+        self.thread.start()
+
+
+    def decompress(self) -> None:
+        """
+        Background thread: decompress the file by chunks, until end of file or until closed.
+        The end of the file is signalled by an empty chunk, and errors by the exception itself.
+        """
+        try:
+            while not self.closed:
+                chunk = self.f.read(CHUNK_SIZE)
+                self.put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self.put(e)
+
+
+    def put(self, item) -> None:
+        """
+        Queue an item for the reader, unless the reader is closed.
+
+        :param item: decompressed chunk or exception
+        """
+        while not self.closed:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+    def read(self) -> bytes:
+        """
+        Get the next decompressed chunk.
+
+        :return: next decompressed chunk, or empty bytes at the end of the file
+        :raises Exception: the exception raised while decompressing, if any
+        """
+        if self.eof:
+            return b""
+        item = self.queue.get()
+        if isinstance(item, Exception):
+            self.eof = True
+            raise item
+        if not item:
+            self.eof = True
+        return item
+
+
+    def close(self) -> None:
+        """
+        Stop decompressing, and close the file.
+        """
+        self.closed = True
+        self.thread.join()
+        self.f.close()
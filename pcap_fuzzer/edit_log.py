@@ -0,0 +1,266 @@
+"""
+Log of the packet edits, written in batches,
+as CSV or, with the optional `pyarrow` package, as Parquet or Arrow IPC files.
+The log format is given by the log file extension.
+"""
+
+from __future__ import annotations
+from typing import Iterator, List
+from abc import ABC, abstractmethod
+import os
+import csv
+from .chunks import merge_csvs
+
+
+## Constants
+# Log file extension of each log format
+LOG_FORMATS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow"
+}
+# Number of edit records buffered before being written
+BATCH_SIZE = 4096
+
+
+class EditRecord:
+    """
+    Information about one packet edit.
+    """
+    __slots__ = ("id", "timestamp", "protocol", "field", "old_value", "new_value", "old_hash", "new_hash")
+
+    # Log columns, in order
+    FIELDS = __slots__
+
+
+    def __init__(self, id: int, timestamp, protocol: str, field: str, old_value, new_value, old_hash: str, new_hash: str) -> None:
+        """
+        Edit record constructor.
+
+        :param id: packet number (starting from 1)
+        :param timestamp: packet timestamp, in seconds
+        :param protocol: edited protocol layer name
+        :param field: edited field name
+        :param old_value: old field value
+        :param new_value: new field value
+        :param old_hash: packet hash before the edit
+        :param new_hash: packet hash after the edit
+        """
+        self.id = id
+        self.timestamp = timestamp
+        self.protocol = protocol
+        self.field = field
+        self.old_value = old_value
+        self.new_value = new_value
+        self.old_hash = old_hash
+        self.new_hash = new_hash
+
+
+    def __iter__(self) -> Iterator:
+        """
+        Iterate over the field values, in log column order.
+        """
+        return (getattr(self, field) for field in self.FIELDS)
+
+
+    def __repr__(self) -> str:
+        return f"EditRecord({', '.join(f'{field}={getattr(self, field)!r}' for field in self.FIELDS)})"
+
+
+
+def get_log_format(path: str) -> str:
+    """
+    Get the format of an edit log file from its extension.
+
+    :param path: edit log file path
+    :return: log format, "csv" if the extension is not recognized
+    """
+    ext = os.path.splitext(path)[1]
+    for log_format, log_ext in LOG_FORMATS.items():
+        if ext == log_ext:
+            return log_format
+    return "csv"
+
+
+def import_pyarrow():
+    """
+    Import the optional `pyarrow` package.
+
+    :return: pyarrow module
+    :raises ImportError: if pyarrow is not installed
+    """
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow edit logs require the pyarrow package: pip install pcap-fuzzer[arrow]")
+    return pyarrow
+
+
+
+class EditLog(ABC):
+    """
+    Writer of edit records, buffering them and writing them in batches.
+    Use `open_edit_log` to get the writer matching a log file extension.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the edit log file.
+
+        :param path: edit log file path
+        """
+        self.path = path
+        self.batch: List[EditRecord] = []
+
+
+    def __enter__(self) -> EditLog:
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def append(self, record: EditRecord) -> None:
+        """
+        Add an edit record to the log, writing the current batch if it is full.
+
+        :param record: edit record
+        """
+        self.batch.append(record)
+        if len(self.batch) >= BATCH_SIZE:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """
+        Write the buffered edit records.
+        """
+        if self.batch:
+            self.write_batch(self.batch)
+            self.batch = []
+
+
+    @abstractmethod
+    def write_batch(self, batch: List[EditRecord]) -> None:
+        """
+        Write a batch of edit records.
+        Must be implemented by child classes.
+
+        :param batch: edit records
+        """
+
+
+    def close(self) -> None:
+        """
+        Write the buffered edit records, and close the log file.
+        """
+        self.flush()
+
+
+
+class CsvEditLog(EditLog):
+    """
+    Edit log written as a CSV file, with a header line.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.f = open(path, "w", newline="")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(EditRecord.FIELDS)
+
+
+    def write_batch(self, batch: List[EditRecord]) -> None:
+        self.writer.writerows(batch)
+
+
+    def close(self) -> None:
+        super().close()
+        self.f.close()
+
+
+
+class ArrowEditLog(EditLog):
+    """
+    Edit log written as a Parquet or Arrow IPC file, one row group or record batch per batch of edit records.
+    Timestamps are stored as nanoseconds since the epoch, field values as their string representation.
+    """
+
+    def __init__(self, path: str, log_format: str = "parquet") -> None:
+        super().__init__(path)
+        pa = import_pyarrow()
+        self.pa = pa
+        self.schema = pa.schema([
+            ("id", pa.int64()),
+            ("timestamp", pa.timestamp("ns", tz="UTC")),
+            ("protocol", pa.string()),
+            ("field", pa.string()),
+            ("old_value", pa.string()),
+            ("new_value", pa.string()),
+            ("old_hash", pa.string()),
+            ("new_hash", pa.string())
+        ])
+        if log_format == "parquet":
+            self.writer = pa.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+
+
+    def write_batch(self, batch: List[EditRecord]) -> None:
+        columns = [
+            [record.id for record in batch],
+            [int(record.timestamp * 1000000000) for record in batch],
+            [record.protocol for record in batch],
+            [record.field for record in batch],
+            [str(record.old_value) for record in batch],
+            [str(record.new_value) for record in batch],
+            [record.old_hash for record in batch],
+            [record.new_hash for record in batch]
+        ]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+
+    def close(self) -> None:
+        super().close()
+        self.writer.close()
+
+
+
+def open_edit_log(path: str) -> EditLog:
+    """
+    Open an edit log, in the format given by its file extension.
+
+    :param path: edit log file path
+    :return: edit log writer
+    """
+    log_format = get_log_format(path)
+    if log_format == "csv":
+        return CsvEditLog(path)
+    return ArrowEditLog(path, log_format)
+
+
+def merge_edit_logs(part_logs: List[str], path: str) -> None:
+    """
+    Concatenate edit logs of the same format into a single edit log.
+
+    :param part_logs: list of edit log files to merge, in order
+    :param path: output edit log file path
+    """
+    log_format = get_log_format(path)
+    if log_format == "csv":
+        merge_csvs(part_logs, path)
+        return
+    pa = import_pyarrow()
+    if log_format == "parquet":
+        tables = [pa.parquet.read_table(part_log) for part_log in part_logs]
+    else:
+        tables = []
+        for part_log in part_logs:
+            with pa.ipc.open_file(part_log) as reader:
+                tables.append(reader.read_all())
+    with open_edit_log(path) as edit_log:
+        for table in tables:
+            edit_log.writer.write_table(table)
@@ -0,0 +1,513 @@
+"""
+Filter on the packets to edit, given as an expression in a subset of the tcpdump (pcap-filter) syntax,
+e.g. "udp dst port 53 and dst host 192.168.1.1", or "udp port 67 and ether src 00:11:22:33:44:55".
+The expression is compiled into a matcher which reads the raw record bytes,
+so packets are matched without being dissected by Scapy.
+
+Supported primitives:
+    - protocols: ether, arp, ip, ip6, icmp, icmp6, igmp, tcp, udp
+    - [ip|ip6|arp] [src|dst] host <IPv4 or IPv6 address>, also matching ARP sender and target addresses
+    - ether [src|dst] [host] <MAC address>
+    - [tcp|udp] [src|dst] port <port number or service name>
+    - [ip|ip6] proto <IP protocol number>
+Directions can also be "src or dst" (the default) or "src and dst".
+Primitives are combined with "not" / "!", "and" / "&&", "or" / "||" and parentheses.
+As with tcpdump, "not" has the highest precedence, and "and" and "or" have the same precedence,
+and are evaluated from left to right.
+
+Link layers: Ethernet (possibly VLAN-tagged), Linux cooked capture and raw IP.
+Packets of other link types only match negated primitives.
+"""
+
+from __future__ import annotations
+from typing import Callable, Iterable, List, NamedTuple, Optional, Union
+import re
+import socket
+import struct
+import ipaddress
+from .reader import Record
+
+
+## Constants
+# Link types
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+# EtherTypes
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_ARP = 0x0806
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+# Greatest 802.3 length field value, above which the field is an EtherType
+ETHER_MAX_LENGTH = 1500
+# IP protocol numbers
+PROTOCOLS = {"icmp": 1, "igmp": 2, "tcp": 6, "udp": 17, "icmp6": 58}
+# IPv6 extension headers which are skipped to find the transport protocol
+IPV6_EXTENSION_HEADERS = (0, 43, 60)
+IPV6_FRAGMENT_HEADER = 44
+# EtherTypes matched by protocol names, and by the host primitive
+NETWORK_PROTOCOLS = {"ip": ETHERTYPE_IPV4, "ip6": ETHERTYPE_IPV6, "arp": ETHERTYPE_ARP}
+HOST_ETHERTYPES = (ETHERTYPE_IPV4, ETHERTYPE_IPV6, ETHERTYPE_ARP)
+# Tokens of a filter expression
+TOKEN_PATTERN = re.compile(r"\(|\)|&&|\|\||!|[^\s()!&|]+")
+DIRECTIONS = ("src", "dst")
+AND = ("and", "&&")
+OR = ("or", "||")
+NOT = ("not", "!")
+
+
+class Headers(NamedTuple):
+    """
+    Header fields of a packet which can be matched by a filter, read from its raw bytes.
+    Fields which are not present in the packet are None.
+    """
+    ether_src: Optional[bytes] = None  # Source MAC address
+    ether_dst: Optional[bytes] = None  # Destination MAC address
+    ethertype: Optional[int] = None    # EtherType of the network layer, after VLAN tags
+    src: Optional[bytes] = None        # Source IPv4 or IPv6 address, or ARP sender protocol address
+    dst: Optional[bytes] = None        # Destination IPv4 or IPv6 address, or ARP target protocol address
+    proto: Optional[int] = None        # IP protocol, after IPv6 extension headers
+    sport: Optional[int] = None        # TCP or UDP source port, in the first fragment only
+    dport: Optional[int] = None        # TCP or UDP destination port, in the first fragment only
+
+
+# Predicate on the header fields of a packet
+Predicate = Callable[[Headers], bool]
+
+
+def read_link_layer(data: memoryview, linktype: int):
+    """
+    Read the link layer of a packet.
+
+    :param data: packet bytes
+    :param linktype: packet link type
+    :return: tuple containing the source and destination MAC addresses (None if not available),
+             the EtherType and the offset of the network layer,
+             or None if the link layer is not supported, or the packet is truncated
+    """
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None
+        offset = 12
+        ethertype, = struct.unpack_from("!H", data, offset)
+        while ethertype in ETHERTYPE_VLAN and len(data) >= offset + 6:
+            offset += 4
+            ethertype, = struct.unpack_from("!H", data, offset)
+        if ethertype <= ETHER_MAX_LENGTH:
+            # 802.3 frame, without EtherType
+            ethertype = None
+        return bytes(data[6:12]), bytes(data[0:6]), ethertype, offset + 2
+    if linktype == LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return None
+        address_type, address_length = struct.unpack_from("!HH", data, 2)
+        # Source address, if it is a MAC address
+        ether_src = bytes(data[6:12]) if address_type == 1 and address_length == 6 else None
+        ethertype, = struct.unpack_from("!H", data, 14)
+        return ether_src, None, ethertype, 16
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        if len(data) < 1:
+            return None
+        version = data[0] >> 4
+        ethertype = ETHERTYPE_IPV4 if version == 4 else ETHERTYPE_IPV6 if version == 6 else None
+        return None, None, ethertype, 0
+    return None
+
+
+def read_headers(data: memoryview, linktype: int) -> Headers:
+    """
+    Read the header fields of a packet which can be matched by a filter.
+
+    :param data: packet bytes
+    :param linktype: packet link type
+    :return: header fields of the packet
+    """
+    link_layer = read_link_layer(data, linktype)
+    if link_layer is None:
+        return Headers()
+    ether_src, ether_dst, ethertype, offset = link_layer
+    src, dst, proto, transport = None, None, None, None
+
+    if ethertype == ETHERTYPE_IPV4 and len(data) >= offset + 20 and data[offset] >> 4 == 4:
+        ihl = (data[offset] & 0x0F) * 4
+        flags_offset, = struct.unpack_from("!H", data, offset + 6)
+        proto = data[offset + 9]
+        src, dst = bytes(data[offset + 12:offset + 16]), bytes(data[offset + 16:offset + 20])
+        if ihl >= 20 and flags_offset & 0x1FFF == 0:
+            transport = offset + ihl
+    elif ethertype == ETHERTYPE_IPV6 and len(data) >= offset + 40 and data[offset] >> 4 == 6:
+        proto = data[offset + 6]
+        src, dst = bytes(data[offset + 8:offset + 24]), bytes(data[offset + 24:offset + 40])
+        transport = offset + 40
+        # Skip extension headers
+        while transport is not None and len(data) >= transport + 8:
+            if proto in IPV6_EXTENSION_HEADERS:
+                proto, length = data[transport], (data[transport + 1] + 1) * 8
+                transport += length
+            elif proto == IPV6_FRAGMENT_HEADER:
+                fragment_offset, = struct.unpack_from("!H", data, transport + 2)
+                proto = data[transport]
+                transport = transport + 8 if fragment_offset >> 3 == 0 else None
+            else:
+                break
+    elif ethertype == ETHERTYPE_ARP and len(data) >= offset + 8:
+        hlen, plen = data[offset + 4], data[offset + 5]
+        if len(data) >= offset + 8 + 2 * (hlen + plen):
+            src_offset = offset + 8 + hlen
+            dst_offset = src_offset + plen + hlen
+            src, dst = bytes(data[src_offset:src_offset + plen]), bytes(data[dst_offset:dst_offset + plen])
+
+    sport, dport = None, None
+    if transport is not None and proto in (PROTOCOLS["tcp"], PROTOCOLS["udp"]) and len(data) >= transport + 4:
+        sport, dport = struct.unpack_from("!HH", data, transport)
+    return Headers(ether_src, ether_dst, ethertype, src, dst, proto, sport, dport)
+
+
+
+class FilterParser:
+    """
+    Recursive descent parser of a filter expression,
+    building the predicate the expression stands for.
+    """
+
+    def __init__(self, expression: str) -> None:
+        """
+        Filter parser constructor.
+
+        :param expression: filter expression
+        """
+        self.expression = expression
+        self.tokens = TOKEN_PATTERN.findall(expression)
+        self.position = 0
+
+
+    def error(self, message: str) -> ValueError:
+        """
+        Build the error raised for an invalid expression.
+
+        :param message: error description
+        :return: error to raise
+        """
+        return ValueError(f"Invalid filter expression \"{self.expression}\": {message}")
+
+
+    def peek(self, offset: int = 0) -> Optional[str]:
+        """
+        Get a token without consuming it.
+
+        :param offset: [Optional] offset of the token from the current position. Default: 0.
+        :return: token, or None at the end of the expression
+        """
+        position = self.position + offset
+        return self.tokens[position] if position < len(self.tokens) else None
+
+
+    def next(self, description: str = "a value") -> str:
+        """
+        Consume the next token.
+
+        :param description: [Optional] description of the expected token, for the error message. Default: "a value".
+        :return: token
+        :raises ValueError: at the end of the expression
+        """
+        token = self.peek()
+        if token is None:
+            raise self.error(f"expected {description} at the end")
+        self.position += 1
+        return token
+
+
+    def parse(self) -> Predicate:
+        """
+        Parse the whole expression.
+
+        :return: predicate
+        :raises ValueError: if the expression is invalid
+        """
+        if not self.tokens:
+            raise self.error("empty expression")
+        predicate = self.parse_expression()
+        if self.peek() is not None:
+            raise self.error(f"unexpected \"{self.peek()}\"")
+        return predicate
+
+
+    def parse_expression(self) -> Predicate:
+        """
+        Parse primitives joined by "and" or "or", from left to right.
+
+        :return: predicate
+        """
+        predicate = self.parse_unary()
+        while self.peek() in AND + OR:
+            operator = self.next()
+            left, right = predicate, self.parse_unary()
+            if operator in AND:
+                predicate = lambda h, left=left, right=right: left(h) and right(h)
+            else:
+                predicate = lambda h, left=left, right=right: left(h) or right(h)
+        return predicate
+
+
+    def parse_unary(self) -> Predicate:
+        """
+        Parse a negation, an expression in parentheses, or a primitive.
+
+        :return: predicate
+        """
+        token = self.next("a primitive")
+        if token in NOT:
+            operand = self.parse_unary()
+            return lambda h: not operand(h)
+        if token == "(":
+            predicate = self.parse_expression()
+            if self.next("\")\"") != ")":
+                raise self.error("expected \")\"")
+            return predicate
+        self.position -= 1
+        return self.parse_primitive()
+
+
+    def parse_direction(self) -> Optional[str]:
+        """
+        Parse an optional direction qualifier: "src", "dst", "src or dst" or "src and dst".
+
+        :return: "src", "dst", "or" (either direction), "and" (both directions), or None if not specified
+        """
+        if self.peek() not in DIRECTIONS:
+            return None
+        direction = self.next()
+        if self.peek() in AND + OR and self.peek(1) in DIRECTIONS and self.peek(1) != direction:
+            operator = self.next()
+            self.next()
+            return "and" if operator in AND else "or"
+        return direction
+
+
+    def parse_primitive(self) -> Predicate:
+        """
+        Parse a primitive: protocol, host, ether host, port or proto.
+
+        :return: predicate
+        """
+        qualifier = self.peek() if self.peek() in ("ether", *NETWORK_PROTOCOLS, *PROTOCOLS) else None
+        if qualifier is not None:
+            self.next()
+            if self.peek() not in (*DIRECTIONS, "host", "port", "proto") and not (qualifier == "ether" and self.peek() not in (None, ")", *AND, *OR)):
+                return self.protocol_predicate(qualifier)
+        direction = self.parse_direction()
+        keyword = self.peek()
+        if keyword in ("host", "port", "proto"):
+            self.next()
+        elif direction is not None or qualifier == "ether":
+            # Type defaults to host
+            keyword = "host"
+        else:
+            raise self.error(f"unexpected \"{self.next()}\"")
+        value = self.next()
+
+        if keyword == "proto":
+            if direction is not None or qualifier not in (None, "ip", "ip6"):
+                raise self.error("proto can only be qualified by ip or ip6")
+            proto = PROTOCOLS.get(value)
+            if proto is None:
+                proto = self.parse_int(value, 255, "IP protocol")
+            predicate = lambda h: h.proto == proto
+            return predicate if qualifier is None else self.restrict(qualifier, predicate)
+        if keyword == "port":
+            if qualifier not in (None, "tcp", "udp"):
+                raise self.error("port can only be qualified by tcp or udp")
+            port = self.parse_port(value, qualifier)
+            predicate = self.direction_predicate(direction, "sport", "dport", port)
+            return predicate if qualifier is None else self.restrict(qualifier, predicate)
+        if qualifier == "ether":
+            return self.direction_predicate(direction, "ether_src", "ether_dst", self.parse_mac(value))
+        if qualifier not in (None, *NETWORK_PROTOCOLS):
+            raise self.error(f"host cannot be qualified by {qualifier}")
+        address = self.parse_address(value)
+        predicate = self.direction_predicate(direction, "src", "dst", address)
+        if qualifier is not None:
+            return self.restrict(qualifier, predicate)
+        return lambda h: h.ethertype in HOST_ETHERTYPES and predicate(h)
+
+
+    @staticmethod
+    def protocol_predicate(protocol: str) -> Predicate:
+        """
+        Build the predicate matching the packets of a protocol.
+
+        :param protocol: protocol name
+        :return: predicate
+        """
+        if protocol == "ether":
+            return lambda h: h.ether_src is not None or h.ether_dst is not None
+        if protocol in NETWORK_PROTOCOLS:
+            ethertype = NETWORK_PROTOCOLS[protocol]
+            return lambda h: h.ethertype == ethertype
+        proto = PROTOCOLS[protocol]
+        return lambda h: h.proto == proto
+
+
+    def restrict(self, protocol: str, predicate: Predicate) -> Predicate:
+        """
+        Restrict a predicate to the packets of a protocol.
+
+        :param protocol: protocol name
+        :param predicate: predicate
+        :return: restricted predicate
+        """
+        protocol_predicate = self.protocol_predicate(protocol)
+        return lambda h: protocol_predicate(h) and predicate(h)
+
+
+    @staticmethod
+    def direction_predicate(direction: Optional[str], src_field: str, dst_field: str, value) -> Predicate:
+        """
+        Build the predicate matching a value in the source and/or destination field of a packet.
+
+        :param direction: "src", "dst", "and" (both), or "or" or None (either)
+        :param src_field: name of the source field in `Headers`
+        :param dst_field: name of the destination field in `Headers`
+        :param value: value to match
+        :return: predicate
+        """
+        src_index, dst_index = Headers._fields.index(src_field), Headers._fields.index(dst_field)
+        if direction == "src":
+            return lambda h: h[src_index] == value
+        if direction == "dst":
+            return lambda h: h[dst_index] == value
+        if direction == "and":
+            return lambda h: h[src_index] == value and h[dst_index] == value
+        return lambda h: h[src_index] == value or h[dst_index] == value
+
+
+    def parse_int(self, value: str, maximum: int, description: str) -> int:
+        """
+        Parse an integer value.
+
+        :param value: token
+        :param maximum: greatest valid value
+        :param description: value description, for the error message
+        :return: integer value
+        :raises ValueError: if the token is not an integer between 0 and maximum
+        """
+        try:
+            number = int(value, 0)
+        except ValueError:
+            raise self.error(f"invalid {description}: {value}")
+        if not 0 <= number <= maximum:
+            raise self.error(f"invalid {description}: {value}")
+        return number
+
+
+    def parse_port(self, value: str, protocol: Optional[str]) -> int:
+        """
+        Parse a port number or service name, e.g. 53 or "domain".
+
+        :param value: token
+        :param protocol: "tcp" or "udp", or None for both
+        :return: port number
+        :raises ValueError: if the token is neither a valid port number nor a known service name
+        """
+        if value.isdigit():
+            return self.parse_int(value, 0xFFFF, "port")
+        for name in ((protocol,) if protocol is not None else ("tcp", "udp")):
+            try:
+                return socket.getservbyname(value, name)
+            except OSError:
+                pass
+        raise self.error(f"unknown port: {value}")
+
+
+    def parse_address(self, value: str) -> bytes:
+        """
+        Parse an IPv4 or IPv6 address. Host names are not resolved.
+
+        :param value: token
+        :return: packed address
+        :raises ValueError: if the token is not an IP address
+        """
+        try:
+            return ipaddress.ip_address(value).packed
+        except ValueError:
+            raise self.error(f"invalid IP address: {value}")
+
+
+    def parse_mac(self, value: str) -> bytes:
+        """
+        Parse a MAC address, with bytes separated by colons, dashes or dots.
+
+        :param value: token
+        :return: packed address
+        :raises ValueError: if the token is not a MAC address
+        """
+        parts = re.split(r"[:.-]", value)
+        if len(parts) == 6 and all(1 <= len(part) <= 2 for part in parts):
+            try:
+                return bytes(int(part, 16) for part in parts)
+            except ValueError:
+                pass
+        raise self.error(f"invalid MAC address: {value}")
+
+
+
+class PacketFilter:
+    """
+    Compiled filter expression, matching packets from their raw bytes.
+    Filters are pickled as their expression, and compiled again when unpickled.
+    """
+
+    def __init__(self, expression: str) -> None:
+        """
+        Compile a filter expression.
+
+        :param expression: filter expression, see the module documentation
+        :raises ValueError: if the expression is invalid
+        """
+        self.expression = expression
+        self.predicate = FilterParser(expression).parse()
+
+
+    @classmethod
+    def parse(cls, packet_filter: Union[str, PacketFilter]) -> PacketFilter:
+        """
+        Build a packet filter from an expression.
+
+        :param packet_filter: filter expression, or packet filter
+        :return: packet filter
+        :raises ValueError: if the expression is invalid
+        """
+        if isinstance(packet_filter, PacketFilter):
+            return packet_filter
+        return cls(packet_filter)
+
+
+    def __reduce__(self):
+        return self.__class__, (self.expression,)
+
+
+    def __repr__(self) -> str:
+        return f"PacketFilter({self.expression!r})"
+
+
+    def match(self, data: memoryview, linktype: int) -> bool:
+        """
+        Check if a packet matches the filter.
+
+        :param data: packet bytes
+        :param linktype: packet link type
+        :return: True if the packet matches the filter, False otherwise
+        """
+        return self.predicate(read_headers(data, linktype))
+
+
+    def match_records(self, records: Iterable[Record]) -> List[int]:
+        """
+        Get the packet numbers of the records matching the filter.
+
+        :param records: iterable over PCAP(NG) records, e.g. a `RecordReader`
+        :return: sorted list of the matching packet numbers (starting from 1)
+        """
+        return [i for i, record in enumerate(records, start=1) if self.match(record.data, record.linktype)]
@@ -1,4 +1,6 @@
-from Packet import Packet
+from typing import List
+from .Packet import Packet
+from .checksum import Checksum
 
 class ARP(Packet):
 
@@ -13,3 +15,31 @@ class ARP(Packet):
         "psrc": "ipv4",
         "pdst": "ipv4",
     }
+
+    # Byte offset and length of the modifiable fields in the layer header,
+    # for Ethernet / IPv4 ARP packets
+    offsets = {
+        "op": (6, 2),
+        "hwsrc": (8, 6),
+        "psrc": (14, 4),
+        "hwdst": (18, 6),
+        "pdst": (24, 4)
+    }
+
+    # Only the modifiable fields are read and edited when fuzzing
+    templatable = True
+
+
+    def get_checksums(self, layer_offset: int) -> List[Checksum]:
+        """
+        ARP has no checksum,
+        but fields can only be edited directly in the packet wire bytes
+        for Ethernet / IPv4 ARP packets.
+
+        :param layer_offset: Byte offset of the layer in the packet wire bytes.
+        :return: Empty list for Ethernet / IPv4 ARP packets, None otherwise.
+        """
+        # Hardware and protocol address lengths
+        if self.raw[layer_offset+4:layer_offset+6] == b"\x06\x04":
+            return []
+        return None
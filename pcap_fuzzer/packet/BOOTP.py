@@ -1,7 +1,10 @@
 from typing import Tuple
 import random
 import scapy.all as scapy
-from Packet import Packet
+from .Packet import Packet
+from .layers import LayerStack
+from ..edit_log import EditRecord
+from .mutators import IntMutator
 
 class BOOTP(Packet):
     """
@@ -10,6 +13,8 @@ class BOOTP(Packet):
 
     # Class variables
     name = "BOOTP"
+    # DHCP message type is an integer between 1 and 8
+    message_type_mutator = IntMutator(1, 8)
 
     # Modifiable fields
     fields = [
@@ -18,7 +23,7 @@ class BOOTP(Packet):
     ]
 
 
-    def __init__(self, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1) -> None:
+    def __init__(self, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1, rng: random.Random = random, stack: LayerStack = None) -> None:
         """
         BOOTP/DHCP packet constructor.
 
@@ -26,8 +31,12 @@ class BOOTP(Packet):
         :param id: Packet integer identifier.
         :param last_layer_index: [Optional] Index of the last layer of the packet.
                                  If not specified, it will be calculated.
+        :param rng: [Optional] Random number generator used to edit the packet.
+                    Default: global `random` module.
+        :param stack: [Optional] Layer stack of the packet.
+                      If not specified, it will be calculated.
         """
-        super().__init__(packet, id, last_layer_index)
+        super().__init__(packet, id, last_layer_index, rng, stack)
         self.dhcp_options = packet.getlayer("DHCP options")
 
 
@@ -59,18 +68,18 @@ class BOOTP(Packet):
         self.dhcp_options.setfieldval("options", dhcp_options)
 
 
-    def fuzz(self) -> dict:
+    def fuzz(self) -> EditRecord:
         """
         Randomly edit a BOOTP/DHCP field, among the following:
             - chaddr (client hardware address)
             - message-type (DHCP message type)
 
-        :return: Dictionary containing fuzz information.
+        :return: Edit record containing fuzz information.
         """
         # Store old hash value
         old_hash = self.get_hash()
         # Get field which will be modified
-        field = random.choice(self.fields)
+        field = self.rng.choice(self.fields)
 
         # Initialize old and new values
         old_value = None
@@ -78,20 +87,16 @@ class BOOTP(Packet):
 
         if field == "chaddr":
             old_value = self.layer.getfieldval("chaddr")  # Store old value of field
-            new_value = Packet.bytes_edit_char(old_value[:6]) + old_value[6:]  # Randomly change one byte in the MAC address
+            new_value = Packet.bytes_edit_char(old_value[:6], self.rng) + old_value[6:]  # Randomly change one byte in the MAC address
             self.layer.setfieldval("chaddr", new_value)  # Set new value for field
 
         elif field == "message-type":
             old_value = self.get_dhcp_option(field)[1]  # Store old value of field
-            # Modify field value until it is different from old value
-            new_value = old_value
-            while new_value == old_value:
-                # Message type is an integer between 1 and 8
-                new_value = random.randint(1, 8)
+            new_value = self.message_type_mutator.mutate(old_value, self.rng)  # Draw new value, different from old value
             self.set_dhcp_option(field, new_value)  # Set new value for field
 
         # Update checksums
         self.update_fields()
 
-        # Return value: dictionary containing fuzz information
-        return self.get_dict_log(field, old_value, new_value, old_hash)
+        # Return value: edit record containing fuzz information
+        return self.get_edit_record(field, old_value, new_value, old_hash)
@@ -1,5 +1,7 @@
 import random
-from Packet import Packet
+from .Packet import Packet
+from ..edit_log import EditRecord
+from .mutators import IntMutator, randint_except
 
 class CoAP(Packet):
 
@@ -7,45 +9,42 @@ class CoAP(Packet):
     name = "CoAP"
 
     # Modifiable fields
-    fields = {
-        "type": "int[0,3]",
-        "code": "int[1,4]",
-    }
     fields = [
         "type",
         "code",
         "uri"
     ]
+    # Mutators for the integer fields
+    int_mutators = {
+        "type": IntMutator(0, 3),
+        "code": IntMutator(1, 4)
+    }
 
 
     @staticmethod
-    def new_int_value(old_value: int, start: int, end: int) -> int:
+    def new_int_value(old_value: int, start: int, end: int, rng: random.Random = random) -> int:
         """
         Generate a new random integer value between start and end, different from old_value.
 
         :param old_value: Old value of the integer.
         :param start: Start of the range.
         :param end: End of the range.
+        :param rng: [Optional] Random number generator. Default: global `random` module.
         :return: New random integer value.
         :raises ValueError: If start is greater than end.
         """
-        # Invalid parameters handling
         if start > end:
             raise ValueError("Start value must be smaller than end value.")
-        
-        # Generate new random int value
-        new_value = old_value
-        while new_value == old_value:
-            new_value = random.randint(start, end)
-        return new_value
+        return randint_except(start, end, old_value, rng)
     
 
     @staticmethod
-    def edit_uri(options: list) -> dict:
+    def edit_uri(options: list, rng: random.Random = random) -> dict:
         """
         Randomly edit one character in each part of the URI of a CoAP packet.
 
         :param options: List of CoAP options.
+        :param rng: [Optional] Random number generator. Default: global `random` module.
         :return: Edited list of CoAP options.
         """
         result = {
@@ -55,7 +54,7 @@ class CoAP(Packet):
         }
         for i in range(len(options)):
             if options[i][0] == "Uri-Path" or options[i][0] == "Uri-Query":
-                new_value = Packet.bytes_edit_char(options[i][1])
+                new_value = Packet.bytes_edit_char(options[i][1], rng)
                 result["new_options"].append((options[i][0], new_value))
                 prefix = b"/?" if options[i][0] == "Uri-Query" else b"/"
                 result["old_uri"] += prefix + options[i][1]
@@ -65,19 +64,19 @@ class CoAP(Packet):
         return result
 
 
-    def fuzz(self) -> dict:
+    def fuzz(self) -> EditRecord:
         """
         Randomly edit one field of the CoAP packet, among the following:
             - type
             - code
             - uri
 
-        :return: Dictionary containing fuzz information.
+        :return: Edit record containing fuzz information.
         """
         # Store old hash value
         old_hash = self.get_hash()
         # Get field which will be modified
-        field = random.choice(self.fields)
+        field = self.rng.choice(self.fields)
 
         # Initialize old and new values
         old_value = None
@@ -86,15 +85,12 @@ class CoAP(Packet):
         # Chosen field is an integer
         if field == "type" or field == "code":
             old_value = self.layer.getfieldval(field)
-            if field == "type":
-                new_value = CoAP.new_int_value(old_value, 0, 3)
-            elif field == "code":
-                new_value = CoAP.new_int_value(old_value, 1, 4)
+            new_value = self.int_mutators[field].mutate(old_value, self.rng)
             self.layer.setfieldval(field, new_value)
         
         # Chosen field is the URI
         elif field == "uri":
-            result = CoAP.edit_uri(self.layer.getfieldval("options"))
+            result = CoAP.edit_uri(self.layer.getfieldval("options"), self.rng)
             old_value = result["old_uri"]
             new_value = result["new_uri"]
             self.layer.setfieldval("options", result["new_options"])
@@ -102,5 +98,5 @@ class CoAP(Packet):
         # Update checksums
         self.update_fields()
 
-        # Return value: dictionary containing fuzz information
-        return self.get_dict_log(field, old_value, new_value, old_hash)
+        # Return value: edit record containing fuzz information
+        return self.get_edit_record(field, old_value, new_value, old_hash)
@@ -1,6 +1,9 @@
-import random
+from typing import Union
 from scapy.layers import dns
-from Packet import Packet
+from .Packet import Packet
+from .layers import LayerStack
+from ..edit_log import EditRecord
+from .mutators import ChoiceMutator
 
 class DNS(Packet):
 
@@ -27,6 +30,7 @@ class DNS(Packet):
         41,  # OPT
         255  # ANY
     ]
+    qtype_mutator = ChoiceMutator(qtypes)
 
     # Modifiable fields
     fields = [
@@ -37,19 +41,20 @@ class DNS(Packet):
 
 
     @staticmethod
-    def iter_question_records(question_records: dns.DNSQRField) -> iter:
+    def iter_question_records(question_records: Union[list, dns.DNSQR]) -> iter:
         """
         Iterate over question records.
 
-        :param question_records: List of question records.
+        :param question_records: List of question records
+                                 (or chained question records, for Scapy < 2.6).
         :return: Iterator over question records.
         """
-        layer_idx = 0
-        question_record = question_records.getlayer(layer_idx)
-        while question_record is not None:
-            yield question_record
-            layer_idx += 1
-            question_record = question_records.getlayer(layer_idx)
+        if question_records is None:
+            return
+        if isinstance(question_records, list):
+            yield from question_records
+            return
+        yield from LayerStack(question_records).layers
 
     
     def get_field(self) -> str:
@@ -58,17 +63,17 @@ class DNS(Packet):
 
         :return: Field name.
         """
-        return random.choice(self.fields)
+        return self.rng.choice(self.fields)
 
 
-    def fuzz(self) -> dict:
+    def fuzz(self) -> EditRecord:
         """
         Randomly edit one DNS field, among the following:
             - QR flag
             - Query type
             - Query name
 
-        :return: Dictionary containing fuzz information.
+        :return: Edit record containing fuzz information.
         """
         # Store old hash value
         old_hash = self.get_hash()
@@ -77,7 +82,7 @@ class DNS(Packet):
         
         # Get auxiliary fields
         qdcount = self.layer.getfieldval("qdcount")
-        question_records = self.layer.getfieldval("qd") if qdcount > 0 else None
+        question_records = list(DNS.iter_question_records(self.layer.getfieldval("qd"))) if qdcount > 0 else []
 
         # Initialize old and new values
         old_value = None
@@ -91,19 +96,17 @@ class DNS(Packet):
             self.layer.setfieldval("qr", new_value)
         
         # Field is query type
-        elif field == "qtype" and question_records is not None:
-            old_value = question_records.getfieldval("qtype")
+        elif field == "qtype" and question_records:
+            old_value = question_records[0].getfieldval("qtype")
             # Randomly pick new query type
-            new_value = old_value
-            while new_value == old_value:
-                new_value = random.choice(self.qtypes)
-            question_records.setfieldval("qtype", new_value)
+            new_value = self.qtype_mutator.mutate(old_value, self.rng)
+            question_records[0].setfieldval("qtype", new_value)
         
         # Field is query name
-        elif field == "qname" and question_records is not None:
+        elif field == "qname" and question_records:
             old_value = ""
             new_value = ""
-            for question_record in DNS.iter_question_records(question_records):
+            for question_record in question_records:
                 if old_value != "":
                     old_value += " + "
                 old_value_single = question_record.getfieldval("qname")
@@ -111,9 +114,7 @@ class DNS(Packet):
                 suffix = old_value_single[-1]
                 old_value_trimmed = old_value_single[:-1]
                 # Randomly change one character in query name
-                new_value_trimmed = old_value_trimmed
-                while new_value_trimmed == old_value_trimmed:
-                    new_value_trimmed = Packet.bytes_edit_char(old_value_trimmed)
+                new_value_trimmed = Packet.bytes_edit_char(old_value_trimmed, self.rng)
                 new_value_single = new_value_trimmed + bytes(chr(suffix), "utf-8")
                 if new_value != "":
                     new_value += " + "
@@ -123,5 +124,5 @@ class DNS(Packet):
         # Update checksums
         self.update_fields()
 
-        # Return value: dictionary containing fuzz information
-        return self.get_dict_log(field, old_value, new_value, old_hash)
+        # Return value: edit record containing fuzz information
+        return self.get_edit_record(field, old_value, new_value, old_hash)
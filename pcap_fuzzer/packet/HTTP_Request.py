@@ -1,4 +1,4 @@
-from Packet import Packet
+from .Packet import Packet
 
 class HTTP_Request(Packet):
 
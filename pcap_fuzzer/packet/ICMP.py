@@ -1,4 +1,6 @@
-from Packet import Packet
+from typing import List
+from .Packet import Packet
+from .checksum import Checksum
 
 class ICMP(Packet):
 
@@ -16,3 +18,22 @@ class ICMP(Packet):
             14   # Timestamp Reply
         ]  
     }
+
+    # Byte offset and length of the modifiable fields in the layer header
+    offsets = {
+        "type": (0, 1)
+    }
+
+    # Only the modifiable fields are read and edited when fuzzing
+    templatable = True
+
+
+    def get_checksums(self, layer_offset: int) -> List[Checksum]:
+        """
+        Get the checksums to update when a field is edited directly in the packet wire bytes,
+        i.e. the ICMP checksum.
+
+        :param layer_offset: Byte offset of the layer in the packet wire bytes.
+        :return: List of checksums to update.
+        """
+        return [Checksum(layer_offset + 2, layer_offset)]
@@ -1,4 +1,5 @@
-from Packet import Packet
+from .Packet import Packet
+from ..edit_log import EditRecord
 
 class IGMPv3mr(Packet):
     """
@@ -9,12 +10,12 @@ class IGMPv3mr(Packet):
     name = "IGMPv3mr"
 
 
-    def fuzz(self) -> dict:
+    def fuzz(self) -> EditRecord:
         """
         fuzz the IGMPv3 Membership Report packet,
         by randomizing all group addresses.
 
-        :return: Dictionary containing fuzz information.
+        :return: Edit record containing fuzz information.
         """
         # Store old hash value
         old_hash = self.get_hash()
@@ -28,7 +29,7 @@ class IGMPv3mr(Packet):
                 old_value += "-"
                 new_value += "-"
             old_value += group.getfieldval("maddr")
-            new_address = Packet.random_ip_address(version=4)
+            new_address = Packet.random_ip_address(version=4, rng=self.rng)
             new_value += new_address
             group.setfieldval("maddr", new_address)
             i += 1
@@ -36,5 +37,5 @@ class IGMPv3mr(Packet):
         # Update checksums
         self.update_fields()
 
-        # Return value: dictionary containing fuzz information
-        return self.get_dict_log("maddr", old_value, new_value, old_hash)
+        # Return value: edit record containing fuzz information
+        return self.get_edit_record("maddr", old_value, new_value, old_hash)
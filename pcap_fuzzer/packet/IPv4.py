@@ -1,4 +1,6 @@
-from Packet import Packet
+from typing import List
+from .Packet import Packet
+from .checksum import Checksum
 
 class IPv4(Packet):
 
@@ -10,3 +12,38 @@ class IPv4(Packet):
         "src": "ipv4",
         "dst": "ipv4"
     }
+
+    # Byte offset and length of the modifiable fields in the layer header
+    offsets = {
+        "src": (12, 4),
+        "dst": (16, 4)
+    }
+
+    # Only the modifiable fields are read and edited when fuzzing
+    templatable = True
+
+    # Upper layer protocols whose checksum covers the IP addresses (pseudo-header):
+    # protocol number -> (checksum field byte offset, whether a null checksum means no checksum)
+    pseudo_header_checksums = {
+        6: (16, False),  # TCP
+        17: (6, True)    # UDP
+    }
+
+
+    def get_checksums(self, layer_offset: int) -> List[Checksum]:
+        """
+        Get the checksums to update when an address is edited directly in the packet wire bytes,
+        i.e. the IPv4 header checksum, and the upper layer checksum if it covers the addresses.
+
+        :param layer_offset: Byte offset of the layer in the packet wire bytes.
+        :return: List of checksums to update.
+        """
+        checksums = [Checksum(layer_offset + 10, layer_offset)]
+        # Upper layer header is only present in the first fragment
+        fragment_offset = int.from_bytes(self.raw[layer_offset+6:layer_offset+8], "big") & 0x1FFF
+        protocol = self.raw[layer_offset + 9]
+        if fragment_offset == 0 and protocol in self.pseudo_header_checksums:
+            header_length = (self.raw[layer_offset] & 0x0F) * 4
+            checksum_offset, optional = self.pseudo_header_checksums[protocol]
+            checksums.append(Checksum(layer_offset + header_length + checksum_offset, layer_offset, optional))
+        return checksums
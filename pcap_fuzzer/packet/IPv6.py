@@ -1,4 +1,6 @@
-from Packet import Packet
+from typing import List
+from .Packet import Packet
+from .checksum import Checksum
 
 class IPv6(Packet):
 
@@ -10,3 +12,37 @@ class IPv6(Packet):
         "src": "ipv6",
         "dst": "ipv6"
     }
+
+    # Byte offset and length of the modifiable fields in the layer header
+    offsets = {
+        "src": (8, 16),
+        "dst": (24, 16)
+    }
+
+    # Only the modifiable fields are read and edited when fuzzing
+    templatable = True
+
+    # Upper layer protocols whose checksum covers the IP addresses (pseudo-header):
+    # next header number -> (checksum field byte offset, whether a null checksum means no checksum)
+    pseudo_header_checksums = {
+        6: (16, False),  # TCP
+        17: (6, True),   # UDP
+        58: (2, False)   # ICMPv6
+    }
+
+
+    def get_checksums(self, layer_offset: int) -> List[Checksum]:
+        """
+        Get the checksums to update when an address is edited directly in the packet wire bytes,
+        i.e. the upper layer checksum, computed over the IPv6 pseudo-header.
+
+        :param layer_offset: Byte offset of the layer in the packet wire bytes.
+        :return: List of checksums to update,
+                 or None if the upper layer header follows extension headers.
+        """
+        next_header = self.raw[layer_offset + 6]
+        if next_header not in self.pseudo_header_checksums:
+            # Extension headers are not handled, let Scapy rebuild the packet
+            return None
+        checksum_offset, optional = self.pseudo_header_checksums[next_header]
+        return [Checksum(layer_offset + 40 + checksum_offset, layer_offset, optional)]
@@ -1,12 +1,16 @@
 from __future__ import annotations
-import importlib
+from typing import List
 import logging
-import string
-import re
 import random
 from ipaddress import IPv4Address, IPv6Address
 import scapy.all as scapy
-import hashlib
+from .hashing import hash_sha256
+from .checksum import Checksum, patch
+from .layers import LayerStack
+from ..stats import timed
+from ..edit_log import EditRecord
+from ..templates import LayerTemplate, TemplateLayer
+from .mutators import ALPHANUM_CHARS, ALPHANUM_BYTES, compile_mutators, encode_int, edit_char
 
 
 class Packet:
@@ -17,93 +21,143 @@ class Packet:
     ##### CLASS VARIABLES #####
 
     # List of all alphanumerical characters
-    ALPHANUM_CHARS = list(string.ascii_letters + string.digits)
-    ALPHANUM_BYTES = list(bytes(string.ascii_letters + string.digits, "utf-8"))
+    ALPHANUM_CHARS = list(ALPHANUM_CHARS)
+    ALPHANUM_BYTES = list(ALPHANUM_BYTES)
     # Minimun payload length (in bytes)
     MIN_PAYLOAD_LENGTH = 46
 
     # Protocol name correspondences
     protocols = {
-        "DHCP": "BOOTP"
+        "DHCP": "BOOTP",
+        "IP": "IPv4"
     }
 
+    # Fuzzer classes, indexed by protocol name.
+    # Filled when child classes are defined.
+    classes = {}
+
+    # Registry mapping Scapy layer classes to fuzzer classes,
+    # or to None if the layer protocol is not supported.
+    # Filled for all known Scapy layers when importing subpackage `packet`,
+    # and on first use for Scapy layers loaded afterwards.
+    registry = {}
+
     # Modifiable fields, will be overridden by child classes
     fields = {}
 
+    # Mutators for the modifiable fields, indexed by field name.
+    # Compiled once per class from the `fields` specification, when the class is defined.
+    mutators = {}
+    mutable_fields = ()
+
+    # Statistics object timing the fuzzing stages, if any.
+    # Set by the fuzzing pipeline on the instances it creates.
+    stats = None
+
+    # Function hashing the packet payload, see `hashing.get_hash_function`.
+    # Set by the fuzzing pipeline on the instances it creates, if not SHA-256.
+    hash_function = staticmethod(hash_sha256)
+
+    # Byte offset and length, in the layer header, of the modifiable fields
+    # which can be edited directly in the packet wire bytes.
+    # Will be overridden by child classes.
+    offsets = {}
+
+    # True if `fuzz` only reads and edits modifiable fields,
+    # so packets can be fuzzed from a cached template, without being dissected by Scapy,
+    # when all modifiable fields can be edited directly in the packet wire bytes.
+    # Will be overridden by child classes.
+    templatable = False
+
+
+
+    ##### CLASS SETUP #####
+
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        """
+        Register a child class as the fuzzer class for its protocol,
+        and compile its field specification into mutators.
+        """
+        super().__init_subclass__(**kwargs)
+        Packet.classes[cls.__name__] = cls
+        if "fields" in cls.__dict__ and isinstance(cls.fields, dict):
+            cls.mutators = compile_mutators(cls.fields)
+            cls.mutable_fields = tuple(cls.mutators)
+
 
 
     ##### STATIC METHODS #####
 
 
     @staticmethod
-    def string_edit_char(s: str) -> str:
+    def string_edit_char(s: str, rng: random.Random = random) -> str:
         """
         Randomly change one character in a string.
+        The edited string is always different from the original one.
 
         :param s: String to be edited.
+        :param rng: [Optional] Random number generator. Default: global `random` module.
         :return: Edited string.
         """
-        char = random.choice(Packet.ALPHANUM_CHARS)
-        new_value = list(s)
-        new_value[random.randint(0, len(new_value) - 1)] = char
-        return "".join(new_value)
+        return "".join(edit_char(s, ALPHANUM_CHARS, rng))
     
 
     @staticmethod
-    def bytes_edit_char(s: bytes) -> bytes:
+    def bytes_edit_char(s: bytes, rng: random.Random = random) -> bytes:
         """
         Randomly change one character in a byte array.
+        The edited byte array is always different from the original one.
 
         :param s: Byte array to be edited.
+        :param rng: [Optional] Random number generator. Default: global `random` module.
         :return: Edited byte array.
         """
-        byte = random.choice(Packet.ALPHANUM_BYTES)
-        new_value = list(s)
-        new_value[random.randint(0, len(new_value) - 1)] = byte
-        return bytes(new_value)
+        return bytes(edit_char(s, ALPHANUM_BYTES, rng))
 
 
     @staticmethod
-    def random_mac_address() -> str:
+    def random_mac_address(rng: random.Random = random) -> str:
         """
         Generate a random MAC address.
 
+        :param rng: [Optional] Random number generator. Default: global `random` module.
         :return: Random MAC address.
         """
-        return ":".join(["%02x" % random.randint(0, 255) for _ in range(6)])
+        return ":".join(["%02x" % rng.randint(0, 255) for _ in range(6)])
 
 
     @staticmethod
-    def random_ip_address(version: int = 4) -> str:
+    def random_ip_address(version: int = 4, rng: random.Random = random) -> str:
         """
         Generate a random IP address.
 
         :param version: IP version (4 or 6).
+        :param rng: [Optional] Random number generator. Default: global `random` module.
         :return: Random IP address.
         :raises ValueError: If IP version is not 4 or 6.
         """
         if version == 4:
-            return str(IPv4Address(random.randint(0, IPv4Address._ALL_ONES)))
+            return str(IPv4Address(rng.randint(0, IPv4Address._ALL_ONES)))
         elif version == 6:
-            return str(IPv6Address(random.randint(0, IPv6Address._ALL_ONES)))   
+            return str(IPv6Address(rng.randint(0, IPv6Address._ALL_ONES)))   
         else:
             raise ValueError("Invalid IP version (should be 4 or 6).")   
 
 
     @staticmethod
-    def get_last_layer_index(packet: scapy.Packet) -> int:
+    def get_last_layer_index(packet: scapy.Packet, stack: LayerStack = None) -> int:
         """
         Get the index of the last layer of a Scapy packet.
 
         :param packet: Scapy Packet.
+        :param stack: [Optional] Layer stack of the packet.
+                      If not specified, it will be calculated.
         :return: index of the last packet layer.
         """
-        i = 0
-        layer = packet.getlayer(i)
-        while layer is not None:
-            i += 1
-            layer = packet.getlayer(i)
-        return i - 1
+        if stack is None:
+            stack = LayerStack(packet)
+        return len(stack) - 1
 
 
     @staticmethod
@@ -121,8 +175,37 @@ class Packet:
         return new_packet
 
 
+    @staticmethod
+    def get_protocol_class(layer_class: type) -> type:
+        """
+        Get the fuzzer class corresponding to a Scapy layer class.
+        Results, including unsupported layers, are memoized in the registry.
+
+        :param layer_class: Scapy layer class.
+        :return: Fuzzer class for the layer protocol,
+                 or None if the layer protocol is not supported.
+        """
+        try:
+            return Packet.registry[layer_class]
+        except KeyError:
+            protocol = (getattr(layer_class, "_name", None) or layer_class.__name__).replace(" ", "_")
+            protocol = Packet.protocols.get(protocol, protocol)
+            cls = Packet.classes.get(protocol)
+            Packet.registry[layer_class] = cls
+            return cls
+
+
+    @staticmethod
+    def build_registry() -> None:
+        """
+        Fill the registry for all Scapy layers known so far.
+        """
+        for layer_class in scapy.conf.layers:
+            Packet.get_protocol_class(layer_class)
+
+
     @classmethod
-    def init_packet(c, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1) -> Packet:
+    def init_packet(c, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1, rng: random.Random = random, stack: LayerStack = None) -> Packet:
         """
         Factory method to create a packet of a given protocol.
 
@@ -130,42 +213,70 @@ class Packet:
         :param id: [Optional] Packet integer identifier. Default is 0.
         :param last_layer_index: [Optional] Index of the last layer of the packet.
                                  If not specified, it will be calculated.
+        :param rng: [Optional] Random number generator used to edit the packet.
+                    Default: global `random` module.
+        :param stack: [Optional] Layer stack of the packet, shared with the created packet.
+                      If not specified, it will be calculated.
         :return: Packet of given protocol,
                  or generic Packet if protocol is not supported.
+        :raises ValueError: If no supported protocol is found in the packet.
         """
+        if stack is None:
+            stack = LayerStack(packet)
         # Try creating specific packet if possible
         if last_layer_index == -1:
-            last_layer_index = Packet.get_last_layer_index(packet)
+            last_layer_index = len(stack) - 1
         for i in range(last_layer_index, -1, -1):
-            layer = packet.getlayer(i)
-            try:
-                protocol = layer.name.replace(" ", "_")
-                if protocol == "IP" and packet.getfieldval("version") == 4:
-                    # IPv4 packet
-                    protocol = "IPv4"
-                elif protocol == "IP" and packet.getfieldval("version") == 6:
-                    # IPv6 packet
-                    protocol = "IPv6"
-                elif protocol == "DNS" and packet.getfieldval("sport") == 5353 and packet.getfieldval("sport") == 5353:
-                    # mDNS packet
-                    protocol = "mDNS"
-                else:
-                    protocol = Packet.protocols.get(protocol, protocol)
-                module = importlib.import_module(f"packet.{protocol}")
-                cls = getattr(module, protocol)
-                return cls(packet, id, i)
-            except ModuleNotFoundError:
+            layer = stack[i]
+            cls = Packet.get_protocol_class(layer.__class__)
+            if cls is None:
                 # Layer protocol not supported
                 continue
+            if cls.name == "DNS" and packet.getfieldval("sport") == 5353:
+                # mDNS packet
+                cls = Packet.classes["mDNS"]
+            return cls(packet, id, i, rng, stack)
         # No supported protocol found, raise ValueError
         raise ValueError(f"No supported protocol found for packet: {packet.summary()}")
+
+
+    @staticmethod
+    def from_template(template: LayerTemplate, raw: bytes, header_length: int, time, id: int = 0, rng: random.Random = random) -> Packet:
+        """
+        Factory method to create a packet of a given protocol from a cached layer template,
+        without a dissected Scapy packet.
+        Only the modifiable fields of the layer can be read and edited,
+        directly in the packet wire bytes.
+
+        :param template: Layer template, with its field values.
+        :param raw: Packet wire bytes.
+        :param header_length: Length of the first layer header.
+        :param time: Packet timestamp.
+        :param id: [Optional] Packet integer identifier. Default is 0.
+        :param rng: [Optional] Random number generator used to edit the packet.
+                    Default: global `random` module.
+        :return: Packet of the template protocol.
+        """
+        cls = Packet.classes[template.protocol]
+        my_packet = cls.__new__(cls)
+        my_packet.id = id
+        my_packet.packet = None
+        my_packet.time = time
+        my_packet.rng = rng
+        my_packet.raw = raw
+        my_packet.header_length = header_length
+        my_packet.layer_index = template.index
+        my_packet.layer = TemplateLayer(template.values)
+        my_packet.stack = None
+        my_packet.layer_offset = template.offset
+        return my_packet
     
 
 
     ##### INSTANCE METHODS #####
 
 
-    def __init__(self, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1) -> None:
+    def __init__(self, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1, rng: random.Random = random, stack: LayerStack = None) -> None:
         """
         Generic packet constructor.
 
@@ -173,13 +284,28 @@ class Packet:
         :param id: Packet integer identifier.
         :param last_layer_index: [Optional] Index of the last layer of the packet.
                                  If not specified, it will be calculated.
+        :param rng: [Optional] Random number generator used to edit the packet.
+                    Default: global `random` module.
+        :param stack: [Optional] Layer stack of the packet.
+                      If not specified, it will be calculated.
         """
         self.id = id
         self.packet = packet
-        self.layer_index = last_layer_index if last_layer_index != -1 else Packet.get_last_layer_index(packet)
+        self.time = packet.time
+        self.rng = rng
+        # Packet wire bytes, and length of the first layer header.
+        # Bytes are taken from the dissected packet, to avoid serializing it.
+        self.raw = packet.original if packet.original is not None else bytes(packet)
+        payload_original = getattr(packet.payload, "original", None)
+        self.header_length = len(self.raw) - (len(payload_original) if payload_original is not None else len(packet.payload))
+        # Layers of the packet, computed once and shared by all helpers
+        self.stack = stack if stack is not None else LayerStack(packet)
+        self.layer_index = last_layer_index if last_layer_index != -1 else len(self.stack) - 1
         self.layer = packet.getlayer(self.name)
         if self.layer is None:
-            self.layer = packet.getlayer(self.layer_index)
+            self.layer = self.stack[self.layer_index]
+        # Byte offset of the layer in the packet wire bytes, if it was dissected from them
+        self.layer_offset = self.stack.get_offset(self.layer)
 
     
     def get_packet(self) -> scapy.Packet:
@@ -191,6 +317,16 @@ class Packet:
         return self.packet
     
 
+    def get_bytes(self) -> bytes:
+        """
+        Get packet wire bytes.
+        After an edit, these are the new bytes built by `update_fields`.
+
+        :return: Packet wire bytes.
+        """
+        return self.raw
+    
+
     def get_length(self) -> int:
         """
         Get packet length.
@@ -219,16 +355,17 @@ class Packet:
         return self.layer_index
     
 
+    @timed("hash")
     def get_hash(self) -> str:
         """
-        Get packet payload SHA256 hash.
-        The payload is first padded with null bytes to reach the minimum Ethernet payload length of 46 bytes.
+        Get packet payload hash (SHA256 by default), computed on a view of the packet wire bytes.
+        The payload is padded with null bytes to reach the minimum Ethernet payload length of 46 bytes.
 
-        :return: Packet payload SHA256 hash.
+        :return: Packet payload hash, as a hexadecimal string.
         """
-        pad_bytes_to_add = Packet.MIN_PAYLOAD_LENGTH - len(self.packet.payload)
-        payload = bytes(self.packet.payload) + bytes(pad_bytes_to_add) if pad_bytes_to_add > 0 else bytes(self.packet.payload)
-        return hashlib.sha256(payload).hexdigest()
+        payload = memoryview(self.raw)[self.header_length:]
+        padding = bytes(max(0, Packet.MIN_PAYLOAD_LENGTH - len(payload)))
+        return self.hash_function(payload, padding)
     
 
     def rebuild(self) -> None:
@@ -238,20 +375,93 @@ class Packet:
         timestamp = self.packet.time
         self.packet = self.packet.__class__(bytes(self.packet))
         self.packet.time = timestamp
+        self.stack = LayerStack(self.packet)
     
 
+    def get_template(self) -> LayerTemplate:
+        """
+        Get the template of this layer, to be cached.
+        Field values are included only if the packet can be fuzzed from the template,
+        i.e. if all modifiable fields can be edited directly in the packet wire bytes.
+
+        :return: Layer template.
+        """
+        template = LayerTemplate(self.layer_index, self.__class__.__name__)
+        if not self.templatable or self.layer_offset is None or any(field not in self.offsets for field in self.fields):
+            return template
+        if self.get_checksums(self.layer_offset) is None:
+            return template
+        if any(self.layer_offset + offset + length > len(self.raw) for offset, length in self.offsets.values()):
+            return template
+        values = {field: self.layer.getfieldval(field) for field in self.fields}
+        return template._replace(offset=self.layer_offset, values=values)
+
+
+    def get_checksums(self, layer_offset: int) -> List[Checksum]:
+        """
+        Get the checksums to update when a field of this layer
+        is edited directly in the packet wire bytes.
+        Will be overridden by child classes which have checksummed fields.
+
+        :param layer_offset: Byte offset of the layer in the packet wire bytes.
+        :return: List of checksums to update,
+                 or None if fields cannot be edited directly in the packet wire bytes.
+        """
+        return []
+
+
+    def encode_field(self, field: str, value: any, length: int) -> bytes:
+        """
+        Encode a field value into its wire format.
+
+        :param field: Field name.
+        :param value: Field value.
+        :param length: Field length, in bytes.
+        :return: Encoded field value.
+        """
+        mutator = self.mutators.get(field)
+        if mutator is None:
+            # Fields without mutator, e.g. edited by a custom method, are integers
+            return encode_int(value, length)
+        return mutator.encode(value, length)
+
+
+    @timed("patch")
+    def patch_field(self, field: str, new_value: any) -> bool:
+        """
+        Edit a field directly in the packet wire bytes,
+        and incrementally update the relevant checksums,
+        without rebuilding the packet with Scapy.
+
+        :param field: Field name.
+        :param new_value: New field value.
+        :return: True if the field was edited,
+                 False if it cannot be edited directly in the packet wire bytes.
+        """
+        if field not in self.offsets or self.layer_offset is None:
+            return False
+        layer_offset = self.layer_offset
+        checksums = self.get_checksums(layer_offset)
+        field_offset, length = self.offsets[field]
+        offset = layer_offset + field_offset
+        if checksums is None or offset + length > len(self.raw):
+            return False
+        raw = bytearray(self.raw)
+        patch(raw, offset, self.encode_field(field, new_value, length), checksums)
+        self.raw = bytes(raw)
+        return True
+
+
+    @timed("rebuild")
     def update_fields(self) -> None:
         """
         Update checksum and length fields on all relevant layers,
-        and rebuild packet.
+        and build the new packet wire bytes.
+        The packet is serialized only once, and not dissected again.
         """
         # Loop on all packet layers
-        i = 0
-        while True:
-            layer = self.packet.getlayer(i)
-            if layer is None:
-                break
-            
+        for layer in self.stack.layers:
+
             # Delete checksum field
             if hasattr(layer, "chksum") and layer.getfieldval("chksum") is not None:
                 layer.delfieldval("chksum")
@@ -259,114 +469,54 @@ class Packet:
             # Delete length field
             if hasattr(layer, "len") and layer.getfieldval("len") is not None:
                 layer.delfieldval("len")
-            
-            i += 1
 
-        # Rebuild packet, to update deleted fields
-        self.rebuild()
+        # Build new wire bytes, which computes the deleted fields
+        self.raw = bytes(self.packet)
 
         
-    def get_dict_log(self, field: str, old_value: str, new_value: str, old_hash: str) -> dict:
+    def get_edit_record(self, field: str, old_value: str, new_value: str, old_hash: str) -> EditRecord:
         """
-        Log packet field modification,
-        and return a dictionary containing fuzz information.
+        Log packet field modification (at debug level),
+        and return the record containing fuzz information.
 
         :param field: Field name.
         :param old_value: Old field value.
         :param new_value: New field value.
         :param old_hash: Old packet hash (before fuzz).
-        :return: Dictionary containing fuzz information.
+        :return: Edit record containing fuzz information.
         """
-        timestamp = self.packet.time
-        logging.info(f"Packet {self.id}, timestamp {timestamp}: {self.name}.{field} = {old_value} -> {new_value}")
-        d = {
-            "id": self.id,
-            "timestamp": timestamp,
-            "protocol": self.name,
-            "field": field,
-            "old_value": old_value,
-            "new_value": new_value,
-            "old_hash": old_hash,
-            "new_hash": self.get_hash()
-        }
-        return d
-
-
-    def fuzz(self) -> dict:
+        timestamp = self.time
+        # Arguments are only formatted if debug logging is enabled
+        logging.debug("Packet %d, timestamp %s: %s.%s = %s -> %s", self.id, timestamp, self.name, field, old_value, new_value)
+        return EditRecord(self.id, timestamp, self.name, field, old_value, new_value, old_hash, self.get_hash())
+
+
+    def fuzz(self) -> EditRecord:
         """
         Randomly edit one packet field.
 
-        :return: Dictionary containing fuzz information,
+        :return: Edit record containing fuzz information,
                  or None if no fuzz was performed.
         """
         # Store old hash value
         old_hash = self.get_hash()
         # Get field which will be modified
-        field, value_type = random.choice(list(self.fields.items()))
+        field = self.rng.choice(self.mutable_fields)
         # Store old value of field
         old_value = self.layer.getfieldval(field)
+        # Draw new field value, different from old value
+        new_value = self.mutators[field].mutate(old_value, self.rng)
 
-        # Modify field value until it is different from old value
-        new_value = old_value
-        while new_value == old_value:
-
-            if isinstance(value_type, list):
-                # Field value is a list
-                # Choose randomly a value from the list
-                values = value_type
-                new_value = old_value
-                # Randomly pick new value
-                new_value = random.choice(values)
-
-            elif "int" in value_type:
-                # Field value is an integer
-                # Generate a random integer between given range
-                if value_type == "int":
-                    # No range given, default is 0-65535
-                    new_value = random.randint(0, 65535)
-                else:
-                    # Range given
-                    pattern = re.compile(r"int\[\s*(?P<start>\d+),\s*(?P<end>\d+)\s*\]")
-                    match = pattern.match(value_type)
-                    start = int(match.group("start"))
-                    end = int(match.group("end"))
-                    new_value = random.randint(start, end)
-
-            elif value_type == "str":
-                # Field value is a string
-                # Randomly change one character
-                new_value = Packet.string_edit_char(old_value)
-            
-            elif value_type == "bytes":
-                # Field value is a byte array
-                # Randomly change one byte
-                new_value = Packet.bytes_edit_char(old_value)
-
-            elif value_type == "port":
-                # Field value is an port number
-                # Generate a random port number between 1024 and 65535
-                new_value = random.randint(1024, 65535)
-
-            elif value_type == "ipv4":
-                # Field value is an IPv4 address
-                # Generate a random IPv4 address
-                new_value = Packet.random_ip_address(version=4)
-
-            elif value_type == "ipv6":
-                # Field value is an IPv6 address
-                # Generate a random IPv6 address
-                new_value = Packet.random_ip_address(version=6)
-            
-            elif value_type == "mac":
-                # Field value is a MAC address
-                # Generate a random MAC address
-                new_value = Packet.random_mac_address()
-            
         # Set new value for field
         self.layer.setfieldval(field, new_value)
 
-        # Update checksums
-        self.update_fields()
+        # Update checksums:
+        # edit the field directly in the packet wire bytes if possible,
+        # otherwise rebuild the packet with Scapy
+        if not self.patch_field(field, new_value):
+            if self.stats is not None:
+                self.stats.count("rebuild", self.name)
+            self.update_fields()
 
-        # Return value: dictionary containing fuzz information
-        return self.get_dict_log(field, old_value, new_value, old_hash)
+        # Return value: edit record containing fuzz information
+        return self.get_edit_record(field, old_value, new_value, old_hash)
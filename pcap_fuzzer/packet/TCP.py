@@ -1,9 +1,10 @@
-from Transport import Transport
+from .Transport import Transport
 
 class TCP(Transport):
 
     # Class variables
     name = "TCP"
+    checksum_offset = 16
 
     # Well-known ports
     ports = [
@@ -1,5 +1,7 @@
-import random
-from Packet import Packet
+from typing import List
+from .Packet import Packet
+from ..edit_log import EditRecord
+from .checksum import Checksum
 
 class Transport(Packet):
     """
@@ -12,17 +14,43 @@ class Transport(Packet):
         "dport": "port"
     }
 
+    # Byte offset and length of the modifiable fields in the layer header
+    offsets = {
+        "sport": (0, 2),
+        "dport": (2, 2)
+    }
+
+    # Only the modifiable fields are read and edited when fuzzing
+    templatable = True
+
+    # Checksum field byte offset in the layer header,
+    # and whether a null checksum means no checksum.
+    # Will be overridden by child classes.
+    checksum_offset = 0
+    checksum_optional = False
+
     # Well-known ports, will be overridden by child classes
     ports = []
 
 
-    def fuzz(self) -> dict:
+    def get_checksums(self, layer_offset: int) -> List[Checksum]:
+        """
+        Get the checksums to update when a port is edited directly in the packet wire bytes,
+        i.e. the layer's own checksum.
+
+        :param layer_offset: Byte offset of the layer in the packet wire bytes.
+        :return: List of checksums to update.
+        """
+        return [Checksum(layer_offset + self.checksum_offset, layer_offset, self.checksum_optional)]
+
+
+    def fuzz(self) -> EditRecord:
         """
         If one of the ports is a well-known port,
         randomly edit destination or source port,
         in this respective order of priority.
 
-        :return: Dictionary containing fuzz information,
+        :return: Edit record containing fuzz information,
                  or None if no fuzz was performed.
         """
         # Store old hash value
@@ -40,17 +68,19 @@ class Transport(Packet):
         # Store old value of field
         old_value = self.layer.getfieldval(field)
 
-        # Modify field value until it is different from old value
-        new_value = old_value
-        while new_value == old_value:
-            # Generate a random port number between 1024 and 65535
-            new_value = random.randint(1024, 65535)
+        # Generate a random port number between 1024 and 65535, different from old value
+        new_value = self.mutators[field].mutate(old_value, self.rng)
         
         # Set new value for field
         self.layer.setfieldval(field, new_value)
 
-        # Update checksums, if needed
-        self.update_fields()
+        # Update checksums:
+        # edit the field directly in the packet wire bytes if possible,
+        # otherwise rebuild the packet with Scapy
+        if not self.patch_field(field, new_value):
+            if self.stats is not None:
+                self.stats.count("rebuild", self.name)
+            self.update_fields()
 
-        # Return value: dictionary containing fuzz information
-        return self.get_dict_log(field, old_value, new_value, old_hash)
+        # Return value: edit record containing fuzz information
+        return self.get_edit_record(field, old_value, new_value, old_hash)
@@ -1,9 +1,11 @@
-from Transport import Transport
+from .Transport import Transport
 
 class UDP(Transport):
 
     # Class variables
     name = "UDP"
+    checksum_offset = 6
+    checksum_optional = True
 
     # Well-known ports
     ports = [
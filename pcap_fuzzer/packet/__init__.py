@@ -3,3 +3,21 @@ Initialization script for subpackage `packet`.
 """
 
 from .Packet import Packet
+# Protocol-specific packet classes, registered as fuzzer classes when defined
+from .ARP import ARP
+from .IPv4 import IPv4
+from .IPv6 import IPv6
+from .ICMP import ICMP
+from .IGMP import IGMP
+from .IGMPv3mr import IGMPv3mr
+from .Transport import Transport
+from .TCP import TCP
+from .UDP import UDP
+from .DNS import DNS
+from .mDNS import mDNS
+from .BOOTP import BOOTP
+from .CoAP import CoAP
+from .HTTP_Request import HTTP_Request
+
+# Map all Scapy layers known so far to their fuzzer class
+Packet.build_registry()
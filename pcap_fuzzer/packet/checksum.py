@@ -0,0 +1,77 @@
+"""
+Incremental Internet checksum updates (RFC 1624),
+to edit header fields directly in packet wire bytes.
+"""
+
+from typing import NamedTuple, List
+
+
+class Checksum(NamedTuple):
+    """
+    Location of a 16-bit Internet checksum field in packet wire bytes.
+    """
+    offset: int             # Byte offset of the checksum field
+    start: int              # Byte offset from which the checksummed data is 16-bit aligned
+    optional: bool = False  # True if a null checksum means no checksum (e.g. UDP)
+
+
+def update_checksum(checksum: int, old: bytes, new: bytes) -> int:
+    """
+    Incrementally update an Internet checksum,
+    following RFC 1624, equation 3: HC' = ~(~HC + ~m + m').
+
+    :param checksum: old checksum value
+    :param old: old value of the 16-bit aligned data that changed
+    :param new: new value of the 16-bit aligned data that changed (same length as old)
+    :return: new checksum value
+    """
+    # Odd-length data is padded with a null byte
+    if len(old) % 2 == 1:
+        old += b"\x00"
+        new += b"\x00"
+    total = ~checksum & 0xFFFF
+    for i in range(0, len(old), 2):
+        total += ~int.from_bytes(old[i:i+2], "big") & 0xFFFF
+        total += int.from_bytes(new[i:i+2], "big")
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def patch(raw: bytearray, offset: int, value: bytes, checksums: List[Checksum]) -> None:
+    """
+    Overwrite bytes in packet wire bytes,
+    and incrementally update the given checksums accordingly.
+
+    :param raw: packet wire bytes, edited in place
+    :param offset: byte offset of the bytes to overwrite
+    :param value: new bytes
+    :param checksums: checksums covering the overwritten bytes
+    """
+    end = offset + len(value)
+
+    # Store old value of the 16-bit aligned data covering the edited bytes, for each checksum
+    spans = []
+    for checksum in checksums:
+        if checksum.offset + 2 > len(raw):
+            # Checksum field is not present in the captured bytes
+            continue
+        span_start = checksum.start + ((offset - checksum.start) & ~1)
+        span_end = end + ((end - checksum.start) & 1)
+        spans.append((checksum, span_start, span_end, bytes(raw[span_start:span_end])))
+
+    # Overwrite bytes
+    raw[offset:end] = value
+
+    # Update checksums
+    for checksum, span_start, span_end, old in spans:
+        old_checksum = int.from_bytes(raw[checksum.offset:checksum.offset+2], "big")
+        if checksum.optional and old_checksum == 0:
+            # No checksum
+            continue
+        new = bytes(raw[span_start:span_end])
+        new_checksum = update_checksum(old_checksum, old, new)
+        if checksum.optional and new_checksum == 0:
+            # Null checksum is transmitted as all ones
+            new_checksum = 0xFFFF
+        raw[checksum.offset:checksum.offset+2] = new_checksum.to_bytes(2, "big")
@@ -0,0 +1,520 @@
+"""
+Classifier of raw packets, reading their Ethernet, VLAN, ARP, IPv4, IPv6, UDP, TCP, ICMP and IGMP headers
+directly from the packet wire bytes, to decide which fuzzer class `Packet.init_packet` would pick,
+and for which layer, without dissecting the packets with Scapy.
+The next layer of each header is guessed from Scapy's own layer bindings and dispatch hooks,
+so decisions follow the dissection of the packets by Scapy.
+Application layers (DNS, DHCP, CoAP and HTTP) are decided when their length and first bytes
+ensure Scapy dissects them, instead of falling back to the raw layer.
+Packets whose decision depends on another layer (e.g. ICMP errors, IP options or IPv6 extension headers)
+are left undecided, and must be dissected by Scapy.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+import struct
+import socket
+import scapy.all as scapy
+from scapy.layers.inet6 import ipv6nhcls
+from scapy.layers import dhcp, dns, http
+from scapy.contrib import coap, igmp, igmpv3
+from .Packet import Packet
+
+
+## Constants
+# Classification of the packets which must be dissected by Scapy to be classified
+UNDECIDED = "undecided"
+# Highest Ethernet type field value which is a frame length (IEEE 802.3 frames)
+ETHER_MAX_LENGTH = 1500
+# IPv6 next headers for which Scapy chooses the payload class from the payload content
+IPV6_DISPATCHED_NH = (43, 58, 135)
+# Scapy layer methods which, if overridden, let a layer choose its payload or nested layers by itself
+DISPATCH_METHODS = ("dispatch_hook", "guess_payload_class", "default_payload_class", "dissect", "do_dissect_payload")
+# Header formats
+ETHER_HEADER = struct.Struct("!12xH")
+DOT1Q_HEADER = struct.Struct("!HH")
+ARP_HEADER = struct.Struct("!HHBBH")
+IPV4_HEADER = struct.Struct("!BBHHHBBH4s4s")
+IPV6_HEADER = struct.Struct("!IHBB32x")
+UDP_HEADER = struct.Struct("!HHHH")
+TCP_HEADER = struct.Struct("!HHIIHHHH")
+# IPv4 Router Alert option type and length (RFC 2113), sent with IGMP messages
+IPV4_ROUTER_ALERT = b"\x94\x04"
+IPV4_ROUTER_ALERT_LENGTH = 4
+# TCP option kinds ending the options, or without length field
+TCP_OPTION_EOL = 0
+TCP_OPTION_NOP = 1
+# TCP Authentication Option kind, whose value Scapy dissects, possibly failing on malformed options
+TCP_OPTION_AO = 29
+ICMP_HEADER = struct.Struct("!BB")
+IGMP_HEADER = struct.Struct("!BB")
+COAP_HEADER_LENGTH = 4
+# Minimum length of the layers which Scapy dissects without falling back to the raw layer
+ICMP_MIN_LENGTHS = {13: 20, 14: 20, 17: 12, 18: 12}  # Timestamp and address mask messages
+ICMP_MIN_LENGTH = 8
+IGMP_MIN_LENGTH = 8
+IGMPV3_MIN_LENGTH = 4
+IGMPV3MR_MIN_LENGTH = 4
+DNS_MIN_LENGTH = 12
+DNS_TCP_MIN_LENGTH = 14  # Including the 2-byte length field
+BOOTP_MIN_LENGTH = 28
+# ICMP error types, whose payload is the packet which caused the error, dissected as `IPerror`
+ICMP_ERROR_TYPES = (3, 4, 5, 11, 12)
+# Length of the CoAP option extended delta or length fields, by value of the delta or length nibble
+COAP_EXT_LENGTHS = {13: 1, 14: 2}
+# Scapy HTTP layer, guessing the class of its payload from the request or response line
+HTTP_LAYER = http.HTTP()
+
+
+class Header(NamedTuple):
+    """
+    Header read from the packet wire bytes, as Scapy would dissect it.
+    """
+    values: Dict[str, int]  # Values of the header fields which can select the next layer, as Scapy gives them
+    payload_start: int      # Byte offset of the payload
+    payload_end: int        # Byte offset of the end of the payload, before any padding
+    default_class: type     # Class of the payload if no layer binding matches, UNDECIDED, or None for the raw layer
+    nested_layers: int = 0  # Number of layers nested in the header fields (e.g. IP options), before the payload
+
+
+class Classification(NamedTuple):
+    """
+    Decision of the classifier for a packet.
+    """
+    fuzzer_class: Union[type, str, None]  # Fuzzer class `Packet.init_packet` would pick, None, or UNDECIDED
+    layer_index: int                      # Index of the layer in the packet `LayerStack`, or -1 if not decided
+
+
+def get_payload_end(start: int, end: int, length: int) -> int:
+    """
+    Get the end of a payload whose length is given by a header field,
+    the same way Scapy slices it from the remaining bytes.
+
+    :param start: byte offset of the payload
+    :param end: byte offset of the end of the packet bytes
+    :param length: payload length given by the header, possibly negative
+    :return: byte offset of the end of the payload
+    """
+    available = end - start
+    return start + (min(length, available) if length >= 0 else max(0, available + length))
+
+
+def read_ether(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an Ethernet header, see `READERS`.
+    """
+    if end - start < ETHER_HEADER.size:
+        return None
+    (type,) = ETHER_HEADER.unpack_from(data, start)
+    if type <= ETHER_MAX_LENGTH:
+        # IEEE 802.3 frame, dissected by Scapy as `Dot3`
+        return None
+    return Header({"type": type}, start + ETHER_HEADER.size, end, None)
+
+
+def read_dot1q(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an IEEE 802.1Q VLAN tag, see `READERS`.
+    """
+    if end - start < DOT1Q_HEADER.size:
+        return None
+    tci, type = DOT1Q_HEADER.unpack_from(data, start)
+    if type <= ETHER_MAX_LENGTH:
+        # Frame length, the payload is dissected by Scapy as `LLC`
+        return None
+    values = {"prio": tci >> 13, "dei": (tci >> 12) & 0x1, "vlan": tci & 0xfff, "type": type}
+    return Header(values, start + DOT1Q_HEADER.size, end, None)
+
+
+def read_arp(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an ARP packet, see `READERS`.
+    """
+    # Only Ethernet/IPv4 ARP packets, whose addresses are always dissected
+    if end - start < ARP_HEADER.size + 20:
+        return None
+    hwtype, ptype, hwlen, plen, op = ARP_HEADER.unpack_from(data, start)
+    if (hwtype, ptype, hwlen, plen) != (1, 0x0800, 6, 4):
+        return None
+    # Scapy dissects the bytes after the ARP packet as padding
+    return Header({"hwtype": hwtype, "ptype": ptype, "hwlen": hwlen, "plen": plen, "op": op}, end, end, None)
+
+
+def read_ipv4(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an IPv4 header, see `READERS`.
+    """
+    if end - start < IPV4_HEADER.size:
+        return None
+    version_ihl, tos, length, id, flags_frag, ttl, proto, chksum, src, dst = IPV4_HEADER.unpack_from(data, start)
+    ihl = version_ihl & 0xf
+    header_length = 4 * ihl
+    if ihl == 5:
+        nested_layers = 0
+    elif (ihl == 6 and end - start >= header_length
+          and data[start + IPV4_HEADER.size:start + IPV4_HEADER.size + 2] == IPV4_ROUTER_ALERT):
+        # Router Alert option only, dissected as a nested layer
+        nested_layers = 1
+    else:
+        # Other IP options, or invalid header length
+        return None
+    values = {"version": version_ihl >> 4, "ihl": ihl, "tos": tos, "len": length, "id": id,
+              "flags": flags_frag >> 13, "frag": flags_frag & 0x1fff, "ttl": ttl, "proto": proto, "chksum": chksum,
+              "src": socket.inet_ntoa(src), "dst": socket.inet_ntoa(dst)}
+    payload_start = start + header_length
+    payload_end = end if length < header_length else get_payload_end(payload_start, end, length - header_length)
+    return Header(values, payload_start, payload_end, None, nested_layers)
+
+
+def read_ipv6(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an IPv6 header, see `READERS`.
+    """
+    if end - start < IPV6_HEADER.size:
+        return None
+    version_tc_fl, plen, nh, hlim = IPV6_HEADER.unpack_from(data, start)
+    if plen == 0 and nh == 0:
+        # Possible jumbogram
+        return None
+    values = {"version": version_tc_fl >> 28, "tc": (version_tc_fl >> 20) & 0xff, "fl": version_tc_fl & 0xfffff,
+              "plen": plen, "nh": nh, "hlim": hlim}
+    payload_start = start + IPV6_HEADER.size
+    default_class = UNDECIDED if nh in IPV6_DISPATCHED_NH else ipv6nhcls.get(nh)
+    return Header(values, payload_start, get_payload_end(payload_start, end, plen), default_class)
+
+
+def read_udp(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read a UDP header, see `READERS`.
+    """
+    if end - start < UDP_HEADER.size:
+        return None
+    sport, dport, length, chksum = UDP_HEADER.unpack_from(data, start)
+    values = {"sport": sport, "dport": dport, "len": length, "chksum": chksum}
+    payload_start = start + UDP_HEADER.size
+    return Header(values, payload_start, get_payload_end(payload_start, end, length - UDP_HEADER.size), None)
+
+
+def read_tcp(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read a TCP header, see `READERS`.
+    """
+    if end - start < TCP_HEADER.size:
+        return None
+    sport, dport, seq, ack, offset_flags, window, chksum, urgptr = TCP_HEADER.unpack_from(data, start)
+    dataofs = offset_flags >> 12
+    if dataofs < 5 or start + 4 * dataofs > end:
+        # Invalid or truncated header
+        return None
+    # Options, walked the same way as Scapy does
+    offset = start + TCP_HEADER.size
+    while offset < start + 4 * dataofs:
+        kind = data[offset]
+        if kind == TCP_OPTION_EOL:
+            break
+        if kind == TCP_OPTION_AO:
+            return None
+        if kind == TCP_OPTION_NOP:
+            offset += 1
+            continue
+        offset += max(2, data[offset + 1] if offset + 1 < start + 4 * dataofs else 0)
+    values = {"sport": sport, "dport": dport, "seq": seq, "ack": ack, "dataofs": dataofs,
+              "reserved": (offset_flags >> 9) & 0x7, "flags": offset_flags & 0x1ff,
+              "window": window, "chksum": chksum, "urgptr": urgptr}
+    return Header(values, start + 4 * dataofs, end, None)
+
+
+def read_icmp(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an ICMP header, see `READERS`.
+    """
+    if end - start < ICMP_HEADER.size:
+        return None
+    type, code = ICMP_HEADER.unpack_from(data, start)
+    if end - start < ICMP_MIN_LENGTHS.get(type, ICMP_MIN_LENGTH):
+        return None
+    if type in ICMP_ERROR_TYPES:
+        # The packet which caused the error may contain supported layers
+        return Header({"type": type, "code": code}, start + ICMP_MIN_LENGTH, end, UNDECIDED)
+    # Scapy dissects the bytes after the ICMP header as the raw layer
+    return Header({"type": type, "code": code}, end, end, None)
+
+
+def read_igmp(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an IGMP (version 1 or 2) message, see `READERS`.
+    """
+    if end - start < IGMP_MIN_LENGTH:
+        return None
+    type, mrcode = IGMP_HEADER.unpack_from(data, start)
+    return Header({"type": type, "mrcode": mrcode}, start + IGMP_MIN_LENGTH, end, None)
+
+
+def read_igmpv3(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an IGMPv3 header, see `READERS`.
+    """
+    if end - start < IGMPV3_MIN_LENGTH:
+        return None
+    type, mrcode = IGMP_HEADER.unpack_from(data, start)
+    return Header({"type": type, "mrcode": mrcode}, start + IGMPV3_MIN_LENGTH, end, None)
+
+
+def read_igmpv3mr(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an IGMPv3 membership report, see `READERS`.
+    """
+    if end - start < IGMPV3MR_MIN_LENGTH:
+        return None
+    # Group records are dissected inside the report, falling back to the raw layer if malformed
+    return Header({}, end, end, None)
+
+
+def read_dns(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read a DNS message, see `READERS`.
+    """
+    if underlayer is scapy.TCP:
+        # Scapy checks the length field of DNS messages over TCP
+        if end - start < 2 or not DNS_TCP_MIN_LENGTH <= int.from_bytes(data[start:start + 2], "big") <= end - start:
+            return None
+    elif end - start < DNS_MIN_LENGTH:
+        return None
+    # Resource records are dissected inside the message
+    return Header({}, end, end, None)
+
+
+def read_bootp(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read a BOOTP message, see `READERS`.
+    """
+    if end - start < BOOTP_MIN_LENGTH:
+        return None
+    # DHCP options contain no supported layer
+    return Header({}, end, end, None)
+
+
+def read_coap(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read a CoAP message, see `READERS`.
+    """
+    if end - start < COAP_HEADER_LENGTH:
+        return None
+    offset = min(start + COAP_HEADER_LENGTH + (data[start] & 0xf), end)
+    # Options, up to the payload marker. Scapy dissects the first option even if it is the payload marker,
+    # and fails if the extended delta or length of an option is truncated.
+    first = True
+    while offset < end and (first or data[offset] != 0xff):
+        first = False
+        delta, length = data[offset] >> 4, data[offset] & 0xf
+        delta_ext, length_ext = COAP_EXT_LENGTHS.get(delta, 0), COAP_EXT_LENGTHS.get(length, 0)
+        offset += 1 + delta_ext
+        if offset + length_ext > end:
+            return None
+        if length == 13:
+            length += data[offset]
+        elif length == 14:
+            length = 269 + int.from_bytes(data[offset:offset + 2], "big")
+        offset = min(offset + length_ext + length, end)
+    # Scapy dissects the payload as the raw layer
+    return Header({}, end, end, None)
+
+
+def read_http(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read the start of an HTTP message, see `READERS`.
+    """
+    # The HTTP layer has no field, its payload class is guessed by Scapy from the request or response line
+    return Header({}, start, end, HTTP_LAYER.guess_payload_class(bytes(data[start:end])))
+
+
+def read_http_message(data: bytes, start: int, end: int, underlayer: type) -> Optional[Header]:
+    """
+    Read an HTTP request or response, see `READERS`.
+    """
+    headers = bytes(data[start:end]).split(b"\r\n\r\n", 1)[0]
+    if b"upgrade" in headers.lower():
+        # The body of upgraded connections is dissected as HTTP/2 frames
+        return None
+    return Header({}, end, end, None)
+
+
+# Header readers, indexed by Scapy layer class.
+# A reader takes the packet wire bytes, the byte offsets of the start and end of the layer,
+# and the Scapy layer class of the previous layer,
+# and returns the header, or None if it cannot tell how Scapy would dissect it.
+READERS = {
+    scapy.Ether: read_ether,
+    scapy.Dot1Q: read_dot1q,
+    scapy.ARP: read_arp,
+    scapy.IP: read_ipv4,
+    scapy.IPv6: read_ipv6,
+    scapy.UDP: read_udp,
+    scapy.TCP: read_tcp,
+    scapy.ICMP: read_icmp,
+    igmp.IGMP: read_igmp,
+    igmpv3.IGMPv3: read_igmpv3,
+    igmpv3.IGMPv3mr: read_igmpv3mr,
+    dns.DNS: read_dns,
+    dhcp.BOOTP: read_bootp,
+    coap.CoAP: read_coap,
+    http.HTTP: read_http,
+    http.HTTPRequest: read_http_message,
+    http.HTTPResponse: read_http_message
+}
+
+# Whether Scapy layer classes, and the layers they can be followed by, contain no supported protocol.
+# Filled on first use.
+leaves: Dict[type, bool] = {}
+
+
+def is_leaf(layer_class: type) -> bool:
+    """
+    Check if a Scapy layer, and all layers Scapy can dissect after or inside it,
+    cannot contain a protocol supported by the fuzzer.
+
+    :param layer_class: Scapy layer class
+    :return: True if no supported protocol can be found in the layer,
+             False if one can, or if the layer chooses its payload by itself
+    """
+    try:
+        return leaves[layer_class]
+    except KeyError:
+        pass
+    # Layers bound to each other are assumed not to be leaves while being checked
+    leaves[layer_class] = False
+    leaf = (
+        isinstance(layer_class, type) and issubclass(layer_class, scapy.Packet)
+        and Packet.get_protocol_class(layer_class) is None
+        and not any(method in c.__dict__ for c in layer_class.__mro__[:layer_class.__mro__.index(scapy.Packet)] for method in DISPATCH_METHODS)
+        and not any(getattr(field, "holds_packets", True) for field in layer_class.fields_desc)
+        and all(is_leaf(cls) for t in layer_class.aliastypes for _, cls in t.payload_guess)
+    )
+    leaves[layer_class] = leaf
+    return leaf
+
+
+# Layer bindings of Scapy layer classes, indexed by the fields they depend on, see `get_bindings`.
+# Filled on first use, and compiled again when bindings are added.
+bindings: Dict[type, Tuple[tuple, list]] = {}
+
+
+def get_bindings(layer_class: type) -> List[Tuple[Tuple[str, ...], Dict[tuple, Tuple[int, type]]]]:
+    """
+    Get the layer bindings of a Scapy layer class, as hash tables, one for each set of fields bindings depend on.
+    Each binding keeps its rank in the bindings of the layer class, as Scapy uses the first matching binding.
+
+    :param layer_class: Scapy layer class
+    :return: list of tuples containing field names,
+             and the rank and payload class of the first binding for each tuple of values of these fields
+    """
+    guesses = tuple(t.payload_guess for t in layer_class.aliastypes)
+    try:
+        compiled_guesses, tables = bindings[layer_class]
+        # Scapy replaces the binding lists when bindings are added
+        if len(compiled_guesses) == len(guesses) and all(a is b for a, b in zip(compiled_guesses, guesses)):
+            return tables
+    except KeyError:
+        pass
+    indexed = {}
+    rank = 0
+    for payload_guess in guesses:
+        for fval, cls in payload_guess:
+            names = tuple(sorted(fval))
+            indexed.setdefault(names, {}).setdefault(tuple(fval[name] for name in names), (rank, cls))
+            rank += 1
+    tables = list(indexed.items())
+    bindings[layer_class] = (guesses, tables)
+    return tables
+
+
+def guess_payload_class(layer_class: type, header: Header) -> Union[type, str, None]:
+    """
+    Guess the class of the payload of a header, the same way `scapy.Packet.guess_payload_class` does.
+
+    :param layer_class: Scapy layer class of the header
+    :param header: header read from the packet wire bytes
+    :return: Scapy layer class of the payload, None for the raw layer,
+             or UNDECIDED if a layer binding depends on a field which was not read
+    """
+    match = None
+    for names, table in get_bindings(layer_class):
+        try:
+            binding = table.get(tuple(header.values[name] for name in names))
+        except KeyError:
+            return UNDECIDED
+        if binding is not None and (match is None or binding[0] < match[0]):
+            match = binding
+    return header.default_class if match is None else match[1]
+
+
+def classify_layer(data: bytes, linktype: int) -> Classification:
+    """
+    Decide which fuzzer class `Packet.init_packet` would pick for a packet, i.e. the class of its highest supported layer,
+    and the index of this layer, from its raw headers, without dissecting it.
+
+    :param data: packet wire bytes
+    :param linktype: link type of the packet
+    :return: classification containing the fuzzer class of the highest supported layer,
+             None if the packet has no supported layer, i.e. nothing to fuzz,
+             or UNDECIDED if the packet must be dissected by Scapy to decide,
+             and the index of the layer in the packet `LayerStack`
+    """
+    raw_layer = scapy.conf.raw_layer
+    layer_class = scapy.conf.l2types.num2layer.get(linktype, raw_layer)
+    start, end = 0, len(data)
+    if end == 0:
+        # Empty packets are not dissected
+        return Classification(UNDECIDED, -1)
+    fuzzer_class, layer_index = None, -1
+    underlayer = None
+    # Source port of the first transport header, telling mDNS packets apart, as `Packet.init_packet` does
+    sport = None
+    # Index of the current layer in the layer stack, counting the layers nested in the previous headers
+    index = 0
+    while True:
+        # The bytes from start to end are dissected as layer_class
+        if layer_class is not None and "dispatch_hook" in layer_class.__dict__:
+            # The layer class chooses its own class from its bytes
+            try:
+                layer_class = layer_class.dispatch_hook(bytes(data[start:end]))
+            except Exception:
+                return Classification(UNDECIDED, -1)
+        if layer_class is None or layer_class is raw_layer:
+            return Classification(fuzzer_class, layer_index)
+        read_header = READERS.get(layer_class)
+        if read_header is None:
+            return Classification(fuzzer_class, layer_index) if is_leaf(layer_class) else Classification(UNDECIDED, -1)
+        header = read_header(data, start, end, underlayer)
+        if header is None:
+            return Classification(UNDECIDED, -1)
+        if sport is None:
+            sport = header.values.get("sport")
+        cls = Packet.get_protocol_class(layer_class)
+        if cls is not None:
+            if cls.name == "DNS" and sport == 5353:
+                # mDNS packet
+                cls = Packet.classes["mDNS"]
+            fuzzer_class, layer_index = cls, index
+        if header.payload_start >= header.payload_end:
+            # No payload left to dissect
+            return Classification(fuzzer_class, layer_index)
+        underlayer = layer_class
+        layer_class = guess_payload_class(layer_class, header)
+        if layer_class is UNDECIDED:
+            return Classification(UNDECIDED, -1)
+        start, end = header.payload_start, header.payload_end
+        index += 1 + header.nested_layers
+
+
+def classify(data: bytes, linktype: int) -> Union[type, str, None]:
+    """
+    Decide which fuzzer class `Packet.init_packet` would pick for a packet, see `classify_layer`.
+
+    :param data: packet wire bytes
+    :param linktype: link type of the packet
+    :return: fuzzer class of the highest supported layer,
+             None if the packet has no supported layer, i.e. nothing to fuzz,
+             or UNDECIDED if the packet must be dissected by Scapy to decide
+    """
+    return classify_layer(data, linktype).fuzzer_class
@@ -0,0 +1,83 @@
+"""
+Packet payload hash functions, used to match edited packets with their original version.
+The payload is padded with null bytes to reach a minimum length before being hashed,
+the padding being fed to the hash function without copying the payload.
+xxHash support requires the optional `xxhash` package.
+"""
+
+from typing import Callable
+import hashlib
+
+
+## Constants
+# Supported hash algorithms
+HASH_ALGORITHMS = ("sha256", "blake2b", "xxhash", "none")
+# Digest size of the short BLAKE2b hash (in bytes)
+BLAKE2B_DIGEST_SIZE = 8
+
+
+def hash_sha256(payload: memoryview, padding: bytes) -> str:
+    """
+    SHA-256 hash, as a hexadecimal string.
+
+    :param payload: payload bytes
+    :param padding: null bytes padding the payload
+    :return: hexadecimal hash
+    """
+    h = hashlib.sha256(payload)
+    h.update(padding)
+    return h.hexdigest()
+
+
+def hash_blake2b(payload: memoryview, padding: bytes) -> str:
+    """
+    Short BLAKE2b hash (64 bits), as a hexadecimal string.
+
+    :param payload: payload bytes
+    :param padding: null bytes padding the payload
+    :return: hexadecimal hash
+    """
+    h = hashlib.blake2b(payload, digest_size=BLAKE2B_DIGEST_SIZE)
+    h.update(padding)
+    return h.hexdigest()
+
+
+def hash_none(payload: memoryview, padding: bytes) -> str:
+    """
+    No hash, for runs where packets do not need to be matched.
+
+    :param payload: payload bytes
+    :param padding: null bytes padding the payload
+    :return: empty string
+    """
+    return ""
+
+
+def get_hash_function(algorithm: str = "sha256") -> Callable[[memoryview, bytes], str]:
+    """
+    Get the hash function of a hash algorithm.
+
+    :param algorithm: hash algorithm, one of HASH_ALGORITHMS
+    :return: function hashing a payload followed by its padding, as a hexadecimal string
+    :raises ValueError: if the hash algorithm is not supported
+    :raises ImportError: if the hash algorithm requires a package which is not installed
+    """
+    if algorithm == "sha256":
+        return hash_sha256
+    if algorithm == "blake2b":
+        return hash_blake2b
+    if algorithm == "none":
+        return hash_none
+    if algorithm == "xxhash":
+        try:
+            import xxhash
+        except ImportError:
+            raise ImportError("xxHash support requires the xxhash package: pip install pcap-fuzzer[xxhash]")
+
+        def hash_xxhash(payload: memoryview, padding: bytes) -> str:
+            h = xxhash.xxh3_64(payload)
+            h.update(padding)
+            return h.hexdigest()
+
+        return hash_xxhash
+    raise ValueError(f"Unsupported hash algorithm: {algorithm}")
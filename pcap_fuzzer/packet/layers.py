@@ -0,0 +1,79 @@
+"""
+Flat stack of the layers of a Scapy packet, computed in a single pass,
+with the byte offset of each layer in the packet wire bytes.
+"""
+
+from typing import List, Optional
+import scapy.all as scapy
+
+
+class LayerStack:
+    """
+    Layers of a Scapy packet, in the order of `scapy.Packet.getlayer` indices:
+    each layer is followed by the layers nested in its packet fields (e.g. DNS records),
+    then by its payload.
+    Indexing the stack does not walk the layer chain again, unlike `getlayer`.
+    """
+
+    def __init__(self, packet: scapy.Packet) -> None:
+        """
+        Compute the layer stack of a packet.
+
+        :param packet: Scapy packet.
+        """
+        self.layers: List[scapy.Packet] = []
+        # Byte offset of each layer in the packet wire bytes,
+        # None if unknown, e.g. for layers which were not dissected, or nested in packet fields
+        self.offsets: List[Optional[int]] = []
+        self.push(packet, 0)
+
+
+    def push(self, layer: scapy.Packet, offset: Optional[int]) -> None:
+        """
+        Add a layer, its nested layers and its payload to the stack.
+
+        :param layer: Scapy layer.
+        :param offset: Byte offset of the layer in the packet wire bytes, or None if unknown.
+        """
+        while not isinstance(layer, scapy.NoPayload):
+            if layer.original is None:
+                offset = None
+            self.layers.append(layer)
+            self.offsets.append(offset)
+            for field in layer.packetfields:
+                value = layer.getfieldval(field.name)
+                for nested in (value if isinstance(value, list) else [value]):
+                    if isinstance(nested, scapy.Packet):
+                        self.push(nested, None)
+            payload = layer.payload
+            if offset is not None:
+                # Offset of the payload: the header is made of the bytes dissected by the layer fields.
+                # Layer and payload lengths cannot be used when the layer has trailing padding.
+                if layer.raw_packet_cache is not None:
+                    offset += len(layer.raw_packet_cache)
+                elif getattr(payload, "original", None) is not None:
+                    offset += len(layer.original) - len(payload.original)
+                else:
+                    offset = None
+            layer = payload
+
+
+    def __len__(self) -> int:
+        return len(self.layers)
+
+
+    def __getitem__(self, i: int) -> scapy.Packet:
+        return self.layers[i]
+
+
+    def get_offset(self, layer: scapy.Packet) -> Optional[int]:
+        """
+        Get the byte offset of a layer in the packet wire bytes.
+
+        :param layer: Scapy layer, from this stack.
+        :return: Byte offset of the layer, or None if unknown.
+        """
+        for stacked, offset in zip(self.layers, self.offsets):
+            if stacked is layer:
+                return offset
+        return None
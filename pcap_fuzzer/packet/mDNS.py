@@ -1,14 +1,16 @@
 import random
 import scapy.all as scapy
-from DNS import DNS
+from .DNS import DNS
+from .layers import LayerStack
 
 class mDNS(DNS):
 
     # Class variables
     name = "mDNS"
 
-    # Modifiable fields
-    fields = {
+    # Modifiable fields, depending on the message type (query or response).
+    # Not named `fields`, which would be compiled into mutators as a field specification.
+    message_fields = {
         "query": [
             "qr",
             "qtype",
@@ -20,7 +22,7 @@ class mDNS(DNS):
     }
 
     
-    def __init__(self, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1) -> None:
+    def __init__(self, packet: scapy.Packet, id: int = 0, last_layer_index: int = -1, rng: random.Random = random, stack: LayerStack = None) -> None:
         """
         mDNS packet constructor.
 
@@ -28,8 +30,12 @@ class mDNS(DNS):
         :param id: Packet integer identifier.
         :param last_layer_index: [Optional] Index of the last layer of the packet.
                                  If not specified, it will be calculated.
+        :param rng: [Optional] Random number generator used to edit the packet.
+                    Default: global `random` module.
+        :param stack: [Optional] Layer stack of the packet.
+                      If not specified, it will be calculated.
         """
-        super().__init__(packet, id, last_layer_index)
+        super().__init__(packet, id, last_layer_index, rng, stack)
         qr = self.layer.getfieldval("qr")
         self.qr_str = "query" if qr == 0 else "response"
 
@@ -40,4 +46,4 @@ class mDNS(DNS):
 
         :return: Field name.
         """
-        return random.choice(self.fields[self.qr_str])
+        return self.rng.choice(self.message_fields[self.qr_str])
@@ -0,0 +1,248 @@
+"""
+Field mutators, compiled once per fuzzer class from its `fields` specification,
+to draw new field values different from the old ones.
+"""
+
+from __future__ import annotations
+from typing import Sequence, Dict
+from abc import ABC, abstractmethod
+import string
+import re
+import random
+from ipaddress import IPv4Address, IPv6Address
+
+
+## Constants
+# Alphanumerical characters, used to edit strings and byte arrays
+ALPHANUM_CHARS = string.ascii_letters + string.digits
+ALPHANUM_BYTES = ALPHANUM_CHARS.encode("utf-8")
+# Integer range specification, e.g. "int[1,2]"
+INT_RANGE_PATTERN = re.compile(r"int\[\s*(?P<start>\d+),\s*(?P<end>\d+)\s*\]")
+
+
+def randint_except(start: int, end: int, excluded: int, rng: random.Random = random) -> int:
+    """
+    Draw a random integer between start and end (both included),
+    different from the excluded value.
+
+    :param start: Start of the range.
+    :param end: End of the range.
+    :param excluded: Value to exclude. Ignored if it is not an integer in the range.
+    :param rng: [Optional] Random number generator. Default: global `random` module.
+    :return: Random integer.
+    :raises ValueError: If the range does not contain any other value than the excluded one.
+    """
+    if not isinstance(excluded, int) or not start <= excluded <= end:
+        return rng.randint(start, end)
+    if start == end:
+        raise ValueError(f"No value different from {excluded} in range [{start}, {end}].")
+    value = rng.randint(start, end - 1)
+    return value + 1 if value >= excluded else value
+
+
+def edit_char(s: Sequence, alphabet: Sequence, rng: random.Random = random) -> list:
+    """
+    Replace one randomly chosen element of a sequence
+    with a different element of the alphabet.
+
+    :param s: Sequence to be edited.
+    :param alphabet: Alphabet the new element is drawn from.
+    :param rng: [Optional] Random number generator. Default: global `random` module.
+    :return: Edited sequence, as a list.
+    """
+    new_value = list(s)
+    i = rng.randrange(len(new_value))
+    old = new_value[i]
+    if old in alphabet:
+        # Draw among the other elements of the alphabet
+        j = rng.randrange(len(alphabet) - 1)
+        if j >= alphabet.index(old):
+            j += 1
+    else:
+        j = rng.randrange(len(alphabet))
+    new_value[i] = alphabet[j]
+    return new_value
+
+
+def encode_int(value: any, length: int) -> bytes:
+    """
+    Encode an integer field value into its wire format, in network byte order.
+
+    :param value: Field value.
+    :param length: Field length, in bytes.
+    :return: Encoded field value.
+    """
+    return int(value).to_bytes(length, "big")
+
+
+class Mutator(ABC):
+    """
+    Generates new values for a field.
+    """
+
+    @abstractmethod
+    def mutate(self, old_value: any, rng: random.Random = random) -> any:
+        """
+        Draw a new field value, different from the old one.
+        Must be implemented by child classes.
+
+        :param old_value: Old field value.
+        :param rng: [Optional] Random number generator. Default: global `random` module.
+        :return: New field value.
+        """
+
+    def encode(self, value: any, length: int) -> bytes:
+        """
+        Encode a field value into its wire format.
+
+        :param value: Field value.
+        :param length: Field length, in bytes.
+        :return: Encoded field value.
+        """
+        return encode_int(value, length)
+
+
+class ChoiceMutator(Mutator):
+    """
+    Picks the new value from a list of values.
+    """
+
+    def __init__(self, values: list) -> None:
+        # Distinct values, in the given order, and their indices
+        self.values = tuple(dict.fromkeys(values))
+        self.indices = {value: i for i, value in enumerate(self.values)}
+        if not self.values:
+            raise ValueError("List of values must not be empty.")
+
+    def mutate(self, old_value: any, rng: random.Random = random) -> any:
+        """
+        Draw a new value among the values, different from the old one.
+
+        :param old_value: Old field value.
+        :param rng: [Optional] Random number generator. Default: global `random` module.
+        :return: New field value.
+        :raises ValueError: If the old value is the only value.
+        """
+        try:
+            excluded = self.indices.get(old_value)
+        except TypeError:
+            # Unhashable old value, which cannot be one of the values
+            excluded = None
+        if excluded is None:
+            return self.values[rng.randrange(len(self.values))]
+        if len(self.values) == 1:
+            raise ValueError(f"No value different from {old_value!r} in {list(self.values)}.")
+        # Draw among the other values, skipping the old value's index
+        i = rng.randrange(len(self.values) - 1)
+        return self.values[i + 1 if i >= excluded else i]
+
+
+class IntMutator(Mutator):
+    """
+    Draws the new value from a range of integers.
+    """
+
+    def __init__(self, start: int, end: int) -> None:
+        if start > end:
+            raise ValueError("Start value must be smaller than end value.")
+        self.start = start
+        self.end = end
+
+    def mutate(self, old_value: int, rng: random.Random = random) -> int:
+        return randint_except(self.start, self.end, old_value, rng)
+
+
+class StrMutator(Mutator):
+    """
+    Changes one character of a string.
+    """
+
+    def mutate(self, old_value: str, rng: random.Random = random) -> str:
+        return "".join(edit_char(old_value, ALPHANUM_CHARS, rng))
+
+
+class BytesMutator(Mutator):
+    """
+    Changes one byte of a byte array.
+    """
+
+    def mutate(self, old_value: bytes, rng: random.Random = random) -> bytes:
+        return bytes(edit_char(old_value, ALPHANUM_BYTES, rng))
+
+
+class IPAddressMutator(Mutator):
+    """
+    Draws a random IP address.
+    """
+
+    def __init__(self, address_class: type) -> None:
+        self.address_class = address_class
+
+    def mutate(self, old_value: str, rng: random.Random = random) -> str:
+        try:
+            old_int = int(self.address_class(old_value))
+        except ValueError:
+            old_int = None
+        return str(self.address_class(randint_except(0, self.address_class._ALL_ONES, old_int, rng)))
+
+    def encode(self, value: str, length: int) -> bytes:
+        return self.address_class(value).packed
+
+
+class MacMutator(Mutator):
+    """
+    Draws a random MAC address.
+    """
+
+    def mutate(self, old_value: str, rng: random.Random = random) -> str:
+        try:
+            old_int = int(old_value.replace(":", ""), 16)
+        except (AttributeError, ValueError):
+            old_int = None
+        new_int = randint_except(0, (1 << 48) - 1, old_int, rng)
+        return ":".join("%02x" % b for b in new_int.to_bytes(6, "big"))
+
+    def encode(self, value: str, length: int) -> bytes:
+        return bytes.fromhex(value.replace(":", ""))
+
+
+# Mutators for value types without parameters
+MUTATORS = {
+    "int": IntMutator(0, 65535),
+    "port": IntMutator(1024, 65535),
+    "str": StrMutator(),
+    "bytes": BytesMutator(),
+    "ipv4": IPAddressMutator(IPv4Address),
+    "ipv6": IPAddressMutator(IPv6Address),
+    "mac": MacMutator()
+}
+
+
+def compile_mutator(value_type: any) -> Mutator:
+    """
+    Compile a field value type specification into a mutator.
+
+    :param value_type: Field value type specification,
+                       i.e. a list of values, "int[start,end]", or a key of `MUTATORS`.
+    :return: Mutator for the field.
+    :raises ValueError: If the value type is not supported.
+    """
+    if isinstance(value_type, list):
+        return ChoiceMutator(value_type)
+    match = INT_RANGE_PATTERN.fullmatch(value_type)
+    if match is not None:
+        return IntMutator(int(match.group("start")), int(match.group("end")))
+    try:
+        return MUTATORS[value_type]
+    except KeyError:
+        raise ValueError(f"Unsupported field value type: {value_type}")
+
+
+def compile_mutators(fields: dict) -> Dict[str, Mutator]:
+    """
+    Compile the field specifications of a fuzzer class into mutators.
+
+    :param fields: Modifiable fields, mapped to their value type specification.
+    :return: Mutators, indexed by field name.
+    """
+    return {field: compile_mutator(value_type) for field, value_type in fields.items()}
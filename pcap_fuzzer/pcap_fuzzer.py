@@ -4,109 +4,1077 @@ Randomly edit packet fields in a PCAP file.
 
 ## Import libraries
 import os
-from typing import Union
+from typing import Dict, Union, Iterable, Iterator, List, Tuple
+from contextlib import nullcontext
+from itertools import islice, count as counter
+import shutil
+import tempfile
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from decimal import Decimal
+import time
 import random
+import hashlib
 import logging
-import csv
 # Scapy libraries
 import scapy.all as scapy
+from scapy.utils import EDecimal
 from scapy.layers import dhcp, dns, http
 from scapy.contrib import coap, igmp, igmpv3
 # Custom Packet utilities
 from .packet import Packet
+from .packet.layers import LayerStack
+from .packet.hashing import get_hash_function
+from .packet.classifier import UNDECIDED, classify_layer
+from .chunks import RecordRange, split_pcap, merge_pcaps
+from .stats import Stats
+from .selection import PacketSelection, RandomSelection, iter_selected_records, count_records, sample_packet_numbers
+from .reader import STDIO, Record, RecordReader
+from .writer import RecordWriter
+from .compression import split_capture_path, set_compression
+from .edit_log import LOG_FORMATS, EditRecord, open_edit_log, merge_edit_logs
+from .templates import PacketTemplate, TemplateCache, open_template_cache, hash_file
+from .pipeline import PIPELINE_MODES, OrderedPipeline, open_executor
+from .filter import PacketFilter
 
 
-def must_edit_packet(i: int, packet_numbers: list, random_range: int) -> bool:
+## Constants
+# Name from which the output files of the standard input are derived, in the current directory
+STDIN_NAME = "stdin.pcap"
+
+
+def derive_seed(seed: int, *keys) -> int:
+    """
+    Derive a 64-bit seed from a base seed and a sequence of keys,
+    e.g. input file name and packet number.
+    The derived seed only depends on its inputs,
+    not on the order in which seeds are derived.
+
+    :param seed: base seed
+    :param keys: keys to derive the seed from
+    :return: derived 64-bit seed
+    """
+    data = "|".join(str(key) for key in (seed, *keys)).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def get_file_key(input_pcap: str) -> str:
+    """
+    Get the key identifying an input PCAP file when deriving seeds:
+    its file name, without compression extension,
+    so a compressed file is fuzzed the same way as the original one.
+
+    :param input_pcap: input PCAP file path
+    :return: file key
+    """
+    root, ext, _ = split_capture_path(os.path.basename(input_pcap))
+    return root + ext
+
+
+def must_edit_packet(i: int, selection: Union[PacketSelection, RandomSelection], record: Record = None, packet_filter: PacketFilter = None) -> bool:
     """
     Check if a packet must be edited.
 
     :param i: packet number (starting from 1)
-    :param packet_numbers: list of packet numbers to edit
-    :param random_range: upper bound for random range (not included)
+    :param selection: selected packet numbers, given or randomly sampled
+    :param record: [Optional] packet record, matched against the packet filter if specified. Default: None.
+    :param packet_filter: [Optional] filter the selected packets must also match, checked on the raw record bytes.
+                          Default: None (all selected packets are edited).
     :return: True if packet must be edited, False otherwise
     """
-    is_specified = packet_numbers is not None and i in packet_numbers
-    is_random = packet_numbers is None and random.randrange(0, random_range) == 0
-    return is_specified or is_random
+    return i in selection and (packet_filter is None or packet_filter.match(record.data, record.linktype))
+
+
+def select_packets(input_pcap: str, edit_count: int = None, edit_percent: float = None, seed: int = None, n: int = None, packet_filter: PacketFilter = None, records: Iterable[Record] = None) -> PacketSelection:
+    """
+    Randomly select an exact number, or percentage, of the packets of a PCAP file.
+
+    :param input_pcap: input PCAP file path
+    :param edit_count: [Optional] number of packets to select
+    :param edit_percent: [Optional] percentage of packets to select, used if edit_count is not specified
+    :param seed: [Optional] base seed. If specified, the selection only depends on a seed derived
+                 from the base seed and the input file name.
+                 Default: None (use the global random number generator).
+    :param n: [Optional] number of packets in the PCAP file. Default: None (count the records of the file).
+    :param packet_filter: [Optional] filter the selected packets must match:
+                          the number or percentage of packets is then taken among the matching packets.
+                          Default: None (select among all packets).
+    :param records: [Optional] records of the PCAP file, previously read, matched against the filter.
+                    Default: None (read the records of the file).
+    :return: selected packet numbers
+    """
+    rng = random if seed is None else random.Random(derive_seed(seed, get_file_key(input_pcap), "selection"))
+    if packet_filter is None:
+        n = count_records(input_pcap) if n is None else n
+        return sample_packet_numbers(n, edit_count, edit_percent, rng)
+    if records is None:
+        with RecordReader(input_pcap) as reader:
+            candidates = packet_filter.match_records(reader)
+    else:
+        candidates = packet_filter.match_records(records)
+    return sample_packet_numbers(len(candidates), edit_count, edit_percent, rng, candidates)
+
+
+def get_record_time(reader: RecordReader, record: Record) -> EDecimal:
+    """
+    Get the timestamp of a PCAP(NG) record,
+    the same way `scapy.PcapReader` would.
+
+    :param reader: PCAP(NG) reader the record was read from
+    :param record: PCAP(NG) record
+    :return: record timestamp, in seconds, or None if the record has no timestamp
+    """
+    if reader.pcapng:
+        if record.timestamp is None:
+            return None
+        return EDecimal(record.timestamp) / record.tsresol
+    sec, frac = divmod(record.timestamp, record.tsresol)
+    power = Decimal(10) ** Decimal(-9 if reader.nano else -6)
+    return EDecimal(sec + power * frac)
+
+
+def dissect_packet(data: bytes, linktype: int, timestamp: EDecimal = None, wirelen: int = None) -> scapy.Packet:
+    """
+    Dissect packet bytes into a Scapy packet,
+    the same way `scapy.PcapReader` would.
+
+    :param data: packet bytes
+    :param linktype: link type of the packet
+    :param timestamp: [Optional] packet timestamp, in seconds. Default: None (current time).
+    :param wirelen: [Optional] original length of the packet on the wire. Default: None.
+    :return: dissected Scapy packet, with the given timestamp
+    """
+    data = bytes(data)
+    cls = scapy.conf.l2types.num2layer.get(linktype, scapy.conf.raw_layer)
+    try:
+        packet = cls(data)
+    except Exception:
+        packet = scapy.conf.raw_layer(data)
+    if timestamp is not None:
+        packet.time = timestamp
+    packet.wirelen = wirelen
+    return packet
+
+
+def dissect_record(reader: RecordReader, record: Record) -> scapy.Packet:
+    """
+    Dissect a PCAP(NG) record into a Scapy packet,
+    the same way `scapy.PcapReader` would.
+
+    :param reader: PCAP(NG) reader the record was read from
+    :param record: PCAP(NG) record
+    :return: dissected Scapy packet, with the record timestamp
+    """
+    return dissect_packet(record.data, record.linktype, get_record_time(reader, record), record.wirelen)
+
+
+def copy_packet(packet: scapy.Packet) -> scapy.Packet:
+    """
+    Copy a dissected packet, to be edited without altering it.
+    Unlike `scapy.Packet.copy`, the copy keeps the wire bytes each layer was dissected from,
+    and its nested layers (e.g. DNS records) belong to the copied layers instead of the original ones,
+    so it is edited the same way as the dissected packet.
+
+    :param packet: dissected Scapy packet
+    :return: copy of the packet
+    """
+    copy = packet.copy()
+    layers = [(packet, copy)]
+    while layers:
+        layer, copied = layers.pop()
+        while not isinstance(layer, scapy.NoPayload):
+            copied.original = layer.original
+            for field in layer.packetfields:
+                value, copied_value = layer.getfieldval(field.name), copied.getfieldval(field.name)
+                for nested, copied_nested in (zip(value, copied_value) if isinstance(value, list) else [(value, copied_value)]):
+                    if isinstance(nested, scapy.Packet):
+                        copied_nested.parent = copied
+                        layers.append((nested, copied_nested))
+            layer, copied = layer.payload, copied.payload
+    return copy
+
+
+def build_template(packet: scapy.Packet) -> PacketTemplate:
+    """
+    Build the template of a dissected packet, to be cached,
+    following the same layers as `fuzz_packet`.
+
+    :param packet: Scapy packet, before being edited
+    :return: packet template
+    """
+    layers = []
+    header_length = 0
+    stack = LayerStack(packet)
+    last_layer_index = len(stack) - 1
+    while last_layer_index >= 0:
+        try:
+            my_packet = Packet.init_packet(packet, 0, last_layer_index, stack=stack)
+        except ValueError:
+            break
+        header_length = my_packet.header_length
+        layers.append(my_packet.get_template())
+        last_layer_index = my_packet.get_layer_index() - 1
+    return PacketTemplate(header_length, tuple(layers))
+
+
+def fuzz_template(data: bytes, timestamp: EDecimal, template: PacketTemplate, i: int, rng: random.Random = random, stats: Stats = None, hash_function: callable = None) -> Tuple[bytes, EditRecord, int]:
+    """
+    Edit one field of a packet from its cached template, without dissecting it, if possible.
+    Layers are tried in the same order as `fuzz_packet`,
+    until a layer is edited, or a layer which must be dissected by Scapy is reached.
+
+    :param data: packet bytes
+    :param timestamp: packet timestamp, in seconds, or None (current time)
+    :param template: packet template
+    :param i: packet number (starting from 1)
+    :param rng: [Optional] random number generator used to edit the packet.
+                Default: global `random` module.
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param hash_function: [Optional] function hashing the packet payloads, see `get_hash_function`.
+                          Default: None (SHA-256).
+    :return: tuple containing the new packet wire bytes,
+             the edit record containing fuzz information
+             (both None if the packet was not edited),
+             and the index of the layer from which the packet must be dissected and fuzzed,
+             or None if it does not need to be dissected
+    """
+    if not template.layers and stats is not None:
+        stats.count("unsupported", Stats.ALL)
+    raw = None
+    for layer in template.layers:
+        if layer.values is None:
+            # Layer must be dissected by Scapy
+            return None, None, layer.index
+        if stats is not None:
+            start = stats.start()
+        if raw is None:
+            raw = bytes(data)
+            timestamp = time.time() if timestamp is None else timestamp
+        my_packet = Packet.from_template(layer, raw, template.header_length, timestamp, i, rng)
+        if hash_function is not None:
+            my_packet.hash_function = hash_function
+        if stats is not None:
+            stats.stop("init", my_packet.name, start)
+            my_packet.stats = stats
+            start = stats.start()
+        d = my_packet.fuzz()
+        if stats is not None:
+            stats.stop("fuzz", my_packet.name, start)
+        if d is not None:
+            return my_packet.get_bytes(), d, None
+        if stats is not None:
+            stats.count("descend", my_packet.name)
+    return None, None, None
 
 
-def fuzz_pcaps(pcaps: Union[str, list], output: str = None, random_range: int = 1, packet_numbers: list = None, dry_run: bool = False) -> None:
+def fuzz_packet(packet: scapy.Packet, i: int, rng: random.Random = random, stats: Stats = None, hash_function: callable = None, last_layer_index: int = -1, fuzzer_class: type = None) -> Tuple[bytes, EditRecord]:
+    """
+    Edit one field of a packet, if possible.
+    The edited field is chosen starting from the highest layer,
+    and going down until a supported protocol layer can be edited.
+
+    :param packet: Scapy packet to edit
+    :param i: packet number (starting from 1)
+    :param rng: [Optional] random number generator used to edit the packet.
+                Default: global `random` module.
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param hash_function: [Optional] function hashing the packet payloads, see `get_hash_function`.
+                          Default: None (SHA-256).
+    :param last_layer_index: [Optional] index of the highest layer which can be edited.
+                             Default: -1 (last layer of the packet).
+    :param fuzzer_class: [Optional] fuzzer class of the layer at `last_layer_index`, as decided by the classifier,
+                         created without looking for the highest supported layer with `Packet.init_packet`.
+                         Default: None (found by `Packet.init_packet`).
+    :return: tuple containing the new packet wire bytes,
+             and the edit record containing fuzz information
+             (both None if the packet was not edited)
+    """
+    # Layers are computed once, and shared by the packets created for each tried layer
+    stack = LayerStack(packet)
+    if last_layer_index == -1:
+        last_layer_index = len(stack) - 1
+    while True:
+        if stats is not None:
+            start = stats.start()
+        try:
+            if fuzzer_class is None:
+                my_packet = Packet.init_packet(packet, i, last_layer_index, rng, stack)
+            else:
+                my_packet = fuzzer_class(packet, i, last_layer_index, rng, stack)
+                fuzzer_class = None
+        except ValueError:
+            # No supported protocol found in packet, skip it
+            if stats is not None:
+                stats.stop("init", Stats.ALL, start)
+                stats.count("unsupported", Stats.ALL)
+            return None, None
+        else:
+            if hash_function is not None:
+                my_packet.hash_function = hash_function
+            if stats is not None:
+                stats.stop("init", my_packet.name, start)
+                my_packet.stats = stats
+                start = stats.start()
+            d = my_packet.fuzz()
+            if stats is not None:
+                stats.stop("fuzz", my_packet.name, start)
+            if d is None:
+                # Packet was not edited, try editing one layer lower
+                if stats is not None:
+                    stats.count("descend", my_packet.name)
+                last_layer_index = my_packet.get_layer_index() - 1
+            else:
+                # Packet was edited
+                return my_packet.get_bytes(), d
+
+
+def fuzz_record(data: bytes, linktype: int, wirelen: int, timestamp: EDecimal, i: int, rng: random.Random = random, stats: Stats = None, hash_function: callable = None, template: PacketTemplate = None, cache_template: bool = False, dissected: Dict[int, scapy.Packet] = None) -> Tuple[bytes, EditRecord, PacketTemplate]:
+    """
+    Edit one field of a record selected for editing, if possible:
+    from its cached template if possible, otherwise after dissecting it.
+    Records without any supported protocol, as told by their raw headers, are skipped without being dissected,
+    and the layer edited first is taken from the raw headers, when they tell it.
+
+    :param data: record bytes
+    :param linktype: record link type
+    :param wirelen: original length of the packet on the wire
+    :param timestamp: record timestamp, in seconds, or None (current time)
+    :param i: packet number (starting from 1)
+    :param rng: [Optional] random number generator used to edit the packet.
+                Default: global `random` module.
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param hash_function: [Optional] function hashing the packet payloads, see `get_hash_function`.
+                          Default: None (SHA-256).
+    :param template: [Optional] cached template of the packet. Default: None (dissect the packet).
+    :param cache_template: [Optional] if True, build the template of the packet if it is dissected without template.
+                           Default: False.
+    :param dissected: [Optional] dissected packets, indexed by packet number, copied instead of dissecting them again,
+                      and filled with the packets dissected here which their template cannot edit without Scapy.
+                      Default: None (always dissect the packet).
+    :return: tuple containing the new packet wire bytes,
+             the edit record containing fuzz information
+             (both None if the packet was not edited),
+             and the new template of the packet, if built
+    """
+    new_data, d, new_template = None, None, None
+    if template is None:
+        if stats is not None:
+            start = stats.start()
+        fuzzer_class, last_layer_index = classify_layer(data, linktype)
+        if stats is not None:
+            stats.stop("classify", Stats.ALL, start)
+        if fuzzer_class is None:
+            # No supported protocol in the record
+            if stats is not None:
+                stats.count("unsupported", Stats.ALL)
+            return None, None, PacketTemplate(0, ()) if cache_template else None
+        if fuzzer_class is UNDECIDED:
+            fuzzer_class = None
+    else:
+        fuzzer_class = None
+        new_data, d, last_layer_index = fuzz_template(data, timestamp, template, i, rng, stats, hash_function)
+    if last_layer_index is not None:
+        if stats is not None:
+            start = stats.start()
+        packet = None if dissected is None else dissected.get(i)
+        if packet is None:
+            packet = dissect_packet(data, linktype, timestamp, wirelen)
+        else:
+            packet = copy_packet(packet)
+        if stats is not None:
+            stats.stop("dissect", Stats.ALL, start)
+        if cache_template and template is None:
+            new_template = build_template(packet)
+        if dissected is not None and i not in dissected and (new_template is None or any(layer.values is None for layer in new_template.layers)):
+            # Kept unedited for the next calls, which cannot edit the packet from its template only
+            if stats is not None:
+                start = stats.start()
+            dissected[i] = packet
+            packet = copy_packet(packet)
+            if stats is not None:
+                stats.stop("dissect", Stats.ALL, start)
+        new_data, d = fuzz_packet(packet, i, rng, stats, hash_function, last_layer_index, fuzzer_class)
+    return new_data, d, new_template
+
+
+def fuzz_record_task(data: bytes, linktype: int, wirelen: int, timestamp: EDecimal, i: int, seed: int, file_key: str, hash_algorithm: str = "sha256", template: PacketTemplate = None, cache_template: bool = False, timed: bool = False) -> Tuple[bytes, EditRecord, PacketTemplate, Stats]:
+    """
+    Pipeline worker task: edit one field of a record selected for editing, if possible.
+    Arguments and results can be sent to and from worker processes.
+
+    :param data: record bytes
+    :param linktype: record link type
+    :param wirelen: original length of the packet on the wire
+    :param timestamp: record timestamp, in seconds, or None (current time)
+    :param i: packet number (starting from 1)
+    :param seed: base seed, or None (use the worker's global random number generator)
+    :param file_key: input file key, see `get_file_key`
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log. Default: "sha256".
+    :param template: [Optional] cached template of the packet. Default: None (dissect the packet).
+    :param cache_template: [Optional] if True, build the template of the packet if it is dissected without template.
+                           Default: False.
+    :param timed: [Optional] if True, time the fuzzing stages. Default: False.
+    :return: tuple containing the new packet wire bytes,
+             the edit record containing fuzz information
+             (both None if the packet was not edited),
+             the new template of the packet, if built,
+             and the statistics object timing the task, if timed
+    """
+    rng = random if seed is None else random.Random(derive_seed(seed, file_key, i))
+    stats = Stats() if timed else None
+    new_data, d, new_template = fuzz_record(data, linktype, wirelen, timestamp, i, rng, stats, get_hash_function(hash_algorithm), template, cache_template)
+    return new_data, d, new_template, stats
+
+
+def get_selection(file_key: str, packet_numbers: list = None, random_range: int = 1, seed: int = None) -> Union[PacketSelection, RandomSelection]:
+    """
+    Get the selection of the packets to edit in an input file.
+
+    :param file_key: input file key, see `get_file_key`
+    :param packet_numbers: packet numbers to edit (starting from 1), as a `PacketSelection`
+                           or a list of packet numbers and ranges
+    :param random_range: upper bound for random range (not included)
+    :param seed: [Optional] base seed. If specified, each block of packet numbers is sampled with its own derived seed.
+                 Default: None (use the global random number generator).
+    :return: packet selection
+    """
+    if packet_numbers is not None:
+        return PacketSelection.parse(packet_numbers)
+    if seed is not None:
+        # Each block of packet numbers is sampled with its own derived seed
+        return RandomSelection(random_range, lambda block_index: random.Random(derive_seed(seed, file_key, "block", block_index)))
+    return RandomSelection(random_range)
+
+
+def iter_indexed_records(reader: RecordReader, selection: Union[PacketSelection, RandomSelection], first_id: int = 1, count: int = None, records: Iterable[Record] = None, skip: bool = False) -> Iterator[Tuple[int, Record]]:
+    """
+    Iterate over the records to fuzz, with their packet number.
+
+    :param reader: PCAP(NG) reader
+    :param selection: packet selection
+    :param first_id: [Optional] packet number of the next record to be read. Default: 1.
+    :param count: [Optional] maximum number of records to read. Default: None (read until end of file).
+    :param records: [Optional] records to fuzz, previously read from the reader.
+                    Default: None (read records from the reader).
+    :param skip: [Optional] if True, only the selected records are read and yielded.
+                 Default: False (yield all records).
+    :return: iterator over tuples containing the packet number and the record
+    """
+    if skip:
+        # Only read the selected records
+        if records is None:
+            return iter_selected_records(reader, selection, first_id, count)
+        return ((i, record) for i, record in zip(counter(first_id), records) if i in selection)
+    records = islice(reader, count) if records is None else records
+    return zip(counter(first_id), records)
+
+
+def fuzz_records(reader: RecordReader, packet_numbers: list = None, random_range: int = 1, first_id: int = 1, count: int = None, seed: int = None, records: Iterable[Record] = None, stats: Stats = None, skip: bool = False, hash_algorithm: str = "sha256", templates: TemplateCache = None, packet_filter: PacketFilter = None, dissected: Dict[int, scapy.Packet] = None) -> Iterator[Tuple[Record, bytes, EditRecord]]:
+    """
+    Generator pipeline which (randomly) edits a stream of PCAP(NG) records, one record at a time.
+    Only the records selected for editing are copied and dissected by Scapy,
+    the other ones are passed through as views on the input file.
+
+    :param reader: PCAP(NG) reader
+    :param packet_numbers: packet numbers to edit (starting from 1), as a `PacketSelection`
+                           or a list of packet numbers and ranges
+    :param random_range: upper bound for random range (not included)
+    :param first_id: [Optional] packet number of the next record to be read. Default: 1.
+    :param count: [Optional] maximum number of records to read. Default: None (read until end of file).
+    :param seed: [Optional] base seed. If specified, the random selection of packets
+                 only depends on seeds derived from the base seed, the input file name and the block of packet numbers,
+                 and the edition of each packet only depends on a seed derived from the base seed,
+                 the input file name and the packet number.
+                 Default: None (use the global random number generator).
+    :param records: [Optional] records to fuzz, previously read from the reader.
+                    Default: None (read records from the reader).
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param skip: [Optional] if True, only the selected records are read and yielded,
+                 e.g. when no output PCAP file is written. Default: False (yield all records).
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log, one of HASH_ALGORITHMS.
+                           Default: "sha256".
+    :param templates: [Optional] cache of packet templates, used to fuzz packets without dissecting them when possible,
+                      and filled with the templates of the dissected packets.
+                      Default: None (dissect all edited packets).
+    :param packet_filter: [Optional] filter the selected records must also match to be edited,
+                          checked on their raw bytes, so non-matching records are passed through without being dissected.
+                          Default: None (edit all selected records).
+    :param dissected: [Optional] dissected packets, indexed by packet number, reused by the next calls on the same records,
+                      see `fuzz_record`. Default: None (dissect the packets again).
+    :return: iterator over tuples containing the record,
+             the new record bytes and the edit record containing fuzz information
+             (both None if the packet was not edited)
+    """
+    file_key = get_file_key(reader.filename)
+    hash_function = get_hash_function(hash_algorithm)
+    selection = get_selection(file_key, packet_numbers, random_range, seed)
+    indexed = iter_indexed_records(reader, selection, first_id, count, records, skip)
+    if stats is not None:
+        indexed = stats.timed_iter("read", indexed)
+    for i, record in indexed:
+        new_data, d = None, None
+        if stats is not None:
+            start = stats.start()
+        edit = must_edit_packet(i, selection, record, packet_filter)
+        if stats is not None:
+            stats.stop("select", Stats.ALL, start)
+        if edit:
+            # Edit packet, if possible
+            rng = random if seed is None else random.Random(derive_seed(seed, file_key, i))
+            template = None if templates is None else templates.get(i)
+            new_data, d, new_template = fuzz_record(record.data, record.linktype, record.wirelen, get_record_time(reader, record),
+                                                    i, rng, stats, hash_function, template, templates is not None, dissected)
+            if new_template is not None:
+                templates.add(i, new_template)
+        yield record, new_data, d
+
+
+def fuzz_records_pipelined(reader: RecordReader, executor: Executor, processes: bool = False, packet_numbers: list = None, random_range: int = 1, first_id: int = 1, count: int = None, seed: int = None, stats: Stats = None, skip: bool = False, hash_algorithm: str = "sha256", templates: TemplateCache = None, packet_filter: PacketFilter = None) -> Iterator[Tuple[Record, bytes, EditRecord]]:
+    """
+    Pipelined version of `fuzz_records`:
+    records are read, and selected for editing, by a background reader thread,
+    the selected records are edited by a pool of workers,
+    and the fuzzed records are yielded to the calling thread, which writes them, in the input order.
+    At most `pipeline.QUEUE_SIZE` records are in flight, so the reader waits when the workers or the writer lag behind.
+    With the same seed, the output is the same as with `fuzz_records`.
+
+    :param reader: PCAP(NG) reader
+    :param executor: pool of workers, see `pipeline.open_executor`
+    :param processes: [Optional] True if the workers are processes, to which record bytes must be copied.
+                      Default: False (threads, which are given views on the input records).
+    :param packet_numbers: packet numbers to edit (starting from 1), as a `PacketSelection`
+                           or a list of packet numbers and ranges
+    :param random_range: upper bound for random range (not included)
+    :param first_id: [Optional] packet number of the next record to be read. Default: 1.
+    :param count: [Optional] maximum number of records to read. Default: None (read until end of file).
+    :param seed: [Optional] base seed, see `fuzz_records`. Default: None (use the workers' global random number generator).
+    :param stats: [Optional] statistics object timing the fuzzing stages, in all threads and workers.
+                  Default: None (no timing).
+    :param skip: [Optional] if True, only the selected records are read and yielded. Default: False (yield all records).
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log, one of HASH_ALGORITHMS.
+                           Default: "sha256".
+    :param templates: [Optional] cache of packet templates, read by the reader thread,
+                      and filled by the calling thread with the templates built by the workers.
+                      Default: None (dissect all edited packets).
+    :param packet_filter: [Optional] filter the selected records must also match to be edited, checked by the reader thread.
+                          Default: None (edit all selected records).
+    :return: iterator over tuples containing the record,
+             the new record bytes and the edit record containing fuzz information
+             (both None if the packet was not edited)
+    """
+    file_key = get_file_key(reader.filename)
+    selection = get_selection(file_key, packet_numbers, random_range, seed)
+    indexed = iter_indexed_records(reader, selection, first_id, count, skip=skip)
+    # Statistics objects are not shared between threads
+    reader_stats = None if stats is None else Stats()
+    if reader_stats is not None:
+        indexed = reader_stats.timed_iter("read", indexed)
+
+    def submit(item: Tuple[int, Record]):
+        # Reader thread: submit the edition of the selected records to the workers
+        i, record = item
+        if reader_stats is not None:
+            start = reader_stats.start()
+        edit = must_edit_packet(i, selection, record, packet_filter)
+        if reader_stats is not None:
+            reader_stats.stop("select", Stats.ALL, start)
+        if not edit:
+            return None
+        template = None if templates is None else templates.get(i)
+        data = bytes(record.data) if processes else record.data
+        return executor.submit(fuzz_record_task, data, record.linktype, record.wirelen, get_record_time(reader, record), i,
+                               seed, file_key, hash_algorithm, template, templates is not None, stats is not None)
+
+    pipeline = OrderedPipeline(indexed, submit)
+    try:
+        for (i, record), result in pipeline:
+            new_data, d = None, None
+            if result is not None:
+                new_data, d, new_template, task_stats = result
+                if new_template is not None:
+                    templates.add(i, new_template)
+                if task_stats is not None:
+                    stats.merge(task_stats)
+            yield record, new_data, d
+    finally:
+        pipeline.close()
+    if stats is not None:
+        stats.merge(reader_stats)
+
+
+def get_output_paths(input_pcap: str, output: str = None, compress: str = None, log_format: str = "csv", log: str = None) -> Tuple[str, str]:
+    """
+    Get the output PCAP and edit log file paths for a given input PCAP file,
+    and create their parent directories if needed.
+
+    :param input_pcap: input PCAP file path, or STDIO for the standard input,
+                       whose derived output files are named after STDIN_NAME, in the current directory
+    :param output: output PCAP file path, STDIO for the standard output,
+                   or None to derive it from the input PCAP file path
+    :param compress: [Optional] compression format of the output PCAP file, or "none".
+                     The standard output is never compressed.
+                     Default: None (from the extension of the output PCAP file if specified,
+                     otherwise same as the input PCAP file).
+    :param log_format: [Optional] edit log format, "csv", "parquet" or "arrow". Default: "csv".
+    :param log: [Optional] edit log file path, e.g. /dev/fd/3 to write it to an open file descriptor.
+                Default: None (derived from the output PCAP file path if specified and not STDIO,
+                otherwise from the input PCAP file path).
+    :return: tuple containing the output PCAP file path and the edit log file path
+    """
+    log_ext = LOG_FORMATS[log_format]
+    if output is not None and output != STDIO:
+        output_pcap = output if compress is None else set_compression(output, compress)
+        root, _, _ = split_capture_path(output)
+        return output_pcap, f"{root}{log_ext}" if log is None else log
+
+    if input_pcap == STDIO:
+        input_pcap = STDIN_NAME
+    input_dir = os.path.dirname(input_pcap)
+    root, ext, compression_ext = split_capture_path(os.path.basename(input_pcap))
+    # CSV log file
+    csv_log = log
+    if csv_log is None:
+        csv_dir = os.path.join(input_dir, "csv")
+        os.makedirs(csv_dir, exist_ok=True)
+        csv_log = os.path.join(csv_dir, f"{root}.edit{log_ext}")
+    if output == STDIO:
+        return output, csv_log
+    # Output PCAP file
+    output_dir = os.path.join(input_dir, "edited")
+    os.makedirs(output_dir, exist_ok=True)
+    output_pcap = os.path.join(output_dir, f"{root}.edit{ext}{compression_ext}")
+    if compress is not None:
+        output_pcap = set_compression(output_pcap, compress)
+    return output_pcap, csv_log
+
+
+def get_variant_paths(output_pcap: str, csv_log: str, variants: int) -> List[Tuple[str, str]]:
+    """
+    Get the output PCAP and CSV log file paths for each variant of an input PCAP file,
+    by inserting the variant number before the file extensions (and compression extensions).
+
+    :param output_pcap: output PCAP file path
+    :param csv_log: output CSV log file path
+    :param variants: number of variants
+    :return: list of tuples containing the output PCAP file path and the CSV log file path, for each variant
+    """
+    width = len(str(variants))
+    paths = []
+    for v in range(1, variants + 1):
+        output_root, output_ext, compression_ext = split_capture_path(output_pcap)
+        csv_root, csv_ext = os.path.splitext(csv_log)
+        paths.append((f"{output_root}.{v:0{width}d}{output_ext}{compression_ext}", f"{csv_root}.{v:0{width}d}{csv_ext}"))
+    return paths
+
+
+def write_fuzzed_records(fuzzed: Iterable[Tuple[Record, bytes, EditRecord]], reader: RecordReader, output_pcap: str, csv_log: str, dry_run: bool = False, stats: Stats = None) -> None:
+    """
+    Write a stream of fuzzed records to the output PCAP file,
+    and their fuzz information to the edit log file.
+
+    :param fuzzed: fuzzed records, as yielded by `fuzz_records`
+    :param reader: input PCAP(NG) reader the records were read from
+    :param output_pcap: output PCAP file path
+    :param csv_log: output edit log file path, in the format given by its extension (see `edit_log.LOG_FORMATS`)
+    :param dry_run: if True, do not write output PCAP file
+    :param stats: [Optional] statistics object timing the writing stages. Default: None (no timing).
+    """
+    # Open output PCAP file and edit log file
+    with open_edit_log(csv_log) as edit_log, \
+         (nullcontext() if dry_run else RecordWriter(output_pcap, reader)) as pcap_writer:
+        for record, new_data, d in fuzzed:
+            if stats is not None:
+                start = stats.start()
+            if d is not None:
+                edit_log.append(d)
+            if stats is not None:
+                stats.stop("log", Stats.ALL, start)
+                start = stats.start()
+            if pcap_writer is not None:
+                pcap_writer.write(record, new_data)
+            if stats is not None:
+                stats.stop("write", Stats.ALL, start)
+
+    if dry_run:
+        logging.info(f"Dry run: did not write output PCAP file: {output_pcap}")
+    else:
+        logging.info(f"Wrote output PCAP file: {output_pcap}")
+
+
+def fuzz_pcap(input_pcap: str, output_pcap: str, csv_log: str, random_range: int = 1, packet_numbers: list = None, dry_run: bool = False, seed: int = None, record_range: RecordRange = None, stats: Stats = None, hash_algorithm: str = "sha256", cache_dir: str = None, pipeline: str = None, workers: int = 1, packet_filter: PacketFilter = None, file_hash: str = None, save_templates: bool = True) -> Dict[int, PacketTemplate]:
+    """
+    (Randomly) edit packet fields in a single PCAP file.
+    Packets are streamed from the input PCAP file to the output PCAP file,
+    one packet at a time, so memory usage does not depend on the PCAP file size.
+    Packets which are not edited are copied as-is, without being dissected.
+
+    :param input_pcap: input PCAP file path
+    :param output_pcap: output PCAP file path
+    :param csv_log: output CSV log file path
+    :param random_range: upper bound for random range (not included)
+    :param packet_numbers: list of packet numbers to edit (starting from 1)
+    :param dry_run: if True, do not write output PCAP file
+    :param seed: [Optional] base seed for reproducible fuzzing. Default: None (use the global random number generator).
+    :param record_range: [Optional] range of records to fuzz. Default: None (fuzz the whole file).
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log. Default: "sha256".
+    :param cache_dir: [Optional] directory of the packet template cache. Default: None (no cache).
+    :param pipeline: [Optional] pipelined mode, one of PIPELINE_MODES: records are read, edited by a pool of
+                     worker threads or processes, and written, concurrently, see `fuzz_records_pipelined`.
+                     Default: None (records are read, edited and written one after the other, in the current thread).
+    :param workers: [Optional] number of workers editing the records in pipelined mode. Default: 1.
+    :param packet_filter: [Optional] filter the selected packets must also match to be edited. Default: None (no filter).
+    :param file_hash: [Optional] hash of the input file content, naming its template cache file, if already computed.
+                      Default: None (hash the input file if templates are cached).
+    :param save_templates: [Optional] if False, the new packet templates are not saved to the cache file,
+                           but returned, to be merged by the parent process. Default: True.
+    :return: new packet templates which were not saved to the cache file, indexed by packet number
+    """
+    first_id, count = (1, None) if record_range is None else (record_range.first_id, record_range.count)
+
+    # Open input PCAP file
+    with RecordReader(input_pcap) as reader, open_template_cache(cache_dir, input_pcap, file_hash, save_templates) as templates:
+        logging.info(f"Reading input PCAP file: {input_pcap}")
+        if record_range is not None:
+            reader.seek(record_range.offset)
+        if pipeline is None:
+            fuzzed = fuzz_records(reader, packet_numbers, random_range, first_id, count, seed, stats=stats, skip=dry_run, hash_algorithm=hash_algorithm, templates=templates, packet_filter=packet_filter)
+            write_fuzzed_records(fuzzed, reader, output_pcap, csv_log, dry_run, stats)
+        else:
+            with open_executor(pipeline, workers) as executor:
+                fuzzed = fuzz_records_pipelined(reader, executor, pipeline == "processes", packet_numbers, random_range, first_id, count, seed,
+                                                stats=stats, skip=dry_run, hash_algorithm=hash_algorithm, templates=templates, packet_filter=packet_filter)
+                try:
+                    write_fuzzed_records(fuzzed, reader, output_pcap, csv_log, dry_run, stats)
+                finally:
+                    # Stop the reader thread before the pool of workers is shut down
+                    fuzzed.close()
+    return {} if templates is None or save_templates else templates.new_templates
+
+
+def run_worker(seed: int, function: callable, *args, stats: Stats = None, **kwargs) -> Tuple[Stats, Dict[int, PacketTemplate]]:
+    """
+    Worker process entry point:
+    seed the worker's random number generator,
+    then run a fuzzing function, e.g. `fuzz_pcap`.
+
+    :param seed: seed for the worker's random number generator
+    :param function: fuzzing function
+    :param args: positional arguments for the fuzzing function
+    :param stats: [Optional] statistics object timing the fuzzing stages in the worker. Default: None (no timing).
+    :param kwargs: other keyword arguments for the fuzzing function
+    :return: tuple containing the statistics object, filled by the worker,
+             and the new packet templates returned by the fuzzing function,
+             both to be merged in the parent process
+    """
+    random.seed(seed)
+    new_templates = function(*args, stats=stats, **kwargs)
+    return stats, new_templates
+
+
+def fuzz_pcap_chunked(executor: ProcessPoolExecutor, chunks: int, input_pcap: str, output_pcap: str, csv_log: str, random_range: int = 1, packet_numbers: list = None, dry_run: bool = False, seed: int = None, stats: Stats = None, hash_algorithm: str = "sha256", cache_dir: str = None, packet_filter: PacketFilter = None) -> None:
+    """
+    (Randomly) edit packet fields in a single PCAP file,
+    by splitting it into ranges of records which are fuzzed in parallel by worker processes.
+    The output PCAP and CSV files produced for each range are then merged back, in the original order,
+    and the new packet templates built by the workers are merged and saved once, by the current process.
+    Files which cannot be split (e.g. PCAPNG files) are fuzzed in the current process.
+
+    :param executor: pool of worker processes
+    :param chunks: number of record ranges the PCAP file is split into
+    :param input_pcap: input PCAP file path
+    :param output_pcap: output PCAP file path
+    :param csv_log: output CSV log file path
+    :param random_range: upper bound for random range (not included)
+    :param packet_numbers: list of packet numbers to edit (starting from 1)
+    :param dry_run: if True, do not write output PCAP file
+    :param seed: [Optional] base seed for reproducible fuzzing. Default: None (use the global random number generator).
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log. Default: "sha256".
+    :param cache_dir: [Optional] directory of the packet template cache. Default: None (no cache).
+    :param packet_filter: [Optional] filter the selected packets must also match to be edited. Default: None (no filter).
+    """
+    try:
+        ranges = split_pcap(input_pcap, chunks)
+    except ValueError:
+        logging.warning(f"Cannot split PCAP file {input_pcap}, fuzzing it as a whole.")
+        ranges = []
+    if len(ranges) <= 1:
+        fuzz_pcap(input_pcap, output_pcap, csv_log, random_range, packet_numbers, dry_run, seed, stats=stats, hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter)
+        return
+
+    # Fuzz each record range in a worker process, with its own seed.
+    # The input file is hashed once, and the template cache is only saved by the current process.
+    parts_dir = tempfile.mkdtemp(prefix=".pcap-fuzzer-", dir=os.path.dirname(os.path.abspath(csv_log)))
+    try:
+        part_pcaps = [os.path.join(parts_dir, f"{j}.pcap") for j in range(len(ranges))]
+        log_ext = os.path.splitext(csv_log)[1]
+        part_csvs = [os.path.join(parts_dir, f"{j}{log_ext}") for j in range(len(ranges))]
+        worker_seeds = [random.getrandbits(64) for _ in ranges]
+        with open_template_cache(cache_dir, input_pcap) as templates:
+            file_hash = None if templates is None else templates.file_hash
+            futures = [
+                executor.submit(run_worker, worker_seed, fuzz_pcap, input_pcap, part_pcap, part_csv, random_range, packet_numbers, dry_run, seed, record_range,
+                                stats=None if stats is None else Stats(), hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter,
+                                file_hash=file_hash, save_templates=False)
+                for worker_seed, part_pcap, part_csv, record_range in zip(worker_seeds, part_pcaps, part_csvs, ranges)
+            ]
+            for done, future in enumerate(as_completed(futures), start=1):
+                worker_stats, new_templates = future.result()
+                if stats is not None:
+                    stats.merge(worker_stats)
+                if templates is not None:
+                    templates.merge(new_templates)
+                logging.info(f"[{done}/{len(ranges)}] Fuzzed record range of PCAP file: {input_pcap}")
+
+        # Merge output files, in the original record order
+        merge_edit_logs(part_csvs, csv_log)
+        if not dry_run:
+            merge_pcaps(part_pcaps, output_pcap)
+            logging.info(f"Wrote output PCAP file: {output_pcap}")
+    finally:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+
+def fuzz_pcap_variants(input_pcap: str, variants: List[Tuple[int, str, str]], random_range: int = 1, packet_numbers: list = None, dry_run: bool = False, edit_count: int = None, edit_percent: float = None, stats: Stats = None, hash_algorithm: str = "sha256", cache_dir: str = None, packet_filter: PacketFilter = None, file_hash: str = None, save_templates: bool = True) -> Dict[int, PacketTemplate]:
+    """
+    Produce multiple fuzzed variants of a single PCAP file, reading it only once.
+    The input records are kept as views on the memory-mapped input file,
+    and shared by all variants for the packets they do not edit.
+    Each packet is dissected at most once: the next variants edit it from its template,
+    kept in memory if templates are not cached, or edit a copy of the dissected packet
+    if its template cannot be edited without Scapy.
+    Each variant is fuzzed with its own base seed.
+
+    :param input_pcap: input PCAP file path
+    :param variants: list of tuples containing the base seed, the output PCAP file path
+                     and the output CSV log file path, for each variant
+    :param random_range: upper bound for random range (not included)
+    :param packet_numbers: list of packet numbers to edit (starting from 1)
+    :param dry_run: if True, do not write output PCAP files
+    :param edit_count: [Optional] exact number of packets to edit, randomly selected for each variant
+    :param edit_percent: [Optional] percentage of packets to edit, randomly selected for each variant
+    :param stats: [Optional] statistics object timing the fuzzing stages. Default: None (no timing).
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log. Default: "sha256".
+    :param cache_dir: [Optional] directory of the packet template cache. Default: None (no cache).
+    :param packet_filter: [Optional] filter the selected packets must also match to be edited. Default: None (no filter).
+    :param file_hash: [Optional] hash of the input file content, naming its template cache file, if already computed.
+                      Default: None (hash the input file if templates are cached).
+    :param save_templates: [Optional] if False, the new packet templates are not saved to the cache file,
+                           but returned, to be merged by the parent process. Default: True.
+    :return: new packet templates which were not saved to the cache file, indexed by packet number
+    """
+    with RecordReader(input_pcap) as reader, open_template_cache(cache_dir, input_pcap, file_hash, save_templates) as templates:
+        logging.info(f"Reading input PCAP file: {input_pcap}")
+        records = list(reader)
+        if templates is None:
+            templates = TemplateCache(None, input_pcap)
+        dissected = {}
+        for variant_seed, output_pcap, csv_log in variants:
+            logging.info(f"Fuzzing variant of PCAP file {input_pcap} with seed {variant_seed}")
+            if edit_count is not None or edit_percent is not None:
+                packet_numbers = select_packets(input_pcap, edit_count, edit_percent, variant_seed, len(records), packet_filter, records)
+            fuzzed = fuzz_records(reader, packet_numbers, random_range, seed=variant_seed, records=records, stats=stats, skip=dry_run, hash_algorithm=hash_algorithm, templates=templates, packet_filter=packet_filter, dissected=dissected)
+            write_fuzzed_records(fuzzed, reader, output_pcap, csv_log, dry_run, stats)
+    return {} if cache_dir is None or save_templates else templates.new_templates
+
+
+def fuzz_pcaps(pcaps: Union[str, list], output: str = None, random_range: int = 1, packet_numbers: list = None, dry_run: bool = False, jobs: int = 1, chunks: int = 1, seed: int = None, variants: int = 1, edit_count: int = None, edit_percent: float = None, stats: Stats = None, compress: str = None, log_format: str = "csv", hash_algorithm: str = "sha256", cache_dir: str = None, pipeline: str = None, log: str = None, packet_filter: str = None) -> None:
     """
     Main functionality of the program:
     (Randomly) edit packet fields in a (list of) PCAP file(s).
 
-    :param pcaps: list of input PCAP files
+    :param pcaps: list of input PCAP files.
+                  Files compressed with gzip, zstd or xz (.gz, .zst or .xz extension) are decompressed on the fly.
+                  "-" stands for the standard input, which is streamed and read in the current process,
+                  so it cannot be spread over worker processes, with multiple input files or variants and jobs > 1,
+                  unless in pipelined mode.
     :param output: output PCAP file path. Used only if a single input file is specified.
+                   Compressed if it has a compression extension.
+                   "-" stands for the standard output, to which records are flushed as they are fuzzed.
+                   Default: None (derived from the input file path, or the standard output if the input is the standard input).
     :param random_range: upper bound for random range (not included)
-    :param packet_numbers: list of packet numbers to edit (starting from 1)
+    :param packet_numbers: list of packet numbers to edit (starting from 1).
+                           Items can be integers, (first, last) tuples, or strings such as "100-200" or "1,3,7-9".
+                           Unselected packets are copied as-is, or skipped without being read in dry-run mode.
     :param dry_run: if True, do not write output PCAP file
+    :param jobs: number of worker processes among which the input PCAP files are spread.
+                 Default: 1 (all files are handled sequentially, in the current process).
+    :param chunks: number of record ranges each input PCAP file is split into.
+                   If greater than 1, files are handled one after the other,
+                   and the ranges of each file are spread over the worker processes.
+                   Default: 1 (files are not split).
+    :param seed: base seed for reproducible fuzzing.
+                 If specified, the selection and edition of each packet only depend on
+                 the seed, the input file name and the packet number,
+                 so results do not depend on the number of jobs or chunks.
+                 Default: None (use the global random number generator).
+    :param variants: number of fuzzed variants produced for each input PCAP file.
+                     If greater than 1, each input PCAP file is read only once,
+                     and each variant is fuzzed with its own seed, derived from the base seed if specified.
+                     Variants are spread over the worker processes, and chunks are ignored.
+                     Default: 1 (a single output PCAP file per input PCAP file).
+    :param edit_count: [Optional] exact number of packets to edit in each input PCAP file,
+                       randomly selected before fuzzing. Overrides random_range.
+    :param edit_percent: [Optional] percentage of packets to edit in each input PCAP file,
+                         randomly selected before fuzzing. Overrides random_range.
+    :param stats: [Optional] statistics object, filled with the time spent in each fuzzing stage,
+                  including in worker processes.
+                  Default: None (no timing).
+    :param compress: [Optional] compression format of the output PCAP files ("gzip", "zstd" or "xz"), or "none".
+                     Default: None (from the extension of the output PCAP file if specified,
+                     otherwise same as the input PCAP file).
+    :param log_format: [Optional] format of the edit log files: "csv", or "parquet" or "arrow" (columnar, requires pyarrow).
+                       Default: "csv".
+    :param hash_algorithm: [Optional] algorithm hashing the packet payloads in the edit log:
+                           "sha256", "blake2b" (64-bit digest), "xxhash" (requires xxhash), or "none" (empty hashes).
+                           Default: "sha256".
+    :param cache_dir: [Optional] directory of the packet template cache.
+                      If specified, the dissection results needed to fuzz each packet are cached,
+                      keyed by the hash of the input file content, and reused by the next runs on the same file,
+                      which skip the dissection of the packets when possible.
+                      Default: None (no cache).
+    :param pipeline: [Optional] pipelined mode, "threads" or "processes".
+                     If specified, input PCAP files are handled one after the other,
+                     each one being read by a reader thread, edited by `jobs` worker threads or processes,
+                     and written by the current thread, concurrently, in the input order.
+                     Cannot be combined with chunks or variants.
+                     Default: None (no pipelining).
+    :param log: [Optional] edit log file path, e.g. /dev/fd/3 to write it to an open file descriptor.
+                Written in the format given by its extension, CSV otherwise.
+                Used only if a single input file is specified.
+                Default: None (derived from the output file path, or from the input file path).
+    :param packet_filter: [Optional] filter expression, in a subset of the tcpdump syntax (protocols, host, ether host, port,
+                          with src/dst directions, e.g. "udp dst port 53 and dst host 192.168.1.1"),
+                          that packets must match to be edited.
+                          Packets are matched on their raw bytes, and non-matching packets are copied without being dissected.
+                          With edit_count or edit_percent, packets are selected among the matching packets.
+                          Default: None (no filter).
+    :raises ValueError: if the pipelined mode is not supported, or combined with chunks or variants,
+                        if the standard input or output is used with an option which needs a seekable file,
+                        if the standard input would be fuzzed by worker processes,
+                        or if the filter expression is invalid
+    :raises RuntimeError: if at least one PCAP file could not be fuzzed by the worker processes
     """
     # If input PCAP is a single file, convert to list of one element
     pcaps = [pcaps] if not isinstance(pcaps, list) else pcaps
-    
-    # Loop on given input PCAP files
-    for input_pcap in pcaps:
-        # PCAP file directory
-        input_dir = os.path.dirname(input_pcap)
-
-        # Read input PCAP file
-        packets = scapy.rdpcap(input_pcap)
-        new_packets = []
-        logging.info(f"Read input PCAP file: {input_pcap}")
-
-        # Open log CSV file
-        csv_log = ""
-        if output is not None and len(pcaps) == 1:
-            csv_log = output.replace(".pcap", ".csv")
-        else:
-            csv_dir = os.path.join(input_dir, "csv")
-            os.makedirs(csv_dir, exist_ok=True)
-            csv_log = os.path.basename(input_pcap).replace(".pcap", ".edit.csv")
-            csv_log = os.path.join(csv_dir, csv_log)
-        with open(csv_log, "w") as csv_file:
-            field_names = ["id", "timestamp", "protocol", "field", "old_value", "new_value", "old_hash", "new_hash"]
-            writer = csv.DictWriter(csv_file, fieldnames=field_names)
-            writer.writeheader()
-
-            i = 1
-            for packet in packets:
-
-                if must_edit_packet(i, packet_numbers, random_range):
-                    # Edit packet, if possible
-                    last_layer_index = Packet.get_last_layer_index(packet)
-                    while True:
-                        try:
-                            my_packet = Packet.init_packet(packet, i, last_layer_index)
-                        except ValueError:
-                            # No supported protocol found in packet, skip it
-                            new_packets.append(Packet.rebuild_packet(packet))
-                            break
-                        else:
-                            d = my_packet.fuzz()
-                            if d is None:
-                                # Packet was not edited, try editing one layer lower
-                                last_layer_index = my_packet.get_layer_index() - 1
-                            else:
-                                # Packet was edited
-                                new_packets.append(my_packet.get_packet())
-                                writer.writerow(d)
-                                break
+    # Index packet numbers to edit
+    if packet_numbers is not None:
+        packet_numbers = PacketSelection.parse(packet_numbers)
+    # Compile the filter expression, failing early if it is invalid
+    if packet_filter is not None:
+        packet_filter = PacketFilter.parse(packet_filter)
+    # Fail early if the hash algorithm is not available
+    get_hash_function(hash_algorithm)
+    if pipeline is not None:
+        if pipeline not in PIPELINE_MODES:
+            raise ValueError(f"Unsupported pipeline mode: {pipeline}")
+        if chunks > 1 or variants > 1:
+            raise ValueError("Pipelined mode cannot be combined with chunks or variants")
+    # The standard input is read only once, as a stream
+    if STDIO in pcaps:
+        if pcaps.count(STDIO) > 1:
+            raise ValueError("The standard input can only be specified once")
+        if edit_count is not None or edit_percent is not None or chunks > 1 or cache_dir is not None:
+            raise ValueError("The standard input cannot be fuzzed with an exact count or percentage of packets to edit, chunks, or a template cache")
+        if jobs > 1 and pipeline is None and (len(pcaps) > 1 or variants > 1):
+            # Worker processes cannot read the standard input of the current process
+            raise ValueError("The standard input cannot be fuzzed by worker processes, with multiple input files or variants")
+    if len(pcaps) == 1:
+        if output is None and pcaps[0] == STDIO:
+            # Filter mode: fuzz from the standard input to the standard output
+            output = STDIO
+        if output == STDIO and (chunks > 1 or variants > 1):
+            raise ValueError("The standard output cannot be written with chunks or variants")
+    else:
+        output, log = None, None
+    tasks = [(input_pcap, *get_output_paths(input_pcap, output, compress, log_format, log), random_range, packet_numbers, dry_run, seed) for input_pcap in pcaps]
+
+    # Variants mode: produce multiple fuzzed variants of each input PCAP file,
+    # reading it only once per worker process
+    if variants > 1:
+        variant_tasks = []
+        for input_pcap, output_pcap, csv_log, random_range, packet_numbers, dry_run, seed in tasks:
+            variant_seeds = [random.getrandbits(64) if seed is None else derive_seed(seed, "variant", v) for v in range(1, variants + 1)]
+            variant_paths = get_variant_paths(output_pcap, csv_log, variants)
+            file_variants = [(variant_seed, *paths) for variant_seed, paths in zip(variant_seeds, variant_paths)]
+            variant_tasks += [(input_pcap, file_variants[j::jobs], random_range, packet_numbers, dry_run, edit_count, edit_percent) for j in range(min(jobs, variants))]
+        if jobs == 1:
+            for task in variant_tasks:
+                fuzz_pcap_variants(*task, stats=stats, hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter)
+            return
+        # Input files are hashed once, and the workers' new templates are saved by the current process,
+        # as several workers fuzz variants of the same file
+        file_hashes = {input_pcap: None if cache_dir is None else hash_file(input_pcap) for input_pcap in pcaps}
+        new_templates = {input_pcap: {} for input_pcap in pcaps}
+        errors = 0
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(run_worker, None, fuzz_pcap_variants, *task, stats=None if stats is None else Stats(), hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter,
+                                       file_hash=file_hashes[task[0]], save_templates=False): task[0] for task in variant_tasks}
+            for done, future in enumerate(as_completed(futures), start=1):
+                input_pcap = futures[future]
+                try:
+                    worker_stats, worker_templates = future.result()
+                except Exception as e:
+                    errors += 1
+                    logging.error(f"[{done}/{len(variant_tasks)}] Failed to fuzz variants of PCAP file {input_pcap}: {e!r}")
                 else:
-                    # Packet won't be edited
-                    new_packets.append(Packet.rebuild_packet(packet))
+                    if stats is not None:
+                        stats.merge(worker_stats)
+                    new_templates[input_pcap].update(worker_templates)
+                    logging.info(f"[{done}/{len(variant_tasks)}] Fuzzed variants of PCAP file: {input_pcap}")
+        for input_pcap, templates in new_templates.items():
+            if templates:
+                with TemplateCache(cache_dir, input_pcap, file_hashes[input_pcap]) as cache:
+                    cache.merge(templates)
+        if errors > 0:
+            raise RuntimeError(f"{errors} out of {len(variant_tasks)} group(s) of variants could not be fuzzed.")
+        return
 
-                i += 1
+    # Exact count mode: randomly select the packets to edit in each input PCAP file before fuzzing,
+    # so the selection does not depend on the number of jobs or chunks
+    if edit_count is not None or edit_percent is not None:
+        tasks = [(input_pcap, output_pcap, csv_log, random_range, select_packets(input_pcap, edit_count, edit_percent, seed, packet_filter=packet_filter), dry_run, seed)
+                 for input_pcap, output_pcap, csv_log, random_range, _, dry_run, seed in tasks]
 
-        # Write output PCAP file
-        if output is not None and len(pcaps) == 1:
-            output_pcap = output
-        else:
-            output_dir = os.path.join(os.path.dirname(input_pcap), "edited")
-            os.makedirs(output_dir, exist_ok=True)
-            output_pcap = os.path.basename(input_pcap).replace(".pcap", ".edit.pcap")
-            output_pcap = os.path.join(output_dir, output_pcap)
-        if dry_run:
-            logging.info(f"Dry run: did not write output PCAP file: {output_pcap}")
-        else:
-            scapy.wrpcap(output_pcap, new_packets)
-            logging.info(f"Wrote output PCAP file: {output_pcap}")
+    # Chunked mode: split each input PCAP file into ranges of records,
+    # which are spread over a pool of worker processes
+    if chunks > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for task in tasks:
+                fuzz_pcap_chunked(executor, chunks, *task, stats=stats, hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter)
+        return
+
+    # Pipelined mode: loop on given input PCAP files,
+    # each one being fuzzed by a pool of worker threads or processes
+    if pipeline is not None:
+        for task in tasks:
+            fuzz_pcap(*task, stats=stats, hash_algorithm=hash_algorithm, cache_dir=cache_dir, pipeline=pipeline, workers=jobs, packet_filter=packet_filter)
+        return
+
+    # Sequential mode: loop on given input PCAP files
+    if jobs == 1 or len(pcaps) <= 1:
+        for task in tasks:
+            fuzz_pcap(*task, stats=stats, hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter)
+        return
+
+    # Parallel mode: spread input PCAP files over a pool of worker processes.
+    # Each file gets its own seed, drawn in order from the parent's random number generator,
+    # so results do not depend on how files are scheduled on workers.
+    worker_seeds = [random.getrandbits(64) for _ in tasks]
+    errors = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_worker, worker_seed, fuzz_pcap, *task, stats=None if stats is None else Stats(), hash_algorithm=hash_algorithm, cache_dir=cache_dir, packet_filter=packet_filter): task[0] for worker_seed, task in zip(worker_seeds, tasks)}
+        for done, future in enumerate(as_completed(futures), start=1):
+            input_pcap = futures[future]
+            try:
+                worker_stats, _ = future.result()
+            except Exception as e:
+                errors += 1
+                logging.error(f"[{done}/{len(tasks)}] Failed to fuzz PCAP file {input_pcap}: {e!r}")
+            else:
+                if stats is not None:
+                    stats.merge(worker_stats)
+                logging.info(f"[{done}/{len(tasks)}] Fuzzed PCAP file: {input_pcap}")
+
+    if errors > 0:
+        raise RuntimeError(f"{errors} out of {len(tasks)} PCAP file(s) could not be fuzzed.")
@@ -0,0 +1,121 @@
+"""
+Pipelined processing of a stream of items:
+a reader thread iterates over the items and submits work for them to a pool of workers,
+while the calling thread gets the results, in the order of the items.
+The number of items in flight is bounded, so the reader waits when the workers or the calling thread lag behind.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import random
+import queue
+import threading
+
+
+## Constants
+# Worker pools which can be used for the fuzzing stage
+PIPELINE_MODES = ("threads", "processes")
+# Maximum number of items in flight between the reader thread and the calling thread
+QUEUE_SIZE = 1024
+# Marker of the end of the items
+END = object()
+
+
+def open_executor(mode: str, workers: int) -> Executor:
+    """
+    Open the pool of workers of a pipeline.
+
+    :param mode: "threads" (workers share the process, e.g. to overlap I/O),
+                 or "processes" (for CPU-bound work, work items and results are pickled)
+    :param workers: number of workers
+    :return: pool of workers
+    :raises ValueError: if the mode is not supported
+    """
+    if mode == "threads":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fuzz")
+    if mode == "processes":
+        # Worker processes must not share the random state inherited from the parent process
+        return ProcessPoolExecutor(max_workers=workers, initializer=random.seed)
+    raise ValueError(f"Unsupported pipeline mode: {mode}")
+
+
+
+class OrderedPipeline:
+    """
+    Iterator over items and the results of the work submitted for them, in the order of the items.
+    The items are iterated over, and the work submitted, in a background reader thread.
+    """
+
+    def __init__(self, items: Iterable, submit: Callable[[Any], Optional[Future]], queue_size: int = QUEUE_SIZE) -> None:
+        """
+        Start the reader thread.
+
+        :param items: items to iterate over, e.g. records read from a file
+        :param submit: function submitting the work for an item to a pool of workers,
+                       and returning its future, or None if there is no work for the item
+        :param queue_size: [Optional] maximum number of items in flight. Default: QUEUE_SIZE.
+        """
+        self.items = items
+        self.submit = submit
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+        self.thread = threading.Thread(target=self.read, name="pipeline-reader", daemon=True)
+        self.thread.start()
+
+
+    def read(self) -> None:
+        """
+        Reader thread: iterate over the items and submit their work, until the end of the items or until closed.
+        The end of the items is signalled by the END marker, and errors by the exception itself.
+        """
+        try:
+            for item in self.items:
+                if self.closed:
+                    return
+                self.put((item, self.submit(item)))
+            self.put(END)
+        except Exception as e:
+            self.put(e)
+
+
+    def put(self, entry) -> None:
+        """
+        Queue an entry for the calling thread, unless the pipeline is closed.
+
+        :param entry: tuple containing an item and the future of its work, END marker, or exception
+        """
+        while not self.closed:
+            try:
+                self.queue.put(entry, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        """
+        Iterate over the items and the results of their work.
+
+        :return: iterator over tuples containing an item, and the result of its work, or None if there is no work
+        :raises Exception: the exception raised by the reader thread, or by the work for an item
+        """
+        try:
+            while True:
+                entry = self.queue.get()
+                if entry is END:
+                    return
+                if isinstance(entry, Exception):
+                    raise entry
+                item, future = entry
+                yield item, None if future is None else future.result()
+        finally:
+            self.close()
+
+
+    def close(self) -> None:
+        """
+        Stop the reader thread.
+        """
+        self.closed = True
+        self.thread.join()
@@ -0,0 +1,386 @@
+"""
+Memory-mapped reader for PCAP and PCAPNG files.
+Global and record headers are parsed directly,
+and each record is exposed as a `memoryview` slice of the mapped file,
+without copying its bytes nor dissecting it.
+Compressed files, pipes and the standard input are streamed instead.
+"""
+
+from __future__ import annotations
+from typing import List, NamedTuple, Optional, Tuple
+import sys
+import mmap
+import struct
+import logging
+import functools
+from .chunks import PCAP_MAGICS, GLOBAL_HEADER_LENGTH, RECORD_HEADER_LENGTH
+from .compression import CHUNK_SIZE, BackgroundReader, get_compression
+
+
+## Constants
+# PCAPNG block types
+PCAPNG_SHB = 0x0A0D0D0A  # Section Header Block
+PCAPNG_IDB = 0x00000001  # Interface Description Block
+PCAPNG_PB = 0x00000002   # Packet Block (obsolete)
+PCAPNG_SPB = 0x00000003  # Simple Packet Block
+PCAPNG_EPB = 0x00000006  # Enhanced Packet Block
+# PCAPNG byte-order magic, as written in the Section Header Block
+PCAPNG_BYTE_ORDER_MAGICS = {
+    b"\x1a\x2b\x3c\x4d": ">",
+    b"\x4d\x3c\x2b\x1a": "<"
+}
+# PCAPNG interface option code for the timestamp resolution
+PCAPNG_IF_TSRESOL = 9
+# Default PCAPNG timestamp resolution (microseconds)
+PCAPNG_DEFAULT_TSRESOL = 1000000
+# File path standing for the standard input (reader) or output (writer)
+STDIO = "-"
+
+
+class Interface(NamedTuple):
+    """
+    Capture interface, as described in a PCAPNG Interface Description Block.
+    """
+    linktype: int  # Link type
+    snaplen: int   # Maximum number of bytes captured per packet (0 if unlimited)
+    tsresol: int   # Timestamp resolution, in units per second
+
+
+class Record(NamedTuple):
+    """
+    Packet record of a PCAP(NG) file.
+    """
+    data: memoryview          # Captured packet bytes, as a slice of the reader buffer
+    linktype: int             # Link type of the capture interface
+    timestamp: Optional[int]  # Timestamp, in units of 1 / tsresol seconds, or None if the record has no timestamp
+    tsresol: int              # Timestamp resolution, in units per second
+    wirelen: int              # Original packet length on the wire
+    interface: int = 0        # Capture interface index (PCAPNG files only)
+    blocks: bytes = b""       # Raw PCAPNG blocks other than packet blocks (section headers, interface descriptions...)
+                              # read since the previous record (PCAPNG files only)
+
+
+class RecordReader:
+    """
+    Reader for PCAP and PCAPNG files, iterating over their packet records.
+    Plain files are memory-mapped, and records are views on the mapping.
+    Compressed files, and files which cannot be mapped (e.g. pipes), are read as streams,
+    compressed files being decompressed in a background thread.
+    Streamed records are returned as soon as their bytes are available,
+    so packets written to a pipe are not held back until a whole chunk is read.
+    """
+
+    def __init__(self, filename: str) -> None:
+        """
+        Open a PCAP(NG) file, and parse its global header.
+
+        :param filename: PCAP(NG) file path, possibly compressed (see `compression.COMPRESSIONS`),
+                         or STDIO to read the standard input
+        :raises ValueError: if the file is neither a PCAP nor a PCAPNG file
+        """
+        self.filename = filename
+        # Buffer holding the file bytes from absolute offset `base`,
+        # the whole file if mapped, a sliding window if streamed
+        self.base = 0
+        self.read_chunk = None
+        compression = None if filename == STDIO else get_compression(filename)
+        if filename == STDIO:
+            self.f = open(sys.stdin.fileno(), "rb", closefd=False)
+        elif compression is not None:
+            self.f = BackgroundReader(filename, compression)
+            self.read_chunk = self.f.read
+        else:
+            self.f = open(filename, "rb")
+        self.mapped = False
+        if self.read_chunk is None:
+            try:
+                self.buffer = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.mapped = True
+            except (ValueError, OSError):
+                # Empty file, or file which cannot be mapped:
+                # read what is available, up to a chunk, without waiting for a whole chunk
+                self.read_chunk = functools.partial(self.f.read1, CHUNK_SIZE)
+        if not self.mapped:
+            self.buffer = b""
+        self.view = memoryview(self.buffer)
+        self.interfaces: List[Interface] = []
+        # PCAPNG blocks other than packet blocks, read since the last record
+        self.blocks: List[bytes] = []
+        self.offset = 0
+        self.truncated = False
+
+        try:
+            self.read_header()
+        except Exception:
+            self.close()
+            raise
+
+
+    def read_header(self) -> None:
+        """
+        Parse the global header of a classic PCAP file, or the first section header of a PCAPNG file.
+
+        :raises ValueError: if the file is neither a PCAP nor a PCAPNG file
+        """
+        if not self.fill(0, 4):
+            raise ValueError(f"Not a PCAP or PCAPNG file: {self.filename}")
+        magic = bytes(self.view[:4])
+        if magic in PCAP_MAGICS:
+            # Classic PCAP file
+            self.pcapng = False
+            self.endian = PCAP_MAGICS[magic]
+            if not self.fill(0, GLOBAL_HEADER_LENGTH):
+                raise ValueError(f"Truncated PCAP global header: {self.filename}")
+            self.nano = magic in (b"\xa1\xb2\x3c\x4d", b"\x4d\x3c\xb2\xa1")
+            self.tsresol = 1000000000 if self.nano else 1000000
+            self.snaplen, self.linktype = struct.unpack_from(self.endian + "II", self.buffer, 16)
+            self.global_header = bytes(self.view[:GLOBAL_HEADER_LENGTH])
+            self.record_header = struct.Struct(self.endian + "IIII")
+            self.offset = GLOBAL_HEADER_LENGTH
+        elif struct.unpack_from("<I", self.buffer)[0] == PCAPNG_SHB and self.fill(0, 12):
+            # PCAPNG file, the byte order is set by each Section Header Block
+            self.pcapng = True
+            self.endian = "<"
+            self.nano = False
+            self.linktype = None
+            self.read_section_header()
+        else:
+            raise ValueError(f"Not a PCAP or PCAPNG file: {self.filename}")
+
+
+    def __enter__(self) -> RecordReader:
+        return self
+
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+    def close(self) -> None:
+        """
+        Unmap and close the file.
+        If records are still referenced, the mapping is released when the last one is.
+        """
+        self.view.release()
+        if self.mapped:
+            try:
+                self.buffer.close()
+            except BufferError:
+                pass
+        self.f.close()
+
+
+    def fill(self, offset: int, n: int) -> bool:
+        """
+        Make the buffer hold n bytes from a given offset.
+        For streamed files, the bytes before the offset are dropped from the buffer,
+        and new chunks are read if needed.
+
+        :param offset: absolute byte offset
+        :param n: number of bytes
+        :return: True if the n bytes are in the buffer, False if the file ends before
+        """
+        end = self.base + len(self.buffer)
+        if offset + n <= end:
+            return True
+        if self.read_chunk is None:
+            return False
+        chunks = [self.buffer[offset - self.base:]] if offset < end else []
+        # Bytes skipped in the stream, before the offset
+        skip = max(0, offset - end)
+        available = sum(len(chunk) for chunk in chunks) - skip
+        while available < n:
+            chunk = self.read_chunk()
+            if not chunk:
+                break
+            chunks.append(chunk)
+            available += len(chunk)
+        self.buffer = b"".join(chunks)[skip:]
+        self.base = offset
+        self.view = memoryview(self.buffer)
+        return available >= n
+
+
+    def __iter__(self) -> RecordReader:
+        return self
+
+
+    def __next__(self) -> Record:
+        """
+        Read the next record.
+
+        :return: next record
+        :raises StopIteration: at the end of the file
+        """
+        if self.pcapng:
+            return self.read_block()
+        offset = self.offset
+        if not self.fill(offset, RECORD_HEADER_LENGTH):
+            raise StopIteration
+        sec, frac, caplen, wirelen = self.record_header.unpack_from(self.buffer, offset - self.base)
+        # Truncated last record: keep the available bytes
+        self.fill(offset, RECORD_HEADER_LENGTH + caplen)
+        start = offset + RECORD_HEADER_LENGTH - self.base
+        self.offset = offset + RECORD_HEADER_LENGTH + caplen
+        return Record(self.view[start:start + caplen], self.linktype, sec * self.tsresol + frac, self.tsresol, wirelen)
+
+
+    def tell(self) -> int:
+        """
+        Get the byte offset of the next record, or block for PCAPNG files.
+
+        :return: byte offset in the file
+        """
+        return self.offset
+
+
+    def seek(self, offset: int) -> None:
+        """
+        Move to a given record, e.g. as returned by `tell` or `chunks.split_pcap`.
+        Streamed files can only move forward.
+
+        :param offset: byte offset of the record, or block for PCAPNG files
+        :raises ValueError: if a streamed file would move backward
+        """
+        if not self.mapped and offset < self.base:
+            raise ValueError(f"Cannot seek backward in streamed file: {self.filename}")
+        self.offset = offset
+
+
+    def skip(self, n: int = None) -> int:
+        """
+        Skip records without building them.
+        For classic PCAP files, only the record headers are read.
+
+        :param n: [Optional] number of records to skip. Default: None (skip until end of file).
+        :return: number of records actually skipped
+        """
+        skipped = 0
+        if self.pcapng:
+            while (n is None or skipped < n) and self.find_packet_block() is not None:
+                skipped += 1
+            return skipped
+        offset = self.offset
+        unpack_from = self.record_header.unpack_from
+        while (n is None or skipped < n) and self.fill(offset, RECORD_HEADER_LENGTH):
+            offset += RECORD_HEADER_LENGTH + unpack_from(self.buffer, offset - self.base)[2]
+            skipped += 1
+        self.offset = offset
+        return skipped
+
+
+    def read_section_header(self) -> None:
+        """
+        Parse the PCAPNG Section Header Block at the current offset,
+        setting the byte order of the section and resetting its interfaces.
+
+        :raises ValueError: if the block byte-order magic is invalid
+        """
+        start = self.offset + 8 - self.base
+        endian = PCAPNG_BYTE_ORDER_MAGICS.get(bytes(self.view[start:start + 4]))
+        if endian is None:
+            raise ValueError(f"Invalid PCAPNG section header: {self.filename}")
+        self.endian = endian
+        self.interfaces = []
+
+
+    def read_interface(self, start: int, end: int) -> Interface:
+        """
+        Parse a PCAPNG Interface Description Block body.
+
+        :param start: position of the block body in the buffer
+        :param end: position of the end of the block body in the buffer
+        :return: capture interface
+        """
+        linktype, snaplen = struct.unpack_from(self.endian + "HxxI", self.buffer, start)
+        tsresol = PCAPNG_DEFAULT_TSRESOL
+        position = start + 8
+        while position + 4 <= end:
+            code, length = struct.unpack_from(self.endian + "HH", self.buffer, position)
+            if code == 0:
+                break
+            if code == PCAPNG_IF_TSRESOL and length >= 1:
+                value = self.buffer[position + 4]
+                tsresol = (2 if value & 0x80 else 10) ** (value & 0x7F)
+            position += 4 + length + (-length % 4)
+        return Interface(linktype, snaplen, tsresol)
+
+
+    def get_interface(self, index: int) -> Interface:
+        """
+        Get a capture interface of the current PCAPNG section.
+
+        :param index: interface index
+        :return: capture interface
+        :raises ValueError: if the interface is not described
+        """
+        try:
+            return self.interfaces[index]
+        except IndexError:
+            raise ValueError(f"Packet for undescribed interface {index} in PCAPNG file: {self.filename}")
+
+
+    def find_packet_block(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Read PCAPNG blocks until the next packet block,
+        parsing the section headers and interface descriptions found on the way,
+        and keeping the raw bytes of the blocks other than packet blocks, to be copied to the output.
+
+        :return: tuple containing the type of the packet block,
+                 and the positions of the start and end of its body in the buffer,
+                 or None at the end of the file
+        """
+        while True:
+            offset = self.offset
+            if self.truncated or not self.fill(offset, 12):
+                return None
+            position = offset - self.base
+            block_type = struct.unpack_from(self.endian + "I", self.buffer, position)[0]
+            if block_type == PCAPNG_SHB:
+                self.read_section_header()
+            block_length = struct.unpack_from(self.endian + "I", self.buffer, position + 4)[0]
+            if block_length < 12 or not self.fill(offset, block_length):
+                logging.warning(f"Truncated PCAPNG block at offset {offset}: {self.filename}")
+                self.truncated = True
+                return None
+            position = offset - self.base
+            self.offset = offset + block_length + (-block_length % 4)
+            start = position + 8
+            end = position + block_length - 4
+            if block_type in (PCAPNG_EPB, PCAPNG_SPB, PCAPNG_PB):
+                return block_type, start, end
+            if block_type == PCAPNG_IDB:
+                self.interfaces.append(self.read_interface(start, end))
+            self.blocks.append(bytes(self.view[position:position + block_length]) + bytes(-block_length % 4))
+
+    def read_block(self) -> Record:
+        """
+        Read the record of the next PCAPNG packet block.
+
+        :return: next record
+        :raises StopIteration: at the end of the file
+        """
+        block = self.find_packet_block()
+        if block is None:
+            raise StopIteration
+        block_type, start, end = block
+        if block_type == PCAPNG_EPB:
+            index, tshigh, tslow, caplen, wirelen = struct.unpack_from(self.endian + "IIIII", self.buffer, start)
+            data_start = start + 20
+        elif block_type == PCAPNG_PB:
+            index, _, tshigh, tslow, caplen, wirelen = struct.unpack_from(self.endian + "HHIIII", self.buffer, start)
+            data_start = start + 20
+        else:
+            # Simple Packet Block: first interface, no timestamp,
+            # captured length bounded by the interface snapshot length
+            index, tshigh = 0, None
+            wirelen = struct.unpack_from(self.endian + "I", self.buffer, start)[0]
+            caplen = min(wirelen, end - start - 4)
+            data_start = start + 4
+        interface = self.get_interface(index)
+        if block_type == PCAPNG_SPB and interface.snaplen > 0:
+            caplen = min(caplen, interface.snaplen)
+        timestamp = None if tshigh is None else (tshigh << 32) + tslow
+        blocks = b"".join(self.blocks)
+        self.blocks = []
+        return Record(self.view[data_start:data_start + caplen], interface.linktype, timestamp, interface.tsresol, wirelen, index, blocks)
@@ -0,0 +1,318 @@
+"""
+Selection of the packets to edit by packet number,
+either given as a sorted index of packet number ranges,
+or sampled at random by blocks of packet numbers.
+"""
+
+from __future__ import annotations
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple, Union
+from bisect import bisect_left, bisect_right
+import math
+import random
+from .reader import Record, RecordReader
+
+
+class PacketSelection:
+    """
+    Set of packet numbers (starting from 1),
+    stored as sorted, disjoint, non-adjacent ranges.
+    Membership tests are in O(log K), K being the number of ranges.
+    """
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = ()) -> None:
+        """
+        Packet selection constructor.
+
+        :param ranges: ranges of packet numbers, as (first, last) tuples (both included),
+                       in any order, possibly overlapping.
+        """
+        merged = []
+        for first, last in sorted(ranges):
+            if merged and first <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], last)
+            else:
+                merged.append([first, last])
+        self.firsts = [first for first, _ in merged]
+        self.lasts = [last for _, last in merged]
+
+
+    @classmethod
+    def parse(cls, packet_numbers: Iterable[Union[int, str, Tuple[int, int]]]) -> PacketSelection:
+        """
+        Build a packet selection from a list of packet numbers and ranges.
+
+        :param packet_numbers: packet numbers, as integers, (first, last) tuples,
+                               or strings such as "5", "100-200" or "1,3,7-9".
+        :return: packet selection
+        :raises ValueError: if a packet number or range is invalid
+        """
+        if isinstance(packet_numbers, PacketSelection):
+            return packet_numbers
+        ranges = []
+        for item in packet_numbers:
+            if isinstance(item, str):
+                ranges += parse_packet_numbers(item)
+            elif isinstance(item, tuple):
+                ranges.append(check_range(*item))
+            else:
+                ranges.append(check_range(item, item))
+        return cls(ranges)
+
+
+    def __contains__(self, i: int) -> bool:
+        """
+        Check if a packet number is selected.
+
+        :param i: packet number
+        :return: True if the packet number is selected, False otherwise
+        """
+        j = bisect_right(self.firsts, i) - 1
+        return j >= 0 and i <= self.lasts[j]
+
+
+    def __len__(self) -> int:
+        """
+        Get the number of selected packet numbers.
+
+        :return: number of selected packet numbers
+        """
+        return sum(last - first + 1 for first, last in zip(self.firsts, self.lasts))
+
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        Iterate over the selected packet numbers, in increasing order.
+
+        :return: iterator over the selected packet numbers
+        """
+        for first, last in zip(self.firsts, self.lasts):
+            yield from range(first, last + 1)
+
+
+    @property
+    def last(self) -> int:
+        """
+        Get the greatest selected packet number.
+
+        :return: greatest selected packet number, or 0 if no packet is selected
+        """
+        return self.lasts[-1] if self.lasts else 0
+
+
+    def next_selected(self, i: int) -> int:
+        """
+        Get the smallest selected packet number greater than or equal to a given one.
+
+        :param i: packet number
+        :return: next selected packet number, or None if there is none
+        """
+        j = bisect_right(self.firsts, i) - 1
+        if j >= 0 and i <= self.lasts[j]:
+            return i
+        return self.firsts[j + 1] if j + 1 < len(self.firsts) else None
+
+
+
+class RandomSelection:
+    """
+    Random selection of packet numbers, each packet being selected with probability 1 / random_range.
+    Packet numbers are sampled by blocks: for each block,
+    the gaps between selected packet numbers are drawn from a geometric distribution,
+    so the random number generator is only called once per selected packet, not once per packet.
+    Packet numbers must be queried in increasing order.
+    """
+
+    # Number of packet numbers per block
+    BLOCK_SIZE = 4096
+
+    # Greatest selected packet number: unbounded
+    last = None
+
+
+    def __init__(self, random_range: int, rng_factory: Callable[[int], random.Random] = None) -> None:
+        """
+        Random selection constructor.
+
+        :param random_range: upper bound for random range (not included)
+        :param rng_factory: [Optional] function returning the random number generator for a given block index,
+                            e.g. a generator seeded from the block index, so the selection does not depend
+                            on which blocks are sampled.
+                            Default: None (use the global random number generator for all blocks).
+        """
+        self.random_range = random_range
+        self.rng_factory = rng_factory
+        # Last sampled block
+        self.block_index = -1
+        self.block = []
+        self.block_set = set()
+
+
+    def sample_block(self, block_index: int) -> List[int]:
+        """
+        Sample the selected packet numbers of a block.
+
+        :param block_index: block index (starting from 0)
+        :return: sorted list of selected packet numbers in the block
+        """
+        start = block_index * self.BLOCK_SIZE + 1
+        end = start + self.BLOCK_SIZE
+        if self.random_range == 1:
+            return list(range(start, end))
+        rng = random if self.rng_factory is None else self.rng_factory(block_index)
+        log_q = math.log1p(-1 / self.random_range)
+        selected = []
+        i = start - 1
+        while True:
+            # Number of packets until the next selected one, geometric distribution
+            i += 1 + int(math.log(1.0 - rng.random()) / log_q)
+            if i >= end:
+                return selected
+            selected.append(i)
+
+
+    def load_block(self, block_index: int) -> None:
+        """
+        Sample a block, unless it is the last sampled one.
+
+        :param block_index: block index (starting from 0)
+        """
+        if block_index != self.block_index:
+            self.block_index = block_index
+            self.block = self.sample_block(block_index)
+            self.block_set = set(self.block)
+
+
+    def __contains__(self, i: int) -> bool:
+        """
+        Check if a packet number is selected.
+
+        :param i: packet number
+        :return: True if the packet number is selected, False otherwise
+        """
+        self.load_block((i - 1) // self.BLOCK_SIZE)
+        return i in self.block_set
+
+
+    def next_selected(self, i: int) -> int:
+        """
+        Get the smallest selected packet number greater than or equal to a given one.
+
+        :param i: packet number
+        :return: next selected packet number
+        """
+        block_index = (i - 1) // self.BLOCK_SIZE
+        while True:
+            self.load_block(block_index)
+            j = bisect_left(self.block, i)
+            if j < len(self.block):
+                return self.block[j]
+            block_index += 1
+
+
+
+def check_range(first: int, last: int) -> Tuple[int, int]:
+    """
+    Check a range of packet numbers.
+
+    :param first: first packet number of the range
+    :param last: last packet number of the range
+    :return: range of packet numbers, as a (first, last) tuple
+    :raises ValueError: if the range is empty or packet numbers are not strictly positive
+    """
+    if first < 1 or last < first:
+        raise ValueError(f"Invalid packet number range: {first}-{last}")
+    return first, last
+
+
+def parse_packet_numbers(spec: str) -> List[Tuple[int, int]]:
+    """
+    Parse a packet number specification, e.g. "5", "100-200" or "1,3,7-9".
+
+    :param spec: packet numbers and ranges, separated by commas or whitespace
+    :return: list of ranges of packet numbers, as (first, last) tuples
+    :raises ValueError: if the specification is invalid
+    """
+    ranges = []
+    for item in spec.replace(",", " ").split():
+        first, sep, last = item.partition("-")
+        try:
+            ranges.append(check_range(int(first), int(last) if sep else int(first)))
+        except ValueError:
+            raise ValueError(f"Invalid packet number or range: {item}")
+    return ranges
+
+
+def read_packet_numbers_file(path: str) -> List[Tuple[int, int]]:
+    """
+    Read packet numbers and ranges from a file,
+    separated by commas, whitespace or newlines.
+    Text following a '#' on a line is ignored.
+
+    :param path: file path
+    :return: list of ranges of packet numbers, as (first, last) tuples
+    :raises ValueError: if the file contains an invalid packet number or range
+    """
+    ranges = []
+    with open(path) as f:
+        for line in f:
+            ranges += parse_packet_numbers(line.split("#", 1)[0])
+    return ranges
+
+
+def iter_selected_records(reader: RecordReader, selection: PacketSelection, first_id: int = 1, count: int = None) -> Iterator[Tuple[int, Record]]:
+    """
+    Read only the selected records from a PCAP(NG) reader.
+    Records which are not selected are skipped without being built,
+    and reading stops after the last selected record.
+
+    :param reader: PCAP(NG) reader
+    :param selection: selected packet numbers, as a `PacketSelection` or a `RandomSelection`
+    :param first_id: [Optional] packet number of the next record to be read. Default: 1.
+    :param count: [Optional] maximum number of records to read. Default: None (read until end of file).
+    :return: iterator over tuples containing the packet number and the record
+    """
+    end = None if count is None else first_id + count
+    i = first_id
+    while True:
+        next_i = selection.next_selected(i)
+        if next_i is None or (end is not None and next_i >= end):
+            return
+        # Skip records which are not selected
+        if next_i > i:
+            i += reader.skip(next_i - i)
+            if i < next_i:
+                return
+        # Read selected record
+        record = next(reader, None)
+        if record is None:
+            return
+        yield i, record
+        i += 1
+
+
+def count_records(input_pcap: str) -> int:
+    """
+    Count the records of a PCAP(NG) file, without building them.
+
+    :param input_pcap: input PCAP(NG) file path
+    :return: number of records
+    """
+    with RecordReader(input_pcap) as reader:
+        return reader.skip()
+
+
+def sample_packet_numbers(n: int, edit_count: int = None, edit_percent: float = None, rng: random.Random = random, candidates: Sequence[int] = None) -> PacketSelection:
+    """
+    Select an exact number of packets at random, among n packets.
+
+    :param n: total number of packets
+    :param edit_count: [Optional] number of packets to select
+    :param edit_percent: [Optional] percentage of packets to select, used if edit_count is not specified
+    :param rng: [Optional] random number generator. Default: global `random` module.
+    :param candidates: [Optional] packet numbers to select from, n being their number.
+                       Default: None (all packet numbers, from 1 to n).
+    :return: selected packet numbers
+    """
+    k = edit_count if edit_count is not None else round(n * edit_percent / 100)
+    population = range(1, n + 1) if candidates is None else candidates
+    return PacketSelection((i, i) for i in rng.sample(population, min(k, n)))
@@ -0,0 +1,182 @@
+"""
+Timing counters for the stages of the fuzzing pipeline,
+broken down by protocol.
+"""
+
+from __future__ import annotations
+from typing import Iterable, Iterator
+from collections import defaultdict
+from time import perf_counter
+import functools
+
+
+class Stats:
+    """
+    Cumulative time and number of calls of each pipeline stage,
+    and number of fallbacks, indexed by protocol.
+    Time spent in nested stages is not included in the time of the enclosing stage.
+
+    Measurements go through the `record` and `count` methods,
+    which can be overridden to forward them elsewhere.
+    """
+
+    # Protocol name used for stages which are not specific to a protocol
+    ALL = "-"
+
+
+    def __init__(self) -> None:
+        """
+        Empty statistics constructor.
+        """
+        self.times = defaultdict(float)   # (stage, protocol) -> cumulative time (in seconds)
+        self.calls = defaultdict(int)     # (stage, protocol) -> number of calls
+        self.fallbacks = defaultdict(int) # (event, protocol) -> number of fallbacks
+        # Time spent in nested stages, for each running stage
+        self._nested = []
+
+
+    def start(self) -> float:
+        """
+        Start timing a stage.
+
+        :return: Start time, to be given to `stop`.
+        """
+        self._nested.append(0.0)
+        return perf_counter()
+
+
+    def stop(self, stage: str, protocol: str, start: float) -> None:
+        """
+        Stop timing a stage, and record its time.
+
+        :param stage: Stage name.
+        :param protocol: Protocol name.
+        :param start: Start time, as returned by `start`.
+        """
+        elapsed = perf_counter() - start
+        nested = self._nested.pop()
+        if self._nested:
+            self._nested[-1] += elapsed
+        self.record(stage, protocol, elapsed - nested)
+
+
+    def record(self, stage: str, protocol: str, seconds: float) -> None:
+        """
+        Record one call of a stage.
+
+        :param stage: Stage name.
+        :param protocol: Protocol name.
+        :param seconds: Time spent in the stage, excluding nested stages.
+        """
+        self.times[(stage, protocol)] += seconds
+        self.calls[(stage, protocol)] += 1
+
+
+    def count(self, event: str, protocol: str) -> None:
+        """
+        Record one fallback.
+
+        :param event: Fallback name.
+        :param protocol: Protocol name.
+        """
+        self.fallbacks[(event, protocol)] += 1
+
+
+    def timed_iter(self, stage: str, iterable: Iterable) -> Iterator:
+        """
+        Iterate over an iterable, timing the production of each item as a stage.
+
+        :param stage: Stage name.
+        :param iterable: Iterable to time.
+        :return: Iterator over the same items.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = self.start()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self._nested.pop()
+                return
+            self.stop(stage, Stats.ALL, start)
+            yield item
+
+
+    def merge(self, other: Stats) -> None:
+        """
+        Add the measurements of another statistics object,
+        e.g. from a worker process.
+
+        :param other: Statistics to add.
+        """
+        for key, seconds in other.times.items():
+            self.times[key] += seconds
+        for key, calls in other.calls.items():
+            self.calls[key] += calls
+        for key, fallbacks in other.fallbacks.items():
+            self.fallbacks[key] += fallbacks
+
+
+    def to_dict(self) -> dict:
+        """
+        Get the measurements as a dictionary, e.g. to be serialized as JSON.
+
+        :return: Dictionary containing, for each stage, the cumulative time and number of calls,
+                 in total and for each protocol,
+                 and for each fallback, its number of occurrences for each protocol.
+        """
+        stages = {}
+        for (stage, protocol), seconds in self.times.items():
+            d = stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "protocols": {}})
+            d["seconds"] += seconds
+            d["calls"] += self.calls[(stage, protocol)]
+            d["protocols"][protocol] = {"seconds": seconds, "calls": self.calls[(stage, protocol)]}
+        fallbacks = {}
+        for (event, protocol), n in self.fallbacks.items():
+            fallbacks.setdefault(event, {})[protocol] = n
+        return {"stages": stages, "fallbacks": fallbacks}
+
+
+    def summary(self) -> str:
+        """
+        Get a human-readable summary of the measurements.
+
+        :return: Summary table, one line per stage and protocol, sorted by decreasing time.
+        """
+        total = sum(self.times.values())
+        lines = [f"{'stage':<10} {'protocol':<14} {'calls':>10} {'time (s)':>10} {'mean (us)':>10} {'share':>7}"]
+        for (stage, protocol), seconds in sorted(self.times.items(), key=lambda item: -item[1]):
+            calls = self.calls[(stage, protocol)]
+            share = seconds / total if total > 0 else 0
+            lines.append(f"{stage:<10} {protocol:<14} {calls:>10} {seconds:>10.3f} {seconds / calls * 1e6:>10.1f} {share:>7.1%}")
+        lines.append(f"{'total':<10} {'':<14} {'':>10} {total:>10.3f}")
+        if self.fallbacks:
+            lines.append("")
+            lines.append(f"{'fallback':<14} {'protocol':<14} {'count':>10}")
+            for (event, protocol), n in sorted(self.fallbacks.items()):
+                lines.append(f"{event:<14} {protocol:<14} {n:>10}")
+        return "\n".join(lines)
+
+
+
+def timed(stage: str):
+    """
+    Decorator for fuzzer class methods, timing them as a stage
+    if the instance has a statistics object in its `stats` attribute.
+
+    :param stage: Stage name.
+    :return: Method decorator.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            stats = self.stats
+            if stats is None:
+                return method(self, *args, **kwargs)
+            start = stats.start()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                stats.stop(stage, self.name, start)
+        return wrapper
+    return decorator
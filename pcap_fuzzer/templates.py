@@ -0,0 +1,208 @@
+"""
+On-disk cache of packet templates, i.e. the result of the dissection of the packets of an input file
+which is needed to fuzz them: their supported layers, the fuzzer class of each layer,
+and, for layers which can be edited directly in the packet wire bytes, their offset and field values.
+Packets whose template is cached are fuzzed without being dissected by Scapy, when possible.
+
+Templates are stored in one file per input file, named after the hash of the input file content,
+and are discarded if they were built with another Scapy version or cache format.
+They are added as packets are dissected, so the cache fills up over repeated runs.
+"""
+
+from __future__ import annotations
+from typing import ContextManager, Dict, NamedTuple, Optional, Tuple
+from contextlib import nullcontext
+import os
+import pickle
+import hashlib
+import logging
+import scapy
+
+
+## Constants
+# Version of the cache file format, to be increased when templates or fuzzer classes change
+CACHE_VERSION = 2
+# Size of the blocks in which input files are hashed (in bytes)
+HASH_BLOCK_SIZE = 1 << 20
+
+
+class LayerTemplate(NamedTuple):
+    """
+    Template of a supported packet layer.
+    """
+    index: int               # Layer index in the packet
+    protocol: str            # Fuzzer class name
+    offset: int = -1         # Byte offset of the layer in the packet wire bytes, -1 if the layer must be dissected
+    values: dict = None      # Values of the modifiable fields, None if the layer must be dissected
+
+
+class PacketTemplate(NamedTuple):
+    """
+    Template of a packet: length of its first layer header,
+    and its supported layers, from the highest one to the lowest one.
+    An empty list of layers means that the packet has no supported protocol.
+    """
+    header_length: int
+    layers: Tuple[LayerTemplate, ...]
+
+
+
+class TemplateLayer(dict):
+    """
+    Stand-in for a Scapy layer, holding the field values of a layer template.
+    """
+
+    def getfieldval(self, field: str):
+        return self[field]
+
+
+    def setfieldval(self, field: str, value) -> None:
+        self[field] = value
+
+
+
+def hash_file(path: str) -> str:
+    """
+    Hash the content of a file.
+
+    :param path: file path
+    :return: hexadecimal BLAKE2b hash (256 bits) of the file content
+    """
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+
+class TemplateCache:
+    """
+    Templates of the packets of an input file, indexed by packet number,
+    loaded from the cache directory, and saved back with the new templates when closed.
+    Worker processes fuzzing the same file (chunks or variants) do not save their cache,
+    but return their new templates, which the parent process merges and saves once.
+    Without cache directory, templates are only kept in memory, e.g. for the variants of a file.
+    Concurrent runs on the same file may overwrite each other's new templates,
+    which are then built again by the next runs.
+    """
+
+    def __init__(self, cache_dir: str, input_pcap: str, file_hash: str = None, save: bool = True) -> None:
+        """
+        Load the cached templates of an input file, if any.
+
+        :param cache_dir: cache directory, created if it does not exist,
+                          or None to keep the templates in memory only, without hashing the input file
+        :param input_pcap: input PCAP file path
+        :param file_hash: [Optional] hash of the input file content, see `hash_file`, if already computed.
+                          Default: None (hash the input file).
+        :param save: [Optional] if False, the new templates are not saved when the cache is closed,
+                     but kept in `new_templates`, to be merged by the parent process.
+                     Default: True.
+        """
+        if cache_dir is None:
+            self.file_hash, self.path = None, None
+        else:
+            self.file_hash = hash_file(input_pcap) if file_hash is None else file_hash
+            self.path = os.path.join(cache_dir, f"{self.file_hash}.pickle")
+        self.save = save and self.path is not None
+        self.templates = {} if self.path is None else self.load()
+        self.new_templates: Dict[int, PacketTemplate] = {}
+
+
+    def __enter__(self) -> TemplateCache:
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+
+
+    def load(self) -> Dict[int, PacketTemplate]:
+        """
+        Load the templates from the cache file.
+
+        :return: templates indexed by packet number,
+                 empty if the cache file does not exist, cannot be read,
+                 or was written by another Scapy version or cache format
+        """
+        try:
+            with open(self.path, "rb") as f:
+                content = pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable template cache file {self.path}: {e!r}")
+            return {}
+        if content.get("version") != CACHE_VERSION or content.get("scapy") != scapy.VERSION:
+            logging.info(f"Ignoring outdated template cache file: {self.path}")
+            return {}
+        return content["templates"]
+
+
+    def get(self, i: int) -> Optional[PacketTemplate]:
+        """
+        Get the template of a packet.
+
+        :param i: packet number (starting from 1)
+        :return: packet template, or None if it is not cached
+        """
+        return self.templates.get(i)
+
+
+    def add(self, i: int, template: PacketTemplate) -> None:
+        """
+        Add the template of a packet, to be saved when the cache is closed.
+
+        :param i: packet number (starting from 1)
+        :param template: packet template
+        """
+        self.templates[i] = template
+        self.new_templates[i] = template
+
+
+    def merge(self, templates: Dict[int, PacketTemplate]) -> None:
+        """
+        Add the templates built by a worker process, to be saved when the cache is closed.
+
+        :param templates: new templates of the worker's cache, indexed by packet number
+        """
+        self.templates.update(templates)
+        self.new_templates.update(templates)
+
+
+    def close(self) -> None:
+        """
+        Save the cache file, with the templates added since it was loaded,
+        and those saved by other runs in the meantime.
+        The file is replaced atomically.
+        Nothing is saved if the cache was opened with `save=False`.
+        """
+        if not self.save or not self.new_templates:
+            return
+        templates = self.load()
+        templates.update(self.new_templates)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": CACHE_VERSION, "scapy": scapy.VERSION, "templates": templates}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        logging.info(f"Saved {len(self.new_templates)} new packet templates to cache file: {self.path}")
+        self.new_templates = {}
+
+
+
+def open_template_cache(cache_dir: Optional[str], input_pcap: str, file_hash: str = None, save: bool = True) -> ContextManager[Optional[TemplateCache]]:
+    """
+    Open the template cache of an input file, if a cache directory is specified.
+
+    :param cache_dir: cache directory, or None if templates are not cached
+    :param input_pcap: input PCAP file path
+    :param file_hash: [Optional] hash of the input file content, if already computed. Default: None (hash the input file).
+    :param save: [Optional] if False, the new templates are not saved when the cache is closed. Default: True.
+    :return: context manager giving the template cache, or None if templates are not cached
+    """
+    if cache_dir is None:
+        return nullcontext()
+    return TemplateCache(cache_dir, input_pcap, file_hash, save)
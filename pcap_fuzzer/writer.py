@@ -0,0 +1,170 @@
+"""
+Buffered writer for PCAP and PCAPNG files,
+appending records as they come,
+and atomically replacing the output file once it is complete.
+Output files are compressed if their extension is a compression extension (e.g. `.gz`).
+Records can also be streamed to the standard output, flushed as they are written.
+"""
+
+from __future__ import annotations
+import io
+import os
+import sys
+import struct
+from .reader import STDIO, PCAPNG_SHB, PCAPNG_SPB, PCAPNG_EPB, PCAPNG_BYTE_ORDER_MAGICS, Record, RecordReader
+from .compression import get_compression, open_compressed
+
+
+## Constants
+# Write buffer size (in bytes)
+BUFFER_SIZE = 1 << 20
+
+
+class RecordWriter:
+    """
+    Buffered writer for PCAP and PCAPNG files.
+    The output is written to a temporary file next to the output file,
+    which is renamed to the output file only when the writer is closed without error,
+    so an interrupted run never leaves a truncated PCAP file behind.
+    The standard output is written directly, uncompressed, and flushed after each record,
+    so the next program of a pipeline gets each packet as soon as it is fuzzed.
+
+    For classic PCAP inputs, the global header of the input file is copied,
+    so the output keeps its byte order, link type, snapshot length and timestamp resolution.
+    For PCAPNG inputs, the output is a PCAPNG file: the blocks other than packet blocks
+    (section headers, interface descriptions, statistics...) are copied as-is,
+    and each record is written on its own interface, with its original timestamp,
+    so captures with several interfaces, link types or timestamp resolutions are kept as they are.
+    Records are written as Enhanced Packet Blocks, or Simple Packet Blocks if they have no timestamp,
+    without the options of the input packet blocks.
+    """
+
+    def __init__(self, filename: str, reader: RecordReader) -> None:
+        """
+        Open the temporary output file.
+
+        :param filename: output PCAP file path, possibly with a compression extension,
+                         or STDIO to write to the standard output
+        :param reader: input PCAP(NG) reader the records are read from
+        """
+        self.filename = filename
+        self.stdout = filename == STDIO
+        self.tmp_filename = None if self.stdout else f"{filename}.tmp"
+        compression = None if self.stdout else get_compression(filename)
+        if self.stdout:
+            self.f = open(sys.stdout.fileno(), "wb", buffering=BUFFER_SIZE, closefd=False)
+        elif compression is None:
+            self.f = open(self.tmp_filename, "wb", buffering=BUFFER_SIZE)
+        else:
+            self.f = io.BufferedWriter(open_compressed(self.tmp_filename, "wb", compression), BUFFER_SIZE)
+        self.reader = reader
+        self.pcapng = reader.pcapng
+        # Byte order of the output, set by each section header for PCAPNG files
+        self.endian = "<" if reader.pcapng else reader.endian
+        self.record_header = struct.Struct(self.endian + "IIII")
+        if not reader.pcapng:
+            # The section header and interface descriptions of PCAPNG files come with the first record
+            self.f.write(reader.global_header)
+            if self.stdout:
+                self.f.flush()
+
+
+    def __enter__(self) -> RecordWriter:
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+    def write_blocks(self, blocks: bytes) -> None:
+        """
+        Copy raw PCAPNG blocks other than packet blocks,
+        following the byte order set by the section headers.
+
+        :param blocks: raw PCAPNG blocks, as read by `RecordReader`
+        """
+        position = 0
+        while position + 12 <= len(blocks):
+            # The section header block type reads the same in both byte orders
+            if struct.unpack_from("<I", blocks, position)[0] == PCAPNG_SHB:
+                self.endian = PCAPNG_BYTE_ORDER_MAGICS[bytes(blocks[position + 8:position + 12])]
+            block_length = struct.unpack_from(self.endian + "I", blocks, position + 4)[0]
+            position += block_length + (-block_length % 4)
+        self.f.write(blocks)
+
+
+    def write_packet_block(self, record: Record, data: bytes, wirelen: int) -> None:
+        """
+        Write a record as a PCAPNG packet block, on its capture interface.
+
+        :param record: PCAPNG record
+        :param data: record bytes
+        :param wirelen: original length of the packet on the wire
+        """
+        padding = -len(data) % 4
+        if record.timestamp is None:
+            block_length = 16 + len(data) + padding
+            self.f.write(struct.pack(self.endian + "III", PCAPNG_SPB, block_length, wirelen))
+        else:
+            block_length = 32 + len(data) + padding
+            self.f.write(struct.pack(self.endian + "IIIIIII", PCAPNG_EPB, block_length, record.interface,
+                                     record.timestamp >> 32, record.timestamp & 0xFFFFFFFF, len(data), wirelen))
+        self.f.write(data)
+        self.f.write(bytes(padding) + struct.pack(self.endian + "I", block_length))
+
+
+    def write(self, record: Record, new_data: bytes = None) -> None:
+        """
+        Append a record to the output file, keeping its original timestamp.
+        Unedited records are written from their original bytes, without copying them first.
+
+        :param record: PCAP(NG) record
+        :param new_data: [Optional] new record bytes, if the packet was edited.
+                         The record wire length is adjusted by the difference in length.
+                         Default: None (copy the record as-is).
+        """
+        data = record.data
+        wirelen = record.wirelen
+        if new_data is not None:
+            wirelen += len(new_data) - len(data)
+            data = new_data
+        if self.pcapng:
+            if record.blocks:
+                self.write_blocks(record.blocks)
+            self.write_packet_block(record, data, wirelen)
+        else:
+            sec, frac = divmod(record.timestamp, record.tsresol)
+            self.f.write(self.record_header.pack(sec, frac, len(data), wirelen))
+            self.f.write(data)
+        if self.stdout:
+            self.f.flush()
+
+
+    def close(self) -> None:
+        """
+        Flush the output file, and rename it to its final name.
+        For PCAPNG files, the blocks read after the last record (e.g. interface statistics) are copied first.
+        """
+        if self.pcapng:
+            self.write_blocks(b"".join(self.reader.blocks))
+        self.f.close()
+        if not self.stdout:
+            os.replace(self.tmp_filename, self.filename)
+
+
+    def abort(self) -> None:
+        """
+        Close and delete the temporary output file, leaving any previous output file untouched.
+        Records already written to the standard output are kept.
+        """
+        self.f.close()
+        if self.stdout:
+            return
+        try:
+            os.remove(self.tmp_filename)
+        except FileNotFoundError:
+            pass